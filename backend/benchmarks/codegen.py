@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Repeated evaluation cost: postfix interpreter against the generated code backend
+
+Usage (from the backend directory):
+    python -m benchmarks.codegen [--points N]
+"""
+
+import argparse
+import timeit
+
+from computation.cache import LRUCache
+from computation.codegen import lower
+from computation.parser import Parser
+
+CASES = {
+    "polynomial": "3 * x ^ 3 - 2 * x ^ 2 + x - 7",
+    "constants": "x * (2 ^ 10 - 24) / (4 * 25) + (1 + 2 + 3 + 4) * 0.5",
+    "rational": "(x + 1) / (x ^ 2 + 1) - x // 3",
+    "long_sum": " + ".join(f"{i} * x" for i in range(1, 51)),
+}
+
+
+def run(points: int) -> None:
+    parser = Parser(cache=LRUCache())
+    xs = [{"x": i * 0.37 + 0.5} for i in range(points)]
+
+    print(f"{'case':<12} {'interpreter us/eval':>20} {'generated us/eval':>18} {'speedup':>8}")
+    for name, expression in CASES.items():
+        compiled = parser.compile(expression)
+        function = lower(compiled)
+        assert all(function(env) == compiled.evaluate(env) for env in xs)
+
+        interpreted = min(timeit.repeat(lambda: [compiled.evaluate(env) for env in xs],
+                                        number=1, repeat=5)) / points * 1e6
+        generated = min(timeit.repeat(lambda: [function(env) for env in xs],
+                                      number=1, repeat=5)) / points * 1e6
+        print(f"{name:<12} {interpreted:20.2f} {generated:18.2f} {interpreted / generated:7.1f}x")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--points", type=int, default=10000, help="evaluations per case")
+    run(arg_parser.parse_args().points)
@@ -0,0 +1,92 @@
+"""
+Reproducible corpus of arithmetic expressions for the benchmarks
+
+The same profile and seed always give the same expressions. Divisors and exponents are
+literals (non-zero, small), so most expressions evaluate without errors or overflow
+"""
+
+import random
+from typing import Dict, List, NamedTuple
+
+
+class Profile(NamedTuple):
+    # number of operands in an expression, inclusive range
+    min_operands: int
+    max_operands: int
+    # probability that a binary sub-expression is wrapped in parentheses
+    paren_rate: float
+    # extra parentheses around the whole expression, e.g. ((((1 + 2))))
+    nesting: int
+    # relative weights of the operators
+    operators: Dict[str, float]
+    unary_rate: float = 0.05
+    float_rate: float = 0.3
+
+
+MIXED = {'+': 4, '-': 3, '*': 3, '/': 1.5, '//': 0.5, '^': 0.5}
+
+PROFILES: Dict[str, Profile] = {
+    # what people type into the calculator
+    "short": Profile(2, 6, 0.2, 0, MIXED),
+    "medium": Profile(10, 30, 0.3, 0, MIXED),
+    "long": Profile(100, 300, 0.3, 0, MIXED),
+    "deep": Profile(5, 10, 0.5, 200, MIXED),
+    "additive": Profile(10, 30, 0.1, 0, {'+': 1, '-': 1}),
+    "multiplicative": Profile(10, 30, 0.1, 0, {'*': 2, '/': 2, '//': 1}),
+}
+
+
+def _number(rng: random.Random, profile: Profile) -> str:
+    if rng.random() < profile.float_rate:
+        return f"{rng.uniform(0.1, 100):.{rng.randint(1, 4)}f}"
+    return str(rng.randint(1, 999))
+
+
+def _expression(rng: random.Random, profile: Profile, operands: int, operators: List[str],
+                weights: List[float]) -> str:
+    if operands == 1:
+        number = _number(rng, profile)
+        return f"-{number}" if rng.random() < profile.unary_rate else number
+    op = rng.choices(operators, weights)[0]
+    if op in ('/', '//'):
+        # dividing by a literal keeps division by zero out of the corpus
+        left = _expression(rng, profile, operands - 1, operators, weights)
+        right = str(rng.randint(1, 99))
+    elif op == '^':
+        left = _expression(rng, profile, operands - 1, operators, weights)
+        left = left if operands == 2 else f"({left})"
+        # a small integer exponent cannot overflow or produce a complex number
+        right = str(rng.randint(0, 3))
+    else:
+        split = rng.randint(1, operands - 1)
+        left = _expression(rng, profile, split, operators, weights)
+        right = _expression(rng, profile, operands - split, operators, weights)
+    expression = f"{left} {op} {right}"
+    if rng.random() < profile.paren_rate:
+        expression = f"({expression})"
+    return expression
+
+
+def generate(profile: str, count: int, seed: int = 0) -> List[str]:
+    """count expressions of the named profile"""
+    settings = PROFILES[profile]
+    rng = random.Random(f"{profile}:{seed}")
+    operators = list(settings.operators)
+    weights = [settings.operators[op] for op in operators]
+    corpus = []
+    for _ in range(count):
+        operands = rng.randint(settings.min_operands, settings.max_operands)
+        expression = _expression(rng, settings, operands, operators, weights)
+        corpus.append("(" * settings.nesting + expression + ")" * settings.nesting)
+    return corpus
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("profile", choices=sorted(PROFILES))
+    arg_parser.add_argument("--count", type=int, default=10)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    print("\n".join(generate(args.profile, args.count, args.seed)))
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Load test: throughput, latency percentiles and errors of a local server under a request mix
+
+Starts the server (python main.py, CALC_WORKERS processes) on a temporary database that is
+first filled with each of the --history sizes, and drives it with an asyncio client over
+persistent HTTP/1.1 connections. Closed loop (default): --concurrency connections send
+back to back. Open loop (--rate): requests arrive as a Poisson process at the given rate
+over up to --concurrency connections, and latency counts from the scheduled arrival, so a
+server that falls behind shows it in the percentiles rather than slowing the arrivals down.
+The mix, the expressions and the arrivals come from --seed, and every run starts from a
+fresh database and a warm-up, so runs with the same arguments on the same machine compare.
+Results are written as JSON; with --baseline, throughput and percentiles are compared
+against a stored run. With --url an already running server is tested instead (--history
+and --workers do not apply then).
+
+Usage (from the backend directory):
+    python -m benchmarks.load [--mix calculate=8,history_page=2] [--history 0,100000]
+                              [--concurrency 32 | --rate 500] [--duration 10] [--warmup 2]
+                              [--workers 1] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.corpus import PROFILES, generate
+from benchmarks.suite import BACKEND_DIR, STARTUP_TIMEOUT, _fill
+from database import database
+
+DEFAULT_MIX = {"calculate": 8, "history_page": 2}
+DEFAULT_HISTORY = (0, 100_000)
+# Distinct expressions replayed by calculate
+CORPUS_SIZE = 5000
+# Seconds one request may take before it counts as a timeout error
+REQUEST_TIMEOUT = 10.0
+
+
+class Request(NamedTuple):
+    operation: str
+    method: str
+    path: str
+    body: Optional[bytes] = None
+
+
+class Sample(NamedTuple):
+    operation: str
+    # seconds from the scheduled (open loop) or actual (closed loop) send to the full response
+    latency: float
+    # HTTP status, or the name of the exception that ended the request
+    outcome: str
+    # the response came within the measured window (after the warm-up)
+    measured: bool
+
+
+def _json_request(operation: str, path: str, payload: dict) -> Request:
+    return Request(operation, "POST", path, json.dumps(payload).encode("utf-8"))
+
+
+class Workload:
+    """Reproducible stream of requests drawn from the mix"""
+
+    def __init__(self, mix: Dict[str, float], profile: str, seed: int):
+        unknown = set(mix) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+        self.operations = list(mix)
+        self.weights = [mix[operation] for operation in self.operations]
+        self.corpus = generate(profile, CORPUS_SIZE, seed)
+        self.rng = random.Random(seed)
+
+    def next(self) -> Request:
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        return OPERATIONS[operation](self)
+
+
+OPERATIONS = {
+    "calculate": lambda workload: _json_request(
+        "calculate", "/calculate", {"expression": workload.rng.choice(workload.corpus)}),
+    "calculate_batch": lambda workload: _json_request(
+        "calculate_batch", "/calculate/batch", {"expressions": workload.rng.sample(workload.corpus, 20)}),
+    "history_page": lambda workload: Request("history_page", "GET", "/history?limit=100"),
+    "history_all": lambda workload: Request("history_all", "GET", "/history"),
+    "search": lambda workload: Request(
+        "search", "GET", f"/history/search?q={workload.rng.randint(1, 99)}&limit=20"),
+    "health": lambda workload: Request("health", "GET", "/health"),
+}
+
+
+class Connection:
+    """One persistent HTTP/1.1 connection; enough of the protocol for this server's responses"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, request: Request) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = f"{request.method} {request.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+        if request.body is not None:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(request.body)}\r\n"
+        self.writer.write(head.encode("ascii") + b"\r\n" + (request.body or b""))
+        try:
+            return await asyncio.wait_for(self._response(), REQUEST_TIMEOUT)
+        except BaseException:
+            # the connection is in an unknown state
+            self.close()
+            raise
+
+    async def _response(self) -> int:
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        length, chunked, close = 0, False, False
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "transfer-encoding":
+                chunked = "chunked" in value
+            elif name == "connection":
+                close = value == "close"
+        if chunked:
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def _send(connection: Connection, request: Request, started: float, measure_from: float,
+                samples: List[Sample]) -> None:
+    try:
+        outcome = str(await connection.request(request))
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+    except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+        outcome = type(e).__name__
+    finished = time.perf_counter()
+    samples.append(Sample(request.operation, finished - started, outcome, started >= measure_from))
+
+
+async def closed_loop(url: str, workload: Workload, concurrency: int, warmup: float,
+                      duration: float) -> Tuple[List[Sample], float]:
+    """concurrency connections, each sending its next request as soon as the last one is answered"""
+    host, port = _address(url)
+    samples: List[Sample] = []
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+
+    async def user() -> None:
+        connection = Connection(host, port)
+        try:
+            while time.perf_counter() < stop_at:
+                await _send(connection, workload.next(), time.perf_counter(), measure_from, samples)
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples, measure_from
+
+
+async def open_loop(url: str, workload: Workload, rate: float, concurrency: int, warmup: float,
+                    duration: float, seed: int) -> Tuple[List[Sample], float]:
+    """Poisson arrivals at rate per second; a request waits for a free connection if all are busy"""
+    host, port = _address(url)
+    samples: List[Sample] = []
+    idle: "asyncio.Queue[Connection]" = asyncio.Queue()
+    for _ in range(concurrency):
+        idle.put_nowait(Connection(host, port))
+    arrivals = random.Random(seed + 1)
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    async def arrive(request: Request, scheduled: float) -> None:
+        connection = await idle.get()
+        try:
+            await _send(connection, request, scheduled, measure_from, samples)
+        finally:
+            idle.put_nowait(connection)
+
+    pending = set()
+    scheduled = start
+    while True:
+        scheduled += arrivals.expovariate(rate)
+        if scheduled >= stop_at:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.ensure_future(arrive(workload.next(), scheduled))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+    while not idle.empty():
+        idle.get_nowait().close()
+    return samples, measure_from
+
+
+def _address(url: str) -> Tuple[str, int]:
+    parts = urlsplit(url)
+    return parts.hostname, parts.port or 80
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a sorted, non-empty list"""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[Sample], seconds: float) -> Dict[str, object]:
+    """Throughput (completed requests per second), error rate and latency percentiles in ms"""
+    latencies = sorted(sample.latency for sample in samples)
+    errors = Counter(sample.outcome for sample in samples if not sample.outcome.startswith("2"))
+    summary: Dict[str, object] = {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / seconds, 1) if seconds > 0 else 0.0,
+        "errors": dict(sorted(errors.items())),
+        "error_rate": round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+    }
+    if latencies:
+        summary["latency_ms"] = {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+            **{f"p{round(fraction * 100, 1):g}": round(percentile(latencies, fraction) * 1000, 3)
+               for fraction in (0.5, 0.9, 0.99, 0.999)},
+            "max": round(latencies[-1] * 1000, 3),
+        }
+    return summary
+
+
+def run_load(url: str, args, history: Optional[int]) -> Dict[str, object]:
+    workload = Workload(args.mix, args.profile, args.seed)
+    cpu_started = time.process_time()
+    if args.rate:
+        samples, measure_from = asyncio.run(open_loop(
+            url, workload, args.rate, args.concurrency, args.warmup, args.duration, args.seed))
+    else:
+        samples, measure_from = asyncio.run(closed_loop(
+            url, workload, args.concurrency, args.warmup, args.duration))
+    client_cpu = time.process_time() - cpu_started
+    measured = [sample for sample in samples if sample.measured]
+    by_operation = defaultdict(list)
+    for sample in measured:
+        by_operation[sample.operation].append(sample)
+    return {
+        "history_rows": history,
+        "mode": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        **summarize(measured, args.duration),
+        "operations": {operation: summarize(operation_samples, args.duration)
+                       for operation, operation_samples in sorted(by_operation.items())},
+        # close to the wall time of the run: the client, not the server, limited the throughput
+        "client_cpu_s": round(client_cpu, 2),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(path: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = {**os.environ, "CALC_DB_PATH": path, "CALC_HOST": "127.0.0.1", "CALC_PORT": str(port),
+           "CALC_WORKERS": str(workers)}
+    server = subprocess.Popen([sys.executable, "main.py"], cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + STARTUP_TIMEOUT
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1) as response:
+                if response.status == 200:
+                    return server, url
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            time.sleep(0.05)
+    server.terminate()
+    raise RuntimeError(f"Server did not respond within {STARTUP_TIMEOUT} s")
+
+
+def _prefill(path: str, rows: int, seed: int) -> None:
+    database.DB_PATH = path
+    database.init_database()
+    database.init_pool(1)
+    try:
+        _fill(rows, seed)
+    finally:
+        database.close_pool()
+
+
+def _print_run(run: Dict[str, object], baseline: Optional[Dict[str, object]] = None) -> None:
+    label = f"history={run['history_rows']}" if run["history_rows"] is not None else "external server"
+    rows = [("all", run)] + [(operation, summary) for operation, summary in run["operations"].items()]
+    print(f"{label}, {run['mode']} loop: {run['throughput_rps']} req/s, error rate {run['error_rate']:.2%}, "
+          f"client CPU {run['client_cpu_s']} s")
+    print(f"  {'operation':<16} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for operation, summary in rows:
+        latency = summary.get("latency_ms", {})
+        line = (f"  {operation:<16} {summary['throughput_rps']:>10} {latency.get('p50', '-'):>9} "
+                f"{latency.get('p99', '-'):>9} {summary['error_rate']:>7.2%}")
+        before = baseline if operation == "all" else (baseline or {}).get("operations", {}).get(operation)
+        if before and before.get("latency_ms") and latency:
+            line += (f"   vs baseline: req/s {summary['throughput_rps'] / before['throughput_rps'] - 1:+.1%}, "
+                     f"p50 {latency['p50'] / before['latency_ms']['p50'] - 1:+.1%}, "
+                     f"p99 {latency['p99'] / before['latency_ms']['p99'] - 1:+.1%}")
+        print(line)
+
+
+def run(args) -> int:
+    logging.disable(logging.INFO)
+    runs = []
+    if args.url:
+        runs.append(run_load(args.url, args, None))
+    else:
+        for rows in args.history:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "load.db")
+                _prefill(path, rows, args.seed)
+                server, url = start_server(path, args.workers)
+                try:
+                    runs.append(run_load(url, args, rows))
+                finally:
+                    server.terminate()
+                    server.wait()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "arguments": {name: value for name, value in vars(args).items() if name not in ("output", "baseline")},
+        },
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    baseline_runs = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline_runs = {run["history_rows"]: run for run in json.load(file)["runs"]}
+    for load_run in runs:
+        _print_run(load_run, baseline_runs.get(load_run["history_rows"]))
+    return 1 if any(load_run["error_rate"] > args.max_error_rate for load_run in runs) else 0
+
+
+def _mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--mix", type=_mix, default=dict(DEFAULT_MIX),
+                            help=f"operation=weight pairs out of {', '.join(OPERATIONS)}")
+    arg_parser.add_argument("--profile", choices=sorted(PROFILES), default="short",
+                            help="expression profile of the corpus")
+    arg_parser.add_argument("--history", type=lambda value: [int(rows) for rows in value.split(",")],
+                            default=list(DEFAULT_HISTORY), help="history sizes to run against, one run each")
+    arg_parser.add_argument("--concurrency", type=int, default=32,
+                            help="connections (closed loop: concurrent users)")
+    arg_parser.add_argument("--rate", type=float, help="open loop: requests per second")
+    arg_parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per run")
+    arg_parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before that")
+    arg_parser.add_argument("--workers", type=int, default=1, help="server processes")
+    arg_parser.add_argument("--url", help="test a running server instead of starting one")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--output", help="write the report to this JSON file")
+    arg_parser.add_argument("--baseline", help="compare against the report in this JSON file")
+    arg_parser.add_argument("--max-error-rate", type=float, default=0.01,
+                            help="exit with 1 if a run has a higher error rate")
+    args = arg_parser.parse_args(argv)
+    if args.concurrency < 1 or args.duration <= 0 or (args.rate is not None and args.rate <= 0):
+        arg_parser.error("concurrency, duration and rate must be positive")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args()))
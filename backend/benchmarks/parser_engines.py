@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Per-token cost of the iterative parser compared with the original recursive one
+
+Usage (from the backend directory):
+    python -m benchmarks.parser_engines [--repeat N]
+"""
+
+import argparse
+import math
+import re
+import timeit
+from typing import List
+
+from computation.cache import LRUCache
+from computation.parser import Parser
+
+
+class LegacyParser:
+    """The recursive descent parser the iterative engine replaced, kept for comparison"""
+
+    def __init__(self):
+        self.tokens = []
+        self.current_token = 0
+
+    def parse_expression(self, expression: str) -> float:
+        expression = expression.replace(" ", "").lower()
+        expression = expression.replace("**", "^")
+        self.tokens = re.findall(r'(\d+\.?\d*|\.\d+|//|[+\-*/^()])', expression)
+        self.current_token = 0
+
+        result = self._parse_operations(['+-', '*/', '//', '^'])
+
+        if self.current_token < len(self.tokens):
+            raise ValueError(f"Unexpected token: {self.tokens[self.current_token]}")
+
+        return result
+
+    def _parse_operations(self, operation_levels: List[str]) -> float:
+        if not operation_levels:
+            return self._parse_factor()
+
+        current_ops = operation_levels[0]
+        result = self._parse_operations(operation_levels[1:])
+
+        while (self.current_token < len(self.tokens) and
+               self.tokens[self.current_token] in current_ops):
+
+            operator = self.tokens[self.current_token]
+            self.current_token += 1
+
+            right_operand = self._parse_operations(operation_levels[1:])
+
+            if operator == '+':
+                result += right_operand
+            elif operator == '-':
+                result -= right_operand
+            elif operator == '*':
+                result *= right_operand
+            elif operator == '/':
+                if right_operand == 0:
+                    raise ValueError("Div by zero")
+                result /= right_operand
+            elif operator == '^':
+                if result == 0 and right_operand < 0:
+                    raise ValueError("Div by zero")
+                if result < 0 < right_operand < 1:
+                    raise ValueError("sqrt(-1)")
+                result **= right_operand
+            elif operator == '//':
+                if right_operand == 0:
+                    raise ValueError("Div by zero")
+                result = float(math.floor(result / right_operand))
+
+        return result
+
+    def _parse_factor(self) -> float:
+        if self.current_token >= len(self.tokens):
+            raise ValueError("Unexpected end of expression")
+
+        token = self.tokens[self.current_token]
+
+        if token == '-':
+            self.current_token += 1
+            return -self._parse_factor()
+
+        if token == '(':
+            self.current_token += 1
+            result = self._parse_operations(['+-', '*/', '//', '^'])
+            if (self.current_token >= len(self.tokens) or
+                    self.tokens[self.current_token] != ')'):
+                raise ValueError("Closing parenthesis is missing")
+            self.current_token += 1
+            return result
+
+        try:
+            value = float(token)
+        except ValueError:
+            raise ValueError(f"Unexpected token: {token}")
+        self.current_token += 1
+        return value
+
+
+# name -> expression
+CASES = {
+    "flat_sum": " + ".join(str(i) for i in range(1, 201)),
+    "mixed": " + ".join(f"{i} * {i + 1} - {i} / 7 // 2 ^ 1" for i in range(1, 51)),
+    "unary": " * ".join("-(-3)" for _ in range(100)),
+    "nested_100": "(" * 100 + "1" + " + 1)" * 100,
+    "nested_5000": "(" * 5000 + "1" + " + 1)" * 5000,
+}
+
+
+def _token_count(expression: str) -> int:
+    return len(re.findall(r'(\d+\.?\d*|\.\d+|//|[+\-*/^()])', expression.replace("**", "^")))
+
+
+def _per_token_ns(func, expression: str, repeat: int) -> float:
+    seconds = min(timeit.repeat(lambda: func(expression), number=1, repeat=repeat))
+    return seconds / _token_count(expression) * 1e9
+
+
+def run(repeat: int) -> None:
+    legacy = LegacyParser()
+    # A one-slot cache that every call misses measures the full tokenize + parse + evaluate path
+    uncached = Parser(cache=LRUCache(maxsize=1))
+
+    def iterative(expression: str) -> float:
+        uncached.cache.clear()
+        return uncached.parse_expression(expression)
+
+    print(f"{'case':<14} {'tokens':>7} {'legacy ns/token':>16} {'iterative ns/token':>19}")
+    for name, expression in CASES.items():
+        try:
+            legacy_cost = f"{_per_token_ns(legacy.parse_expression, expression, repeat):16.1f}"
+        except RecursionError:
+            legacy_cost = f"{'RecursionError':>16}"
+        iterative_cost = _per_token_ns(iterative, expression, repeat)
+        print(f"{name:<14} {_token_count(expression):>7} {legacy_cost} {iterative_cost:19.1f}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=50, help="timing repetitions per case")
+    run(arg_parser.parse_args().repeat)
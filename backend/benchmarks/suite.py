@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: parser, database layer, HTTP endpoints, response encoding, evaluation pool
+and server startup
+
+Every benchmark reports the median and the minimum of several timed repeats, in seconds
+per operation; with --runs the whole suite is run several times and the medians of the
+runs are combined. Results are written as JSON; with --baseline the medians are compared
+against a stored run and the exit code is 1 if any benchmark got slower than the threshold.
+The database and the HTTP benchmarks run against a temporary database file. The startup
+group measures the cold start of a uvicorn process, up to its first response, and fails
+the run if it exceeds --startup-budget. The encoding group splits the latency of /history
+over a large history into the query and the encoding, per media type, and prints the
+share of the encoding. The executor group evaluates plans of growing cost inline and in
+the evaluation pool, and prints what a step and a '^' cost (see computation/executor.py)
+and the cost at which evaluating inline takes as long as a round trip to the pool.
+
+Usage (from the backend directory):
+    python -m benchmarks.suite [--only parser,database,http,encoding,executor,startup] [--rows 1000,10000]
+                               [--runs 3] [--output FILE] [--baseline FILE] [--threshold 0.25]
+                               [--startup-budget 1500]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import generate
+from computation.cache import LRUCache
+from computation.executor import EvaluationPool, estimate_cost
+from computation.parser import Parser
+from database import database
+import settings
+
+GROUPS = ("parser", "database", "http", "encoding", "executor", "startup")
+DEFAULT_ROWS = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.25
+# Cold start budget: from launching a server process to its first response, in ms
+DEFAULT_STARTUP_BUDGET_MS = 1500
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Limit for one server start in the startup group, in seconds
+STARTUP_TIMEOUT = 30
+
+# History size of the encoding group
+ENCODING_ROWS = 100_000
+
+# Expressions per parser benchmark and profile
+PARSER_CORPUS = {"short": 2000, "medium": 500, "long": 50, "deep": 200}
+
+# Operators per plan of the executor group; 2400 is about the most the default budget admits
+EXECUTOR_SIZES = (10, 100, 1000, 2400)
+
+
+def measure(function: Callable[[], object], operations: int, repeat: int = 5) -> Dict[str, float]:
+    """Times repeat calls of function, each doing the given number of operations"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) / operations)
+    return {"median": statistics.median(timings), "min": min(timings),
+            "operations": operations, "repeat": repeat}
+
+
+def _parse_all(parser: Parser, corpus: List[str]) -> None:
+    for expression in corpus:
+        try:
+            parser.parse_expression(expression)
+        except ArithmeticError:
+            pass
+
+
+def bench_parser(results: Dict[str, dict], args) -> None:
+    for profile, count in PARSER_CORPUS.items():
+        corpus = generate(profile, count, args.seed)
+        # cold: every expression is tokenized and parsed; warm: compiled plans come from the cache
+        results[f"parser.cold.{profile}"] = measure(
+            lambda: _parse_all(Parser(cache=LRUCache(maxsize=count)), corpus), count)
+        warm = Parser(cache=LRUCache(maxsize=count))
+        _parse_all(warm, corpus)
+        results[f"parser.warm.{profile}"] = measure(lambda: _parse_all(warm, corpus), count)
+
+
+def _use_database(directory: str, name: str) -> None:
+    database.close_pool()
+    database.DB_PATH = os.path.join(directory, name)
+    database.init_database()
+    database.init_pool(4)
+
+
+def _fill(rows: int, seed: int, chunk: int = 10_000) -> None:
+    """Adds rows of history in large transactions"""
+    corpus = generate("short", min(rows, chunk), seed)
+    done = 0
+    while done < rows:
+        size = min(chunk, rows - done)
+        database.save_calculations([(expression, "0") for expression in corpus[:size]])
+        done += size
+
+
+def bench_database(results: Dict[str, dict], args, directory: str) -> None:
+    filled = 0
+    _use_database(directory, "database.db")
+    for rows in sorted(args.rows):
+        _fill(rows - filled, args.seed)
+        filled = rows
+        inserts = 200
+        with database.get_pool().connection() as conn:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM occurrences").fetchone()[0]
+        results[f"database.save_calculation.{rows}"] = measure(
+            lambda: [database.save_calculation("1 + 2", "3") for _ in range(inserts)], inserts)
+        # remove the measured inserts so the table stays at the nominal size
+        with database.get_pool().connection() as conn:
+            conn.execute("DELETE FROM occurrences WHERE id > ?", (last_id,))
+            conn.commit()
+        results[f"database.get_all_calculations.{rows}"] = measure(
+            database.get_all_calculations, rows, repeat=3 if rows < 1_000_000 else 1)
+        results[f"database.get_calculations_page.{rows}"] = measure(
+            lambda: [database.get_calculations_page(before_id=rows // 2, limit=100)
+                     for _ in range(100)], 100)
+    database.close_pool()
+
+
+def bench_http(results: Dict[str, dict], args, directory: str) -> None:
+    # the application's lifespan initializes the database this points to
+    database.DB_PATH = os.path.join(directory, "http.db")
+    from fastapi.testclient import TestClient
+    import main
+
+    corpus = generate("short", 500, args.seed)
+    with TestClient(main.app) as client:
+        _fill(10_000, args.seed)
+
+        def calculate():
+            for expression in corpus:
+                client.post("/calculate", json={"expression": expression})
+        results["http.calculate"] = measure(calculate, len(corpus))
+        results["http.calculate_batch"] = measure(
+            lambda: [client.post("/calculate/batch?save_history=false", json={"expressions": corpus})
+                     for _ in range(5)], 5)
+        results["http.history_page"] = measure(
+            lambda: [client.get("/history?limit=100") for _ in range(100)], 100)
+        results["http.history_all"] = measure(lambda: client.get("/history"), 1)
+        results["http.health"] = measure(lambda: [client.get("/health") for _ in range(500)], 500)
+
+
+def bench_encoding(results: Dict[str, dict], args, directory: str) -> None:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from endpoints import encoding
+    import main
+
+    database.DB_PATH = os.path.join(directory, "encoding.db")
+    prefix = f"encoding.history.{ENCODING_ROWS}"
+    with TestClient(main.app) as client:
+        _fill(ENCODING_ROWS, args.seed)
+        rows = database.get_all_calculations()
+        columns = database.get_history_columns()
+        results[f"{prefix}.query.rows"] = measure(database.get_all_calculations, 1, repeat=3)
+        results[f"{prefix}.query.columns"] = measure(database.get_history_columns, 1, repeat=3)
+        # what FastAPI does with rows returned from an endpoint: jsonable_encoder, then json.dumps
+        results[f"{prefix}.encode.stdlib"] = measure(
+            lambda: json.dumps(jsonable_encoder(rows), ensure_ascii=False).encode("utf-8"), 1, repeat=3)
+        media_types = {"json": encoding.JSON, "columns": encoding.COLUMNS_JSON}
+        if encoding.msgpack is not None:
+            media_types["msgpack"] = encoding.MSGPACK
+        for name, media_type in media_types.items():
+            content = rows if media_type == encoding.JSON else columns
+            results[f"{prefix}.encode.{name}"] = measure(lambda: encoding.encode(content, media_type), 1, repeat=3)
+            results[f"{prefix}.request.{name}"] = measure(
+                lambda: client.get("/history", headers={"Accept": media_type, "Accept-Encoding": "identity"}),
+                1, repeat=3)
+        body = encoding.encode(rows, encoding.JSON)
+        results[f"{prefix}.compress.gzip"] = measure(lambda: encoding.compress(body, "gzip"), 1, repeat=3)
+
+    def median(name: str) -> float:
+        return results[f"{prefix}.{name}"]["median"]
+    stdlib = median("encode.stdlib")
+    print(f"/history at {ENCODING_ROWS} rows, share of the encoding in the latency:")
+    print(f"  stdlib json: {stdlib / (stdlib + median('query.rows')):.0%} "
+          f"(estimated from the query and the encoding alone)")
+    for name, media_type in media_types.items():
+        encode, request = median(f"encode.{name}"), median(f"request.{name}")
+        print(f"  {name}: {encode / request:.0%} of {request * 1000:.0f} ms")
+
+
+def bench_executor(results: Dict[str, dict], args) -> None:
+    parser = Parser(budget=settings.BUDGET)
+    pool = EvaluationPool(workers=1, threshold=0, timeout=30)
+    pool.start()
+    plans = {}
+    try:
+        for size in EXECUTOR_SIZES:
+            for name, operator in (("add", "+"), ("power", "^")):
+                compiled = parser.compile(operator.join(["1"] * (size + 1)))
+                plans[f"{name}.{size}"] = compiled
+                results[f"executor.inline.{name}.{size}"] = measure(
+                    lambda: [compiled.evaluate(None, settings.BUDGET) for _ in range(20)], 20)
+                results[f"executor.pool.{name}.{size}"] = measure(
+                    lambda: [pool.evaluate(compiled, None, settings.BUDGET) for _ in range(20)], 20)
+    finally:
+        pool.stop()
+
+    def median(name: str) -> float:
+        return results[f"executor.{name}"]["median"]
+    # a plan of n operators has n + 1 operands
+    largest = max(EXECUTOR_SIZES)
+    step = median(f"inline.add.{largest}") / (2 * largest + 1)
+    power = (median(f"inline.power.{largest}") / step - (largest + 1)) / largest
+    round_trip = statistics.median(median(f"pool.{plan}") - median(f"inline.{plan}") for plan in plans)
+    print("Evaluation pool, per evaluation:")
+    for plan, compiled in plans.items():
+        print(f"  {plan:<12} cost {estimate_cost(compiled):6d}: inline {median(f'inline.{plan}') * 1e6:8.1f} us, "
+              f"pool {median(f'pool.{plan}') * 1e6:8.1f} us")
+    print(f"  a step takes {step * 1e9:.0f} ns and a '^' {power:.1f} steps; the round trip to the pool adds "
+          f"{round_trip * 1e6:.0f} us, as long as evaluating a plan of cost {round_trip / step:.0f} inline")
+
+
+def _first_response(directory: str, database_name: str) -> float:
+    """Seconds from starting a server process to its first successful response"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = {**os.environ, "CALC_DB_PATH": os.path.join(directory, database_name)}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env)
+    try:
+        deadline = started + STARTUP_TIMEOUT
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {server.returncode}")
+                time.sleep(0.005)
+        raise RuntimeError(f"Server did not respond within {STARTUP_TIMEOUT} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def bench_startup(results: Dict[str, dict], args, directory: str) -> None:
+    # the first start creates the database and applies every migration
+    results["startup.first_response.new_database"] = measure(
+        lambda: _first_response(directory, "startup.db"), 1, repeat=1)
+    results["startup.first_response"] = measure(lambda: _first_response(directory, "startup.db"), 1)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Prints the change against the baseline; returns the names of the regressions"""
+    regressions = []
+    print(f"{'benchmark':<42} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<42} {'-':>12} {result['median'] * 1e6:12.2f}")
+            continue
+        before, after = baseline[name]["median"], result["median"]
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<42} {before * 1e6:12.2f} {after * 1e6:12.2f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def run_once(args) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if "parser" in args.only:
+            bench_parser(results, args)
+        if "database" in args.only:
+            bench_database(results, args, directory)
+        if "http" in args.only:
+            bench_http(results, args, directory)
+        if "encoding" in args.only:
+            bench_encoding(results, args, directory)
+        if "executor" in args.only:
+            bench_executor(results, args)
+        if "startup" in args.only:
+            bench_startup(results, args, directory)
+    return results
+
+
+def combine(runs: List[Dict[str, dict]]) -> Dict[str, dict]:
+    """
+    One result per benchmark out of several runs of the suite: the median of their medians.
+    Slow phases of a shared machine last seconds and affect all repeats of a run alike,
+    so repeats within one run do not average them out
+    """
+    combined = {}
+    for name, result in runs[0].items():
+        measured = [run[name] for run in runs if name in run]
+        combined[name] = {**result, "median": statistics.median(r["median"] for r in measured),
+                          "min": min(r["min"] for r in measured), "runs": len(measured)}
+    return combined
+
+
+def run(args) -> int:
+    # per-request log lines would be measured too
+    logging.disable(logging.INFO)
+    results = combine([run_once(args) for _ in range(args.runs)])
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": args.seed,
+            "runs": args.runs,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+
+    failed = False
+    if args.baseline is None:
+        for name, result in results.items():
+            print(f"{name:<42} {result['median'] * 1e6:12.2f} us")
+    else:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+            failed = True
+    startup = results.get("startup.first_response")
+    if startup is not None and args.startup_budget and startup["median"] * 1000 > args.startup_budget:
+        print(f"Time to first response {startup['median'] * 1000:.0f} ms exceeds the startup budget "
+              f"of {args.startup_budget} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+def _parse_args(argv: Optional[List[str]] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--only", type=lambda value: value.split(","), default=list(GROUPS),
+                            help=f"comma-separated groups out of {', '.join(GROUPS)}")
+    arg_parser.add_argument("--rows", type=lambda value: [int(rows) for rows in value.split(",")],
+                            default=list(DEFAULT_ROWS), help="history sizes for the database group")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed of the expression corpus")
+    arg_parser.add_argument("--runs", type=int, default=1,
+                            help="run the suite this many times and keep the median of every benchmark")
+    arg_parser.add_argument("--output", help="write the results to this JSON file")
+    arg_parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    arg_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="allowed slowdown of the median, as a fraction")
+    arg_parser.add_argument("--startup-budget", type=int, default=DEFAULT_STARTUP_BUDGET_MS,
+                            help="fail if the median time to first response exceeds this many ms (0: off)")
+    return arg_parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(_parse_args()))
@@ -0,0 +1,47 @@
+import math
+from typing import NamedTuple
+
+
+class BudgetExceededError(ValueError):
+    """Raised when an expression is too expensive to evaluate; limit names the exceeded limit"""
+
+    def __init__(self, message: str, limit: str):
+        super().__init__(message)
+        self.limit = limit
+
+    def __reduce__(self):
+        # keeps limit when the error crosses a process boundary
+        return type(self), (str(self), self.limit)
+
+
+class EvaluationBudget(NamedTuple):
+    """Limits that keep a single expression from monopolizing a worker"""
+    max_length: int = 10_000
+    max_tokens: int = 5_000
+    max_depth: int = 500
+    # decimal exponent of the largest power result computed
+    max_magnitude: float = 308.0
+    # wall-clock seconds for one evaluation
+    timeout: float = 1.0
+
+    def check_length(self, expression: str) -> None:
+        if len(expression) > self.max_length:
+            raise BudgetExceededError(
+                f"Expression is longer than {self.max_length} characters", "max_length")
+
+    def check_size(self, token_count: int, depth: int) -> None:
+        if token_count > self.max_tokens:
+            raise BudgetExceededError(
+                f"Expression has more than {self.max_tokens} tokens", "max_tokens")
+        if depth > self.max_depth:
+            raise BudgetExceededError(
+                f"Parentheses are nested deeper than {self.max_depth} levels", "max_depth")
+
+    def check_power(self, base: float, exponent: float) -> None:
+        """Estimates |base ^ exponent| from logarithms before the power is computed"""
+        if base == 0 or exponent == 0 or abs(base) == 1:
+            return
+        magnitude = exponent * math.log10(abs(base))
+        if magnitude > self.max_magnitude:
+            raise BudgetExceededError(
+                f"Result of power is too large (about 10^{magnitude:.0f})", "max_magnitude")
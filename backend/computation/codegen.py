@@ -0,0 +1,122 @@
+import math
+from typing import Callable, Dict, Mapping, Optional
+
+from .budget import EvaluationBudget
+from .parser import NEGATE, OPERATORS, CompiledExpression, Variable, _divide, _floor_divide, _power
+
+# Deeper expressions are left to the interpreter: nested Python source hits parser limits
+MAX_GENERATED_DEPTH = 100
+
+# Operators emitted inline; the checked ones become calls
+_INLINE = {'+': '+', '-': '-', '*': '*'}
+_CALLS = {'/': '_divide', '//': '_floor_divide', '^': '_power'}
+
+_NO_VARIABLES: Mapping[str, float] = {}
+
+_GLOBALS = {
+    '__builtins__': {},
+    '_divide': _divide,
+    '_floor_divide': _floor_divide,
+    '_power': _power,
+    'inf': math.inf,
+    'nan': math.nan,
+}
+
+
+def fold_constants(compiled: CompiledExpression,
+                   budget: Optional[EvaluationBudget] = None) -> CompiledExpression:
+    """
+    Replaces every sub-expression without variables by its value. Operations that fail
+    (division by zero, overflow, complex results) are kept, so errors still happen at evaluation;
+    with a budget, so are powers beyond its magnitude limit
+    """
+    code = []
+    # for every operand on the evaluation stack: the index in code where its code starts
+    starts = []
+    for item in compiled.code:
+        if item.__class__ is float or item.__class__ is Variable:
+            starts.append(len(code))
+            code.append(item)
+            continue
+        if item == NEGATE:
+            operand = code[-1]
+            if starts[-1] == len(code) - 1 and operand.__class__ is float:
+                code[-1] = -operand
+            else:
+                code.append(item)
+            continue
+        right_start = starts.pop()
+        left_start = starts[-1]
+        if right_start == left_start + 1 and len(code) == right_start + 1:
+            left, right = code[left_start], code[right_start]
+            if left.__class__ is float and right.__class__ is float:
+                try:
+                    if item == '^' and budget is not None:
+                        budget.check_power(left, right)
+                    value = OPERATORS[item].apply(left, right)
+                except (ValueError, OverflowError):
+                    value = None
+                if value.__class__ is float:
+                    del code[left_start:]
+                    code.append(value)
+                    continue
+        code.append(item)
+    return compiled._replace(code=tuple(code))
+
+
+def _source(compiled: CompiledExpression) -> Optional[str]:
+    """Python expression equivalent to the compiled code, or None if it nests too deeply"""
+    # (source, depth) of every operand on the evaluation stack
+    stack = []
+    for item in compiled.code:
+        if item.__class__ is float:
+            stack.append((repr(item), 0))
+        elif item.__class__ is Variable:
+            stack.append((f"v[{item.name!r}]", 0))
+        elif item == NEGATE:
+            source, depth = stack[-1]
+            stack[-1] = (f"(-{source})", depth + 1)
+        else:
+            right, right_depth = stack.pop()
+            left, left_depth = stack[-1]
+            if item in _INLINE:
+                source = f"({left} {_INLINE[item]} {right})"
+            else:
+                source = f"{_CALLS[item]}({left}, {right})"
+            stack[-1] = (source, max(left_depth, right_depth) + 1)
+        if stack[-1][1] > MAX_GENERATED_DEPTH:
+            return None
+    return stack[0][0]
+
+
+def lower(compiled: CompiledExpression,
+          budget: Optional[EvaluationBudget] = None) -> Callable[[Optional[Mapping[str, float]]], float]:
+    """
+    Turns the compiled expression into a Python function of the variable values.
+    Constants are folded first; the operators become plain Python operations in a generated
+    code object, so evaluating it again costs no per-operator dispatch.
+    With a budget, powers are checked against its magnitude limit (the generated code
+    runs in time linear in its size, so there is no deadline to check)
+    """
+    compiled = fold_constants(compiled, budget)
+    source = _source(compiled)
+    if source is None:
+        return lambda variables=None: compiled.evaluate(variables, budget)
+
+    namespace: Dict[str, object] = {}
+    globals_ = dict(_GLOBALS)
+    if budget is not None:
+        def checked_power(base: float, exponent: float) -> float:
+            budget.check_power(base, exponent)
+            return _power(base, exponent)
+        globals_['_power'] = checked_power
+    exec(f"def _expression(v):\n    return {source}\n", globals_, namespace)
+    function = namespace['_expression']
+
+    def evaluate(variables: Optional[Mapping[str, float]] = None) -> float:
+        try:
+            return function(_NO_VARIABLES if variables is None else variables)
+        except KeyError as e:
+            raise ValueError(f"Unknown variable: {e.args[0]}")
+
+    return evaluate
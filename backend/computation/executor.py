@@ -0,0 +1,159 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Mapping, Optional, Set
+
+from .budget import BudgetExceededError, EvaluationBudget
+from .parser import CompiledExpression
+
+# Cost of one '^' relative to other steps, as measured by the executor group of benchmarks/suite.py
+POWER_WEIGHT = 4
+
+
+class EvaluationPoolError(RuntimeError):
+    """Raised when the process pool cannot run an evaluation"""
+    pass
+
+
+class EvaluationPoolFullError(EvaluationPoolError):
+    """Raised when the pool already has as many evaluations as its queue allows"""
+    pass
+
+
+def estimate_cost(compiled: CompiledExpression) -> int:
+    """Rough evaluation cost of a compiled plan, in interpreter steps"""
+    return len(compiled.code) + (POWER_WEIGHT - 1) * compiled.code.count('^')
+
+
+def _evaluate(compiled: CompiledExpression, variables: Optional[Mapping[str, float]],
+              budget: Optional[EvaluationBudget]) -> float:
+    """Runs in a worker process"""
+    return compiled.evaluate(variables, budget)
+
+
+def _ready() -> None:
+    """No-op task that makes a worker process start"""
+
+
+class EvaluationPool:
+    """
+    Runs expensive evaluations in worker processes, so they neither hold the GIL of the
+    server process nor share its CPU time slice with cheap requests.
+    Plans whose estimated cost is below threshold are evaluated inline. A round trip to a worker
+    never makes an evaluation faster: it adds about as much time as evaluating a plan of cost 1500
+    inline takes (executor group of benchmarks/suite.py), so the default threshold offloads plans
+    that hold the server process at least as long as they are delayed. At most max_pending
+    evaluations are queued or running; a further one is rejected immediately. An evaluation
+    that exceeds timeout is cancelled if still queued; if it is already running, the workers
+    are terminated and replaced, since a running task cannot be interrupted otherwise
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, threshold: int = 1500,
+                 timeout: float = 2.0):
+        if workers < 1:
+            raise ValueError("An evaluation pool needs at least one worker")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.threshold = threshold
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Set[Future] = set()
+        self._inline = 0
+        self._offloaded = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._restarts = 0
+
+    def start(self) -> None:
+        """Starts the worker processes ahead of the first heavy request"""
+        with self._lock:
+            executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_ready)
+
+    def stop(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def evaluate(self, compiled: CompiledExpression, variables: Optional[Mapping[str, float]] = None,
+                 budget: Optional[EvaluationBudget] = None) -> float:
+        if estimate_cost(compiled) < self.threshold:
+            with self._lock:
+                self._inline += 1
+            return compiled.evaluate(variables, budget)
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise EvaluationPoolFullError(
+                f"Too many expensive evaluations in progress (limit {self.max_pending})")
+        try:
+            with self._lock:
+                executor = self._get_executor()
+                future = executor.submit(_evaluate, compiled, variables, budget)
+                self._futures.add(future)
+                self._offloaded += 1
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                self._cancel(future, executor)
+                raise BudgetExceededError("Evaluation took too long", "timeout")
+            except BrokenProcessPool:
+                self._restart(executor)
+                raise EvaluationPoolError("Evaluation worker stopped unexpectedly")
+            finally:
+                with self._lock:
+                    self._futures.discard(future)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "threshold": self.threshold,
+                "max_pending": self.max_pending,
+                "pending": len(self._futures),
+                "inline": self._inline,
+                "offloaded": self._offloaded,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "restarts": self._restarts,
+            }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Called with the lock held"""
+        if self._executor is None:
+            # spawn: forking a server process with threads and open database connections is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _cancel(self, future: Future, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._timeouts += 1
+        if not future.cancel():
+            self._restart(executor)
+
+    def _restart(self, executor: ProcessPoolExecutor) -> None:
+        """
+        Replaces the executor by a new one and kills its workers. The other evaluations
+        it was running fail with BrokenProcessPool and are reported as pool errors
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._restarts += 1
+        # ProcessPoolExecutor has no public way to stop a running task
+        for process in list(getattr(executor, "_processes", {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
@@ -0,0 +1,148 @@
+from array import array
+from bisect import bisect_left
+
+# Token kinds
+NUMBER = 0
+PLUS = 1
+MINUS = 2
+STAR = 3
+SLASH = 4
+DOUBLE_SLASH = 5
+CARET = 6
+LPAREN = 7
+RPAREN = 8
+NAME = 9
+
+OPERATOR_KINDS = {
+    '+': PLUS,
+    '-': MINUS,
+    '*': STAR,
+    '/': SLASH,
+    '//': DOUBLE_SLASH,
+    '^': CARET,
+    '**': CARET,
+    '(': LPAREN,
+    ')': RPAREN,
+}
+
+# Character classes of the scanner; ranges are ASCII only, like the grammar
+_DIGITS = frozenset('0123456789')
+_NAME_START = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_')
+_NAME_CHARS = _NAME_START | _DIGITS
+# Operators of one character that never start a longer one
+_SINGLE_KINDS = {'+': PLUS, '-': MINUS, '^': CARET, '(': LPAREN, ')': RPAREN}
+
+
+class ExpressionSyntaxError(ValueError):
+    """Raised when an expression is malformed; position is the offset in the source string"""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+class TokenBuffer:
+    """Typed tokens of an expression, stored column-wise in compact arrays"""
+
+    __slots__ = ('source', 'kinds', 'values', 'offsets')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array('B')
+        # Converted value of NUMBER tokens, 0.0 for the rest (names are read back with text())
+        self.values = array('d')
+        self.offsets = array('L')
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def text(self, index: int) -> str:
+        """Source text of a token, for error messages"""
+        start = self.offsets[index]
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.source)
+        return self.source[start:end].rstrip()
+
+
+def tokenize(source: str) -> TokenBuffer:
+    """Splits an expression into typed tokens in one pass over the string"""
+    tokens = TokenBuffer(source)
+    _scan(tokens, 0)
+    return tokens
+
+
+def retokenize(tokens: TokenBuffer, source: str, start: int) -> int:
+    """
+    Updates the tokens of an expression whose text changed from position start on.
+    A token is kept while the token after it also starts before start: the character that
+    ended it is then unchanged, so it cannot merge with the edit ("1" + "2", "*" + "*").
+    The rest of the source is lexed again. Returns the number of tokens kept
+    """
+    offsets = tokens.offsets
+    kept = max(bisect_left(offsets, start) - 1, 0)
+    position = offsets[kept] if kept else 0
+    del tokens.kinds[kept:]
+    del tokens.values[kept:]
+    del offsets[kept:]
+    tokens.source = source
+    _scan(tokens, position)
+    return kept
+
+
+def _scan(tokens: TokenBuffer, position: int) -> None:
+    """Appends the tokens of the source from position on, reading every character once"""
+    source = tokens.source
+    length = len(source)
+    add_kind, add_value, add_offset = tokens.kinds.append, tokens.values.append, tokens.offsets.append
+
+    while position < length:
+        char = source[position]
+        start = position
+        position += 1
+        if char in _DIGITS or char == '.':
+            # [0-9]+ [.] [0-9]*  or  . [0-9]+, ignoring whitespace between the characters
+            # as the original parser did, which removed all spaces first ("1 000" is 1000)
+            dot = char == '.'
+            spaced = False
+            while True:
+                while position < length and source[position] in _DIGITS:
+                    position += 1
+                if not dot and position < length and source[position] == '.':
+                    dot = True
+                    position += 1
+                    continue
+                # the whitespace after the number is skipped here, not read again by the loop
+                end = position
+                while position < length and source[position].isspace():
+                    position += 1
+                if position == end or position == length or not (
+                        source[position] in _DIGITS or source[position] == '.' and not dot):
+                    break
+                spaced = True
+            text = source[start:end]
+            if text == '.':
+                raise ExpressionSyntaxError("Unexpected character: .", start)
+            add_kind(NUMBER)
+            add_value(float("".join(text.split()) if spaced else text))
+        elif char in _SINGLE_KINDS:
+            add_kind(_SINGLE_KINDS[char])
+            add_value(0.0)
+        elif char == '*' or char == '/':
+            # ** and // take precedence over * and /, also when spaced out ("2 * * 3")
+            while position < length and source[position].isspace():
+                position += 1
+            if position < length and source[position] == char:
+                position += 1
+                add_kind(CARET if char == '*' else DOUBLE_SLASH)
+            else:
+                add_kind(STAR if char == '*' else SLASH)
+            add_value(0.0)
+        elif char in _NAME_START:
+            while position < length and source[position] in _NAME_CHARS:
+                position += 1
+            add_kind(NAME)
+            add_value(0.0)
+        elif char.isspace():
+            continue
+        else:
+            raise ExpressionSyntaxError(f"Unexpected character: {char}", start)
+        add_offset(start)
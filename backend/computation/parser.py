@@ -1,107 +1,254 @@
-import re
-from typing import List
+import time
+from typing import Callable, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Tuple, Union
 import math
+import operator
+
+from .budget import BudgetExceededError, EvaluationBudget
+from .cache import LRUCache
+from .lexer import (
+    NUMBER, MINUS, LPAREN, RPAREN, NAME, OPERATOR_KINDS, ExpressionSyntaxError, TokenBuffer, tokenize,
+)
+
+# Opcode for unary minus in compiled code
+NEGATE = 'neg'
+
+# Shared cache of compiled expressions, keyed on the normalized expression
+expression_cache = LRUCache(maxsize=1024)
+
+
+def normalize_expression(expression: str) -> str:
+    """
+    Brings an expression to the canonical form used as a cache key.
+    Runs of whitespace collapse to one space rather than disappear,
+    because whitespace separates names ("x y" is not "xy")
+    """
+    expression = " ".join(expression.split()).lower()
+    return expression.replace("**", "^")
+
+
+class Operator(NamedTuple):
+    """Binary operator description used by the precedence-climbing engine"""
+    symbol: str
+    precedence: int
+    right_associative: bool
+    apply: Callable[[float, float], float]
+
+
+def _divide(left: float, right: float) -> float:
+    if right == 0:
+        raise ValueError("Div by zero")
+    return left / right
+
+
+def _floor_divide(left: float, right: float) -> float:
+    if right == 0:
+        raise ValueError("Div by zero")
+    return float(math.floor(left / right))
+
+
+def _power(left: float, right: float) -> float:
+    if left == 0 and right < 0:
+        raise ValueError("Div by zero")
+    if left < 0 < right < 1:
+        raise ValueError("sqrt(-1)")
+    return left ** right
+
+
+# Binary operators, all left-associative. '/' shares the priority of '//'
+# (the recursive parser matched it on that level), so 1 / 7 // 2 == (1 / 7) // 2
+OPERATORS: Dict[str, Operator] = {op.symbol: op for op in (
+    Operator('+', 1, False, operator.add),
+    Operator('-', 1, False, operator.sub),
+    Operator('*', 2, False, operator.mul),
+    Operator('/', 3, False, _divide),
+    Operator('//', 3, False, _floor_divide),
+    Operator('^', 4, False, _power),
+)}
+
+# Unary minus binds tighter than any binary operator: -2^2 == (-2)^2
+_NEGATE_OPERATOR = Operator(NEGATE, 5, True, None)
+
+# Marker of an open parenthesis on the operator stack; its zero precedence stops popping
+_PAREN = Operator('(', 0, False, None)
+
+# Token kind -> binary operator
+_OPERATORS_BY_KIND = {OPERATOR_KINDS[symbol]: op for symbol, op in OPERATORS.items()}
+
+
+class Variable(NamedTuple):
+    """Reference to a free variable in compiled code"""
+    name: str
+
+
+class CompiledExpression(NamedTuple):
+    """Immutable evaluation plan: the expression in reverse Polish notation"""
+    expression: str
+    code: Tuple[Union[float, str, Variable], ...]
+    # names of the free variables the expression refers to
+    variables: FrozenSet[str] = frozenset()
+    token_count: int = 0
+    # deepest nesting of parentheses
+    depth: int = 0
+
+    def evaluate(self, variables: Optional[Mapping[str, float]] = None,
+                 budget: Optional[EvaluationBudget] = None) -> float:
+        """Computes the value of the compiled expression"""
+        if budget is not None:
+            return self._evaluate_within(budget, variables)
+        operators = OPERATORS
+        stack = []
+        for item in self.code:
+            if item.__class__ is float:
+                stack.append(item)
+            elif item.__class__ is Variable:
+                stack.append(_lookup(variables, item.name))
+            elif item == NEGATE:
+                stack[-1] = -stack[-1]
+            else:
+                right = stack.pop()
+                stack[-1] = operators[item].apply(stack[-1], right)
+        return stack[0]
+
+    def _evaluate_within(self, budget: EvaluationBudget,
+                         variables: Optional[Mapping[str, float]]) -> float:
+        """Same as evaluate, checking power magnitudes and the deadline on the way"""
+        deadline = time.monotonic() + budget.timeout
+        operators = OPERATORS
+        stack = []
+        for step, item in enumerate(self.code):
+            if not step & 255 and time.monotonic() > deadline:
+                raise BudgetExceededError("Evaluation took too long", "timeout")
+            if item.__class__ is float:
+                stack.append(item)
+            elif item.__class__ is Variable:
+                stack.append(_lookup(variables, item.name))
+            elif item == NEGATE:
+                stack[-1] = -stack[-1]
+            else:
+                right = stack.pop()
+                if item == '^':
+                    budget.check_power(stack[-1], right)
+                stack[-1] = operators[item].apply(stack[-1], right)
+        return stack[0]
+
+
+def _lookup(variables: Optional[Mapping[str, float]], name: str) -> float:
+    if variables is None or name not in variables:
+        raise ValueError(f"Unknown variable: {name}")
+    return variables[name]
 
 
 class Parser:
-    def __init__(self):
+    def __init__(self, cache: Optional[LRUCache] = None, budget: Optional[EvaluationBudget] = None,
+                 on_stage: Optional[Callable[[str, float], None]] = None):
         self.tokens = []
         self.current_token = 0
+        self.depth = 0
+        self.cache = expression_cache if cache is None else cache
+        self.budget = budget
+        # called with ("tokenize" | "parse", seconds) for every expression compiled on a cache miss
+        self.on_stage = on_stage
 
     def parse_expression(self, expression: str) -> float:
         """Parses and computes an arithmetic expression"""
-        # Удаляем пробелы
-        expression = expression.replace(" ", "").lower()
-        expression = expression.replace("**", "^")
-        self.tokens = self._tokenize(expression)
+        return self.compile(expression).evaluate(budget=self.budget)
+
+    def compile(self, expression: str) -> CompiledExpression:
+        """Returns the evaluation plan of an expression, reusing a cached one when possible"""
+        if self.budget is not None:
+            # bounds the cost of tokenizing and parsing on a miss
+            self.budget.check_length(expression)
+        key = normalize_expression(expression)
+        compiled = self.cache.get(key)
+        if compiled is None:
+            compiled = self._compile(expression, key)
+            self.cache.put(key, compiled)
+        if self.budget is not None:
+            # checked on hits too: the plan may have been cached by a parser without a budget
+            self.budget.check_size(compiled.token_count, compiled.depth)
+        return compiled
+
+    def _compile(self, expression: str, key: str) -> CompiledExpression:
+        """Turns an expression into an evaluation plan; error positions refer to the raw expression"""
+        started = time.perf_counter()
+        self.tokens = tokenize(expression)
+        tokenized = time.perf_counter()
         self.current_token = 0
-
-        result = self._parse_operations(['+-', '*/', '//', '^'])
-
-        if self.current_token < len(self.tokens):
-            raise ValueError(f"Unexpected token: {self.tokens[self.current_token]}")
-
-        return result
-
-    def _tokenize(self, expression: str) -> List[str]:
-        """Splits the expression into tokens"""
-        pattern = r'(\d+\.?\d*|\.\d+|//|[+\-*/^()])'
-        tokens = re.findall(pattern, expression)
-        
-        return tokens
-
-    def _parse_operations(self, operation_levels: List[str]) -> float:
+        code = tuple(self._parse())
+        if self.on_stage is not None:
+            self.on_stage("tokenize", tokenized - started)
+            self.on_stage("parse", time.perf_counter() - tokenized)
+        names = frozenset(item.name for item in code if item.__class__ is Variable)
+        return CompiledExpression(key, code, names, len(self.tokens), self.depth)
+
+    def _parse(self) -> List[Union[float, str]]:
         """
-        Recursively parses operations based on priority levels
-        operation_levels: list of lines with operators in order of priority (from low to high)
+        Converts the tokens to postfix code with an iterative shunting-yard loop,
+        so the depth of parentheses is limited by memory instead of the Python stack
         """
-        if not operation_levels:
-            return self._parse_factor()
-
-        current_ops = operation_levels[0]
-        result = self._parse_operations(operation_levels[1:])
-
-        while (self.current_token < len(self.tokens) and
-               self.tokens[self.current_token] in current_ops):
-
-            operator = self.tokens[self.current_token]
-            self.current_token += 1
-
-            right_operand = self._parse_operations(operation_levels[1:])
-
-            if operator == '+':
-                result += right_operand
-            elif operator == '-':
-                result -= right_operand
-            elif operator == '*':
-                result *= right_operand
-            elif operator == '/':
-                if right_operand == 0:
-                    raise ValueError("Div by zero")
-                result /= right_operand
-            elif operator == '^':
-                if result == 0 and right_operand < 0:
-                    raise ValueError("Div by zero")
-                if result < 0 < right_operand < 1:
-                    raise ValueError("sqrt(-1)")
-                result **= right_operand
-            elif operator == '//':
-                if right_operand == 0:
-                    raise ValueError("Div by zero")
-                result = float(math.floor(result / right_operand))
-
-        return result
-
-    def _parse_factor(self) -> float:
-        """Parse (values, parenthesis, minus)"""
-        if self.current_token >= len(self.tokens):
-            raise ValueError("Unexpected end of expression")
-
-        token = self.tokens[self.current_token]
-
-        if token == '-':
-            self.current_token += 1
-            return -self._parse_factor()
-
-        if token == '(':
-            self.current_token += 1
-            result = self._parse_operations(['+-', '*/', '//', '^'])
-            if (self.current_token >= len(self.tokens) or
-                    self.tokens[self.current_token] != ')'):
-                raise ValueError("Closing parenthesis is missing")
-            self.current_token += 1
-            return result
-
-        if self._is_number(token):
-            self.current_token += 1
-            return float(token)
-
-        raise ValueError(f"Unexpected token: {token}")
-
-    def _is_number(self, token: str) -> bool:
-        """Checking that this is a number"""
-        try:
-            float(token)
-            return True
-        except ValueError:
-            return False
\ No newline at end of file
+        tokens: TokenBuffer = self.tokens
+        values = tokens.values
+        operators = _OPERATORS_BY_KIND
+        code = []
+        append = code.append
+        # pending operators (and open parentheses), lowest priority at the bottom
+        stack = []
+        # offsets of the parentheses that are still open
+        open_parens = []
+        depth = 0
+        expect_operand = True
+
+        for index, kind in enumerate(tokens.kinds):
+            if expect_operand:
+                if kind == NUMBER:
+                    append(values[index])
+                    expect_operand = False
+                elif kind == NAME:
+                    append(Variable(tokens.text(index).lower()))
+                    expect_operand = False
+                elif kind == MINUS:
+                    stack.append(_NEGATE_OPERATOR)
+                elif kind == LPAREN:
+                    stack.append(_PAREN)
+                    open_parens.append(tokens.offsets[index])
+                    if len(open_parens) > depth:
+                        depth = len(open_parens)
+                else:
+                    self._unexpected(index)
+                continue
+
+            op = operators.get(kind)
+            if op is not None:
+                # pop everything that binds at least as tightly (strictly tighter for right associativity)
+                threshold = op.precedence + op.right_associative
+                while stack and stack[-1].precedence >= threshold:
+                    append(stack.pop().symbol)
+                stack.append(op)
+                expect_operand = True
+            elif kind == RPAREN:
+                while stack and stack[-1] is not _PAREN:
+                    append(stack.pop().symbol)
+                if not stack:
+                    self._unexpected(index)
+                stack.pop()
+                open_parens.pop()
+            else:
+                self._unexpected(index)
+
+        self.current_token = len(tokens)
+        self.depth = depth
+        if expect_operand:
+            raise ExpressionSyntaxError("Unexpected end of expression", len(tokens.source))
+
+        while stack:
+            top = stack.pop()
+            if top is _PAREN:
+                raise ExpressionSyntaxError("Closing parenthesis is missing", open_parens[-1])
+            append(top.symbol)
+
+        return code
+
+    def _unexpected(self, index: int) -> None:
+        self.current_token = index
+        raise ExpressionSyntaxError(f"Unexpected token: {self.tokens.text(index)}",
+                                    self.tokens.offsets[index])
@@ -0,0 +1,188 @@
+from typing import List, NamedTuple, Optional
+
+from .budget import EvaluationBudget
+from .lexer import NUMBER, MINUS, LPAREN, RPAREN, NAME, ExpressionSyntaxError, TokenBuffer, retokenize
+from .parser import NEGATE, OPERATORS, _NEGATE_OPERATOR, _OPERATORS_BY_KIND, _PAREN, Variable
+
+
+class _State(NamedTuple):
+    """
+    Shunting-yard state after a prefix of the tokens, with the code emitted so far already
+    evaluated. The stacks are linked (top, rest) pairs shared with the earlier states,
+    so keeping the state of every prefix costs O(1) per token
+    """
+    operators: Optional[tuple]
+    # offsets of the parentheses that are still open
+    parens: Optional[tuple]
+    open_count: int
+    depth: int
+    expect_operand: bool
+    values: Optional[tuple]
+    # first error raised by the emitted code; reported only if the whole expression parses
+    error: Optional[Exception]
+
+
+_INITIAL = _State(None, None, 0, 0, True, None, None)
+
+# Errors of a single evaluation; anything else is a bug and propagates
+EVALUATION_ERRORS = (ValueError, ArithmeticError, TypeError)
+
+
+def _emit(item, values: Optional[tuple], error: Optional[Exception],
+          budget: Optional[EvaluationBudget]):
+    """Applies one item of postfix code to the value stack; returns (values, error)"""
+    if error is not None:
+        return values, error
+    try:
+        if item.__class__ is float:
+            return (item, values), None
+        if item.__class__ is Variable:
+            raise ValueError(f"Unknown variable: {item.name}")
+        if item == NEGATE:
+            return (-values[0], values[1]), None
+        right, (left, rest) = values
+        if item == '^' and budget is not None:
+            budget.check_power(left, right)
+        return (OPERATORS[item].apply(left, right), rest), None
+    except EVALUATION_ERRORS as e:
+        return None, e
+
+
+class PreviewSession:
+    """
+    Expression that is edited in place and re-evaluated after every change.
+    The tokens before the first changed character are not lexed again, and parsing and
+    evaluation resume from the state saved after them, so typing at the end of a long
+    expression costs time proportional to the edit rather than to the expression.
+    Results and errors are the same as those of Parser.parse_expression
+    """
+
+    def __init__(self, budget: Optional[EvaluationBudget] = None):
+        self.budget = budget
+        self.source = ""
+        self.tokens = TokenBuffer("")
+        # _states[i] is the state after the first i tokens
+        self._states: List[_State] = [_INITIAL]
+        # position of the first character changed since the last evaluation
+        self._dirty: Optional[int] = 0
+        self._result = None
+        # number of tokens whose state the last evaluation reused
+        self.reused = 0
+
+    def edit(self, position: int, delete: int, insert: str) -> None:
+        """Replaces delete characters at position by insert; evaluation is deferred"""
+        if not 0 <= position <= len(self.source) or delete < 0 or position + delete > len(self.source):
+            raise ValueError("Edit is outside of the expression")
+        self.source = self.source[:position] + insert + self.source[position + delete:]
+        self._dirty = position if self._dirty is None else min(self._dirty, position)
+
+    def set(self, source: str) -> None:
+        """Replaces the whole expression, keeping the tokens of the common prefix"""
+        common = 0
+        for old, new in zip(self.source, source):
+            if old != new:
+                break
+            common += 1
+        self.edit(common, len(self.source) - common, source[common:])
+
+    def evaluate(self) -> float:
+        """Value of the current expression; several edits in a row are evaluated once"""
+        if self._dirty is not None:
+            if self.budget is not None:
+                # before any work, and with the tokens left as they are
+                self.budget.check_length(self.source)
+            try:
+                self._result = self._update(self._dirty)
+            except EVALUATION_ERRORS as e:
+                self._result = e
+            self._dirty = None
+        if isinstance(self._result, Exception):
+            raise self._result
+        return self._result
+
+    def _update(self, start: int) -> float:
+        tokens = self.tokens
+        try:
+            # a previous evaluation may have stopped at a syntax error before the kept tokens
+            kept = min(retokenize(tokens, self.source, start), len(self._states) - 1)
+        except ExpressionSyntaxError:
+            # the tokens are only lexed up to the unknown character; parse again from scratch
+            kept = 0
+            raise
+        finally:
+            del self._states[kept + 1:]
+        self.reused = kept
+        states = self._states
+        state = states[-1]
+        for index in range(kept, len(tokens)):
+            state = self._advance(state, index)
+            states.append(state)
+        return self._finish(state)
+
+    def _advance(self, state: _State, index: int) -> _State:
+        """State after one more token; mirrors the loop of Parser._parse"""
+        operators, parens, open_count, depth, expect_operand, values, error = state
+        tokens = self.tokens
+        budget = self.budget
+        kind = tokens.kinds[index]
+
+        if expect_operand:
+            if kind == NUMBER:
+                values, error = _emit(tokens.values[index], values, error, budget)
+                expect_operand = False
+            elif kind == NAME:
+                values, error = _emit(Variable(tokens.text(index).lower()), values, error, budget)
+                expect_operand = False
+            elif kind == MINUS:
+                operators = (_NEGATE_OPERATOR, operators)
+            elif kind == LPAREN:
+                operators = (_PAREN, operators)
+                parens = (tokens.offsets[index], parens)
+                open_count += 1
+                depth = max(depth, open_count)
+            else:
+                self._unexpected(index)
+            return _State(operators, parens, open_count, depth, expect_operand, values, error)
+
+        op = _OPERATORS_BY_KIND.get(kind)
+        if op is not None:
+            threshold = op.precedence + op.right_associative
+            while operators is not None and operators[0].precedence >= threshold:
+                values, error = _emit(operators[0].symbol, values, error, budget)
+                operators = operators[1]
+            operators = (op, operators)
+            expect_operand = True
+        elif kind == RPAREN:
+            while operators is not None and operators[0] is not _PAREN:
+                values, error = _emit(operators[0].symbol, values, error, budget)
+                operators = operators[1]
+            if operators is None:
+                self._unexpected(index)
+            operators = operators[1]
+            parens = parens[1]
+            open_count -= 1
+        else:
+            self._unexpected(index)
+        return _State(operators, parens, open_count, depth, expect_operand, values, error)
+
+    def _finish(self, state: _State) -> float:
+        if state.expect_operand:
+            raise ExpressionSyntaxError("Unexpected end of expression", len(self.source))
+        operators, values, error = state.operators, state.values, state.error
+        while operators is not None:
+            if operators[0] is _PAREN:
+                raise ExpressionSyntaxError("Closing parenthesis is missing", state.parens[0])
+            values, error = _emit(operators[0].symbol, values, error, self.budget)
+            operators = operators[1]
+        if self.budget is not None:
+            self.budget.check_size(len(self.tokens), state.depth)
+        if error is not None:
+            raise error
+        value = values[0]
+        if value.__class__ is complex:
+            raise ValueError("sqrt(-1)")
+        return value
+
+    def _unexpected(self, index: int) -> None:
+        raise ExpressionSyntaxError(f"Unexpected token: {self.tokens.text(index)}",
+                                    self.tokens.offsets[index])
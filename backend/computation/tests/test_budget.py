@@ -0,0 +1,53 @@
+from ..budget import BudgetExceededError, EvaluationBudget
+from ..cache import LRUCache
+from ..parser import Parser
+import pytest
+
+
+@pytest.fixture
+def budget():
+    return EvaluationBudget(max_length=100, max_tokens=30, max_depth=5, max_magnitude=100)
+
+
+@pytest.fixture
+def par(budget):
+    return Parser(cache=LRUCache(), budget=budget)
+
+
+@pytest.mark.parametrize("expr,limit", [
+    ('1' * 101, 'max_length'),
+    ('1+' * 20 + '1', 'max_tokens'),
+    ('(' * 6 + '1' + ')' * 6, 'max_depth'),
+    ('9 ^ (9 ^ 9)', 'max_magnitude'),
+    ('10 ^ 101', 'max_magnitude'),
+    ('(-10) ^ 102', 'max_magnitude'),
+])
+def test_over_budget(par, expr, limit):
+    with pytest.raises(BudgetExceededError) as error:
+        par.parse_expression(expr)
+    assert error.value.limit == limit
+
+
+@pytest.mark.parametrize("expr,res", [
+    ('10 ^ 100', 1e100),
+    ('10 ^ -300', 1e-300),
+    ('1 ^ 100000', 1),
+    ('0 ^ 100000', 0),
+    ('(' * 5 + '1' + ')' * 5, 1),
+])
+def test_within_budget(par, expr, res):
+    assert par.parse_expression(expr) == res
+
+
+def test_checked_on_cache_hit(budget):
+    cache = LRUCache()
+    Parser(cache=cache).compile('(' * 6 + '1' + ')' * 6)
+    with pytest.raises(BudgetExceededError):
+        Parser(cache=cache, budget=budget).compile('(' * 6 + '1' + ')' * 6)
+
+
+def test_timeout(par):
+    budget = EvaluationBudget(timeout=-1)
+    with pytest.raises(BudgetExceededError) as error:
+        par.compile('1 + 1').evaluate(budget=budget)
+    assert error.value.limit == 'timeout'
@@ -0,0 +1,58 @@
+from ..cache import LRUCache
+from ..parser import Parser
+import pytest
+
+
+@pytest.fixture
+def cache():
+    return LRUCache(maxsize=2)
+
+
+def test_hits_and_misses(cache):
+    assert cache.get('a') is None
+    cache.put('a', 1)
+    assert cache.get('a') == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_eviction_order(cache):
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert cache.stats()['evictions'] == 1
+
+
+def test_bad_size():
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=0)
+
+
+@pytest.mark.parametrize("first,second", [
+    ('2 + 2*2', ' 2  +\t2*2 '),
+    ('2**5', '2^5'),
+    ('2 ** 5', '2 ^  5'),
+    ('X + 1', 'x + 1'),
+])
+def test_normalized_key(cache, first, second):
+    par = Parser(cache=cache)
+    compiled = par.compile(first)
+    assert par.compile(second) is compiled
+    assert cache.stats()['hits'] == 1
+
+
+def test_compiled_is_reused(cache):
+    par = Parser(cache=cache)
+    assert par.parse_expression('(1 + 2) * 3') == 9
+    assert par.parse_expression('(1 + 2) * 3') == 9
+    assert cache.stats() == {'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 0}
+
+
+def test_errors_are_not_cached(cache):
+    par = Parser(cache=cache)
+    with pytest.raises(ValueError):
+        par.compile('(2 + 3')
+    assert len(cache) == 0
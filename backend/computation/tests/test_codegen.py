@@ -0,0 +1,114 @@
+from ..cache import LRUCache
+from ..budget import BudgetExceededError, EvaluationBudget
+from ..codegen import MAX_GENERATED_DEPTH, fold_constants, lower
+from ..parser import NEGATE, Parser, Variable
+from .cases import (
+    SIMPLE_EXPR_1_CASES, SIMPLE_EXPR_2_CASES, OPERATION_ORDER_CASES, BRACED_EXPR_CASES,
+    UNARY_MINUS_CASES, DIVISION_CASES, FLOAT_EXPR_CASES, LARGE_SMALL_CASES, MATH_ERROR_CASES,
+    PRECEDENCE_TABLE_CASES,
+)
+import pytest
+
+
+@pytest.fixture
+def par():
+    return Parser(cache=LRUCache())
+
+
+VALUE_CASES = (SIMPLE_EXPR_1_CASES + SIMPLE_EXPR_2_CASES + OPERATION_ORDER_CASES + BRACED_EXPR_CASES
+               + UNARY_MINUS_CASES + DIVISION_CASES + FLOAT_EXPR_CASES + LARGE_SMALL_CASES
+               + PRECEDENCE_TABLE_CASES)
+
+
+@pytest.mark.parametrize("expr,res", VALUE_CASES)
+def test_same_as_interpreter(par, expr, res):
+    compiled = par.compile(expr)
+    assert lower(compiled)() == compiled.evaluate()
+    assert fold_constants(compiled).evaluate() == compiled.evaluate()
+
+
+@pytest.mark.parametrize("expr", MATH_ERROR_CASES)
+def test_errors_kept(par, expr):
+    with pytest.raises(ValueError):
+        par.compile(expr).evaluate()
+    function = lower(par.compile(expr))
+    with pytest.raises(ValueError):
+        function()
+
+
+@pytest.mark.parametrize("expr,code", [
+    ('2 * 3 + x', (6.0, Variable('x'), '+')),
+    ('x * (2 ^ 3 - -1)', (Variable('x'), 9.0, '*')),
+    ('-(1 + 1) * x', (-2.0, Variable('x'), '*')),
+    ('x / (1 - 1)', (Variable('x'), 0.0, '/')),
+    ('1 / 0 + 1', (1.0, 0.0, '/', 1.0, '+')),
+    ('-x', (Variable('x'), NEGATE)),
+])
+def test_fold_constants(par, expr, code):
+    assert fold_constants(par.compile(expr)).code == code
+
+
+@pytest.mark.parametrize("expr", [
+    'x',
+    '2 * x ^ 2 - x // 3 + 1',
+    '-x / (x + 11) ** 0.5',
+    '(x - 1) * (x - 2) * (x - 3)',
+])
+def test_variables(par, expr):
+    compiled = par.compile(expr)
+    function = lower(compiled)
+    for x in [-10.0, -2.5, 0.0, 1.0, 3.0, 7.25]:
+        try:
+            expected = compiled.evaluate({'x': x})
+        except ValueError:
+            with pytest.raises(ValueError):
+                function({'x': x})
+        else:
+            assert function({'x': x}) == expected
+
+
+def test_unknown_variable(par):
+    function = lower(par.compile('x + y'))
+    with pytest.raises(ValueError, match="Unknown variable: y"):
+        function({'x': 1})
+    with pytest.raises(ValueError, match="Unknown variable: x"):
+        function()
+
+
+@pytest.mark.parametrize("names", ['lambda', 'v', '__import__', '_power'])
+def test_names_are_data(par, names):
+    assert lower(par.compile(f'{names} * 2'))({names: 4}) == 8
+
+
+def test_deep_expression_falls_back(par):
+    depth = MAX_GENERATED_DEPTH * 10
+    compiled = par.compile('(' * depth + 'x' + ' + 1)' * depth)
+    assert lower(compiled)({'x': 1}) == depth + 1
+
+
+def test_budget(par):
+    budget = EvaluationBudget(max_magnitude=10)
+    function = lower(par.compile('x ^ 20 + 10 ^ 11'), budget)
+    with pytest.raises(BudgetExceededError):
+        function({'x': 1})
+    function = lower(par.compile('x ^ 20'), budget)
+    assert function({'x': 2}) == 2 ** 20
+    with pytest.raises(BudgetExceededError):
+        function({'x': 10})
+
+
+@pytest.mark.parametrize("expr,code", [
+    ('x * 2 ^ 3', (Variable('x'), 8.0, '*')),
+    ('x + 10 ^ 11', (Variable('x'), 10.0, 11.0, '^', '+')),
+    ('(10 ^ 11 + 1) * 0 + 2 * 3', (10.0, 11.0, '^', 1.0, '+', 0.0, '*', 6.0, '+')),
+])
+def test_fold_constants_under_budget(par, expr, code):
+    budget = EvaluationBudget(max_magnitude=10)
+    assert fold_constants(par.compile(expr), budget).code == code
+
+
+def test_kept_power_is_still_checked(par):
+    budget = EvaluationBudget(max_magnitude=10)
+    function = lower(par.compile('(10 ^ 11 + 1) * 0 + 2 * 3'), budget)
+    with pytest.raises(BudgetExceededError):
+        function()
@@ -0,0 +1,77 @@
+from ..budget import BudgetExceededError, EvaluationBudget
+from ..cache import LRUCache
+from ..executor import EvaluationPool, EvaluationPoolFullError, estimate_cost
+from ..parser import CompiledExpression, Parser
+import pickle
+import threading
+import pytest
+
+
+@pytest.fixture
+def par():
+    return Parser(cache=LRUCache())
+
+
+@pytest.fixture
+def pool():
+    pool = EvaluationPool(workers=1, max_pending=1, threshold=10, timeout=30)
+    yield pool
+    pool.stop()
+
+
+def slow_plan(operations: int = 2_000_000) -> CompiledExpression:
+    return CompiledExpression('slow', (1.0,) + (1.0, '+') * operations)
+
+
+def test_estimate_cost(par):
+    assert estimate_cost(par.compile('1 + 2')) == 3
+    assert estimate_cost(par.compile('2 ^ 3')) == 3 + 3
+
+
+def test_cheap_expressions_stay_inline(par, pool):
+    assert pool.evaluate(par.compile('1 + 2')) == 3
+    assert pool.stats()['inline'] == 1
+    assert pool.stats()['offloaded'] == 0
+
+
+def test_offloaded(par, pool):
+    expression = ' + '.join(f'{i} * x' for i in range(1, 21))
+    assert pool.evaluate(par.compile(expression), {'x': 2.0}) == par.compile(expression).evaluate({'x': 2.0})
+    with pytest.raises(ValueError, match='Div by zero'):
+        pool.evaluate(par.compile(' + '.join(['1'] * 10) + ' / 0'))
+    with pytest.raises(BudgetExceededError) as error:
+        pool.evaluate(par.compile(' + '.join(['1'] * 10) + ' + 10 ^ 400'), budget=EvaluationBudget())
+    assert error.value.limit == 'max_magnitude'
+    assert pool.stats()['offloaded'] == 3
+
+
+def test_budget_error_pickles():
+    error = pickle.loads(pickle.dumps(BudgetExceededError('too long', 'timeout')))
+    assert (str(error), error.limit) == ('too long', 'timeout')
+
+
+def test_timeout_restarts_workers(par):
+    pool = EvaluationPool(workers=1, threshold=10, timeout=0.05)
+    try:
+        with pytest.raises(BudgetExceededError) as error:
+            pool.evaluate(slow_plan())
+        assert error.value.limit == 'timeout'
+        assert pool.stats()['timeouts'] == 1
+        # the pool keeps working afterwards
+        pool.timeout = 30
+        assert pool.evaluate(par.compile(' + '.join(['1'] * 10))) == 10
+    finally:
+        pool.stop()
+
+
+def test_queue_limit(par, pool):
+    started = threading.Thread(target=pool.evaluate, args=(slow_plan(),))
+    started.start()
+    try:
+        while not pool.stats()['pending']:
+            pass
+        with pytest.raises(EvaluationPoolFullError):
+            pool.evaluate(par.compile(' + '.join(['1'] * 10)))
+        assert pool.stats()['rejected'] == 1
+    finally:
+        started.join()
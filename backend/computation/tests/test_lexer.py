@@ -0,0 +1,99 @@
+from ..lexer import (
+    NUMBER, PLUS, MINUS, STAR, SLASH, DOUBLE_SLASH, CARET, LPAREN, RPAREN, NAME,
+    ExpressionSyntaxError, retokenize, tokenize,
+)
+from ..parser import Parser
+from ..cache import LRUCache
+import pytest
+
+
+@pytest.fixture
+def par():
+    return Parser(cache=LRUCache())
+
+
+@pytest.mark.parametrize("expr,kinds", [
+    ('1+2', [NUMBER, PLUS, NUMBER]),
+    (' ( 3 - 4 ) ', [LPAREN, NUMBER, MINUS, NUMBER, RPAREN]),
+    ('2**3^4', [NUMBER, CARET, NUMBER, CARET, NUMBER]),
+    ('6//2/1*5', [NUMBER, DOUBLE_SLASH, NUMBER, SLASH, NUMBER, STAR, NUMBER]),
+    ('2*x_1 - Y', [NUMBER, STAR, NAME, MINUS, NAME]),
+    ('', []),
+    ('   ', []),
+])
+def test_kinds(expr, kinds):
+    assert list(tokenize(expr).kinds) == kinds
+
+
+def test_values_and_offsets():
+    tokens = tokenize(' 12.5 + .5 *  3.')
+    assert list(tokens.values) == [12.5, 0.0, 0.5, 0.0, 3.0]
+    assert list(tokens.offsets) == [1, 6, 8, 11, 14]
+    assert [tokens.text(i) for i in range(len(tokens))] == ['12.5', '+', '.5', '*', '3.']
+
+
+@pytest.mark.parametrize("before,position,delete,insert,kept", [
+    ('12 + 3', 6, 0, '4', 2),       # typing at the end re-lexes the last token: 3 -> 34
+    ('12 + 3', 1, 1, '', 0),        # 12 -> 1
+    ('2 * 3', 3, 0, '*', 1),        # * -> **
+    ('1 + 2 * 3', 8, 1, '(4 - 5)', 3),
+    ('x + y', 0, 0, '-', 0),
+    ('', 0, 0, '7 // 2', 0),
+])
+def test_retokenize(before, position, delete, insert, kept):
+    after = before[:position] + insert + before[position + delete:]
+    tokens = tokenize(before)
+    assert retokenize(tokens, after, position) == kept
+    expected = tokenize(after)
+    assert tokens.source == after
+    assert list(tokens.kinds) == list(expected.kinds)
+    assert list(tokens.values) == list(expected.values)
+    assert list(tokens.offsets) == list(expected.offsets)
+
+
+@pytest.mark.parametrize("expr,position", [
+    ('9 @ 8', 2),
+    ('$ + 4', 0),
+    ('7 - 8 + # - 10', 8),
+    ('x + ü', 4),
+    ('0,3', 1),
+    ("2'000'000", 1),
+    ('6 = 4', 2),
+    ('1 + ²', 4),
+    ('你们', 0),
+])
+def test_unknown_character(expr, position):
+    with pytest.raises(ExpressionSyntaxError) as error:
+        tokenize(expr)
+    assert error.value.position == position
+
+
+@pytest.mark.parametrize("expr,position", [
+    ('1 + * 2', 4),
+    ('(2 + 3', 0),
+    ('((2 + 3)', 0),
+    ('2 + 3)', 5),
+    ('(4 + 5)(7 + 8)', 7),
+    ('1.000.000', 5),
+    ('2x', 1),
+    ('x y', 2),
+    ('1 +', 3),
+    ('', 0),
+])
+def test_syntax_error_position(par, expr, position):
+    with pytest.raises(ExpressionSyntaxError) as error:
+        par.parse_expression(expr)
+    assert error.value.position == position
+
+
+@pytest.mark.parametrize("expr,expected", [
+    ('2 3', 23),
+    ('1 000 + 1', 1001),
+    ('1 . 5', 1.5),
+    ('. 5 * 2', 1),
+    ('2 * * 3', 8),
+    ('7 / / 2', 3),
+])
+def test_spaces_inside_numbers_and_operators(par, expr, expected):
+    # as in the original parser, which removed all spaces before tokenizing
+    assert par.parse_expression(expr) == expected
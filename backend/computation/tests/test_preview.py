@@ -0,0 +1,125 @@
+from ..cache import LRUCache
+from ..budget import BudgetExceededError, EvaluationBudget
+from ..lexer import ExpressionSyntaxError
+from ..parser import Parser
+from ..preview import PreviewSession
+from .cases import (
+    SIMPLE_EXPR_1_CASES, SIMPLE_EXPR_2_CASES, OPERATION_ORDER_CASES, BRACED_EXPR_CASES,
+    UNARY_MINUS_CASES, DIVISION_CASES, FLOAT_EXPR_CASES, LARGE_SMALL_CASES, MATH_ERROR_CASES,
+    BAD_CASES, PRECEDENCE_TABLE_CASES,
+)
+import random
+import pytest
+
+
+VALUE_CASES = (SIMPLE_EXPR_1_CASES + SIMPLE_EXPR_2_CASES + OPERATION_ORDER_CASES + BRACED_EXPR_CASES
+               + UNARY_MINUS_CASES + DIVISION_CASES + FLOAT_EXPR_CASES + LARGE_SMALL_CASES
+               + PRECEDENCE_TABLE_CASES)
+
+ALL_EXPRESSIONS = [expr for expr, _ in VALUE_CASES] + MATH_ERROR_CASES + BAD_CASES
+
+
+def outcome(function):
+    """Value, or the type, message and position of the error"""
+    try:
+        return function()
+    except (ValueError, ArithmeticError) as e:
+        return type(e), str(e), getattr(e, 'position', None)
+
+
+@pytest.mark.parametrize("expr", ALL_EXPRESSIONS)
+def test_typed_character_by_character(expr):
+    session = PreviewSession()
+    for position, char in enumerate(expr):
+        session.edit(position, 0, char)
+        assert outcome(session.evaluate) == outcome(
+            lambda: Parser(cache=LRUCache()).parse_expression(expr[:position + 1]))
+
+
+def test_random_edits():
+    rng = random.Random(12)
+    session = PreviewSession()
+    text = ""
+    for _ in range(3000):
+        position = rng.randint(0, len(text))
+        delete = rng.randint(0, min(3, len(text) - position))
+        insert = "".join(rng.choice("0123456789.+-*/^() ") for _ in range(rng.randint(0, 3)))
+        session.edit(position, delete, insert)
+        text = text[:position] + insert + text[position + delete:]
+        if rng.random() < 0.7:
+            actual = outcome(session.evaluate)
+            reference = outcome(lambda: Parser(cache=LRUCache()).parse_expression(text))
+            if isinstance(reference, complex):
+                reference = (ValueError, "sqrt(-1)", None)
+            if isinstance(actual, float) and isinstance(reference, float) and actual != actual:
+                continue
+            assert actual == reference, text
+    assert session.source == text
+
+
+def test_prefix_reused():
+    session = PreviewSession()
+    session.set("1 + 2 * 3 - 4 / 5")
+    session.evaluate()
+    session.edit(len(session.source), 0, "0")
+    assert session.evaluate() == 1 + 2 * 3 - 4 / 50
+    assert session.reused == 8
+
+
+def test_edits_between_evaluations():
+    session = PreviewSession()
+    session.set("2 + 2")
+    assert session.evaluate() == 4
+    session.edit(4, 1, "3")
+    session.edit(0, 1, "10")
+    assert session.source == "10 + 3"
+    assert session.evaluate() == 13
+
+
+def test_set_keeps_common_prefix():
+    session = PreviewSession()
+    session.set("12 + 34 + 5")
+    session.evaluate()
+    session.set("12 + 34 - 5")
+    assert session.evaluate() == 41
+    assert session.reused == 2
+
+
+def test_errors():
+    session = PreviewSession()
+    session.set("(1 / 0")
+    with pytest.raises(ExpressionSyntaxError) as error:
+        session.evaluate()
+    assert error.value.position == 0
+    session.edit(6, 0, ")")
+    with pytest.raises(ValueError, match="Div by zero"):
+        session.evaluate()
+    session.set("(-8) ^ 0.5")
+    with pytest.raises(ValueError, match="sqrt"):
+        session.evaluate()
+
+
+@pytest.mark.parametrize("edit", [(2, 0, "x"), (0, 2, ""), (-1, 0, "")])
+def test_invalid_edit(edit):
+    session = PreviewSession()
+    session.set("1")
+    with pytest.raises(ValueError):
+        session.edit(*edit)
+
+
+def test_budget():
+    session = PreviewSession(budget=EvaluationBudget(max_length=10, max_depth=2))
+    session.set("10 ^ 400")
+    with pytest.raises(BudgetExceededError) as error:
+        session.evaluate()
+    assert error.value.limit == "max_magnitude"
+    session.set("(((1)))")
+    with pytest.raises(BudgetExceededError) as error:
+        session.evaluate()
+    assert error.value.limit == "max_depth"
+    session.set("1 + 2 + 3 + 4")
+    with pytest.raises(BudgetExceededError) as error:
+        session.evaluate()
+    assert error.value.limit == "max_length"
+    session.edit(5, 8, "")
+    assert session.evaluate() == 3
@@ -0,0 +1,49 @@
+from ..parser import Parser
+from ..cache import LRUCache
+from ..vectorized import OK, DIV_BY_ZERO, NEGATIVE_ROOT, OVERFLOW, tabulate
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def par():
+    return Parser(cache=LRUCache())
+
+
+@pytest.mark.parametrize("expr", [
+    'x',
+    '2 * x ^ 2 - x + 1',
+    '-x // 3 + x / 7',
+    '(x + 1) ** 2 * -(x - 2)',
+    '5',
+])
+def test_matches_scalar(par, expr):
+    points = np.linspace(-10, 10, 41)
+    compiled = par.compile(expr)
+    table = tabulate(compiled, 'x', points)
+    assert not table.errors.any()
+    expected = [compiled.evaluate({'x': x}) for x in points.tolist()]
+    assert np.allclose(table.values, expected)
+
+
+def test_masks_instead_of_abort(par):
+    table = tabulate(par.compile('1 / x + x ^ 0.5'), 'x', [-4, 0, 4])
+    assert table.errors.tolist() == [NEGATIVE_ROOT, DIV_BY_ZERO, OK]
+    assert np.isnan(table.values[:2]).all()
+    assert table.values[2] == 2.25
+    assert table.messages() == ['sqrt(-1)', 'Div by zero', None]
+
+
+def test_first_error_wins(par):
+    table = tabulate(par.compile('(1 // x) ^ 0.5'), 'x', [0])
+    assert table.errors.tolist() == [DIV_BY_ZERO]
+
+
+def test_overflow(par):
+    table = tabulate(par.compile('10 ^ x'), 'x', [1, 400])
+    assert table.errors.tolist() == [OK, OVERFLOW]
+
+
+def test_other_variable(par):
+    with pytest.raises(ValueError, match="Unknown variable"):
+        tabulate(par.compile('x + y'), 'x', [1, 2])
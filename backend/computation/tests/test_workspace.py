@@ -0,0 +1,125 @@
+from .. import codegen
+from ..budget import EvaluationBudget
+from ..cache import LRUCache
+from ..parser import Parser, Variable
+from ..workspace import CyclicDependencyError, Workspace
+import pytest
+
+
+@pytest.fixture
+def ws():
+    return Workspace(parser=Parser(cache=LRUCache()))
+
+
+def test_define_and_refer(ws):
+    assert ws.define('a', '2*3').value == 6
+    result = ws.define('b', 'a^2 + 1')
+    assert result.value == 37
+    assert ws.evaluate('a + b') == 43
+
+
+def test_update_recomputes_dependents_only(ws):
+    ws.define('a', '1')
+    ws.define('b', 'a + 1')
+    ws.define('c', 'b * 2')
+    ws.define('unrelated', '100')
+    result = ws.define('a', '5')
+    assert result.recomputed == 3
+    assert result.changed == {'a': 5, 'b': 6, 'c': 12}
+    assert ws.get('c').value == 12
+
+
+def test_diamond_in_topological_order(ws):
+    ws.define('a', '1')
+    ws.define('b', 'a + 1')
+    ws.define('c', 'a * 10')
+    ws.define('d', 'b + c')
+    result = ws.define('a', '2')
+    assert result.recomputed == 4
+    assert ws.get('d').value == 23
+
+
+def test_unchanged_value_stops_propagation(ws):
+    ws.define('a', '3')
+    ws.define('b', 'a // 2')
+    ws.define('c', 'b + 1')
+    result = ws.define('a', '3.5')
+    # b is still 1, so c is not evaluated again
+    assert result.recomputed == 2
+    assert result.changed == {'a': 3.5}
+
+
+def test_same_definition_recomputes_one(ws):
+    ws.define('a', '3')
+    ws.define('b', 'a + 1')
+    assert ws.define('a', '1 + 2').recomputed == 1
+
+
+def test_forward_reference(ws):
+    assert ws.define('b', 'a + 1').error == "Unknown variable: a"
+    result = ws.define('a', '1')
+    assert result.changed == {'a': 1, 'b': 2}
+
+
+def test_errors_propagate(ws):
+    ws.define('a', '0')
+    ws.define('b', '1 / a')
+    ws.define('c', 'b + 1')
+    assert ws.get('b').error == "Div by zero"
+    assert ws.get('c').error == "Variable b has an error"
+    ws.define('a', '2')
+    assert ws.get('c').value == 1.5
+
+
+@pytest.mark.parametrize("definitions", [
+    [('a', 'a + 1')],
+    [('a', '1'), ('b', 'a'), ('a', 'b')],
+    [('a', '1'), ('b', 'a'), ('c', 'b'), ('a', 'c * 2')],
+])
+def test_cycles(ws, definitions):
+    *setup, (name, expression) = definitions
+    for definition in setup:
+        ws.define(*definition)
+    with pytest.raises(CyclicDependencyError):
+        ws.define(name, expression)
+
+
+def test_remove(ws):
+    ws.define('a', '1')
+    ws.define('b', 'a + 1')
+    ws.remove('a')
+    assert ws.get('b').error == "Unknown variable: a"
+    with pytest.raises(KeyError):
+        ws.get('a')
+
+
+@pytest.mark.parametrize("name", ['1a', 'a-b', ''])
+def test_bad_name(ws, name):
+    with pytest.raises(ValueError):
+        ws.define(name, '1')
+
+
+def test_long_chain(ws):
+    ws.define('v0', '0')
+    for i in range(1, 300):
+        ws.define(f'v{i}', f'v{i - 1} + 1')
+    result = ws.define('v0', '1')
+    assert result.recomputed == 300
+    assert ws.get('v299').value == 300
+
+
+def test_constants_folded_under_budget(monkeypatch):
+    # code of every expression lower() generates a function for
+    generated = []
+    source = codegen._source
+
+    def recording_source(compiled):
+        generated.append(compiled.code)
+        return source(compiled)
+
+    monkeypatch.setattr(codegen, '_source', recording_source)
+    ws = Workspace(parser=Parser(cache=LRUCache()), budget=EvaluationBudget(max_magnitude=10))
+    assert ws.define('a', 'x * 2 ^ 3 + (10 - 4) / 2').value is None
+    assert generated == [(Variable('x'), 8.0, '*', 3.0, '+')]
+    assert ws.define('x', '2').value == 2
+    assert ws.get('a').value == 19
@@ -0,0 +1,88 @@
+from typing import Dict, NamedTuple
+
+import numpy as np
+
+from .parser import NEGATE, CompiledExpression, Variable
+
+# Per-element error codes; 0 means the element was computed
+OK = 0
+DIV_BY_ZERO = 1
+NEGATIVE_ROOT = 2
+OVERFLOW = 3
+
+ERROR_MESSAGES: Dict[int, str] = {
+    DIV_BY_ZERO: "Div by zero",
+    NEGATIVE_ROOT: "sqrt(-1)",
+    OVERFLOW: "Overflow",
+}
+
+
+class Tabulation(NamedTuple):
+    """Values of an expression over an array of inputs; failed elements are NaN with a non-zero error code"""
+    values: np.ndarray
+    errors: np.ndarray
+
+    def messages(self) -> list:
+        """Error message of every element, None where it was computed"""
+        return [ERROR_MESSAGES.get(code) for code in self.errors.tolist()]
+
+
+def tabulate(compiled: CompiledExpression, variable: str, points) -> Tabulation:
+    """
+    Evaluates the compiled expression for every value of the variable in one vectorized pass.
+    The scalar checks of the parser become masks, so a bad element does not abort the others
+    """
+    unknown = compiled.variables - {variable}
+    if unknown:
+        raise ValueError(f"Unknown variable: {min(unknown)}")
+
+    points = np.asarray(points, dtype=np.float64)
+    if points.ndim != 1:
+        raise ValueError("Points must be a one-dimensional array")
+    errors = np.zeros(points.shape, dtype=np.uint8)
+
+    def fail(mask, code):
+        # keep the first error of every element
+        np.copyto(errors, code, where=mask & (errors == OK))
+
+    stack = []
+    with np.errstate(all='ignore'):
+        for item in compiled.code:
+            if item.__class__ is float:
+                stack.append(item)
+            elif item.__class__ is Variable:
+                stack.append(points)
+            elif item == NEGATE:
+                stack[-1] = np.negative(stack[-1])
+            else:
+                right = stack.pop()
+                left = stack[-1]
+                if item == '+':
+                    result = np.add(left, right)
+                elif item == '-':
+                    result = np.subtract(left, right)
+                elif item == '*':
+                    result = np.multiply(left, right)
+                elif item in ('/', '//'):
+                    zero = np.equal(right, 0)
+                    fail(zero, DIV_BY_ZERO)
+                    result = np.divide(left, right)
+                    if item == '//':
+                        result = np.floor(result)
+                    result = np.where(zero, np.nan, result)
+                elif item == '^':
+                    zero = np.equal(left, 0) & np.less(right, 0)
+                    # a negative base only has a real power for integer exponents
+                    root = np.less(left, 0) & np.not_equal(right, np.floor(right))
+                    fail(zero, DIV_BY_ZERO)
+                    fail(root, NEGATIVE_ROOT)
+                    result = np.where(zero | root, np.nan, np.power(left, right))
+                else:
+                    raise ValueError(f"Unknown operator: {item}")
+                overflow = np.isinf(result) & np.isfinite(left) & np.isfinite(right)
+                fail(overflow, OVERFLOW)
+                stack[-1] = result
+
+    values = np.broadcast_to(np.asarray(stack[0], dtype=np.float64), points.shape).copy()
+    values[errors != OK] = np.nan
+    return Tabulation(values, errors)
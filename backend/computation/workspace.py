@@ -0,0 +1,189 @@
+import re
+import threading
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Set
+
+from .budget import EvaluationBudget
+from .codegen import lower
+from .parser import CompiledExpression, Parser
+
+_NAME_PATTERN = re.compile(r'[a-z_][a-z0-9_]*')
+
+
+class CyclicDependencyError(ValueError):
+    """Raised when a definition would make a variable depend on itself"""
+    pass
+
+
+class Cell:
+    """A named expression together with its memoized value"""
+
+    __slots__ = ('name', 'expression', 'compiled', 'function', 'value', 'error')
+
+    def __init__(self, name: str, expression: str, compiled: CompiledExpression,
+                 function: Callable[[Mapping[str, float]], float]):
+        self.name = name
+        self.expression = expression
+        self.compiled = compiled
+        self.function = function
+        self.value: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class UpdateResult(NamedTuple):
+    name: str
+    value: Optional[float]
+    error: Optional[str]
+    # number of cells that were evaluated because of the update
+    recomputed: int
+    # new value (None on error) of every cell whose value or error changed
+    changed: Dict[str, Optional[float]]
+
+
+class Workspace:
+    """
+    Spreadsheet-like set of named expressions. Changing a definition re-evaluates only the
+    cells that depend on it, in topological order, and stops propagating through any cell
+    whose value came out unchanged
+    """
+
+    def __init__(self, parser: Optional[Parser] = None, budget: Optional[EvaluationBudget] = None,
+                 max_cells: int = 1000):
+        self.parser = parser if parser is not None else Parser(budget=budget)
+        self.budget = budget
+        self.max_cells = max_cells
+        self._cells: Dict[str, Cell] = {}
+        # name -> cells whose expressions refer to it (the name may not be defined yet)
+        self._dependents: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def define(self, name: str, expression: str) -> UpdateResult:
+        """Create or replace a variable and recompute everything that depends on it"""
+        name = name.lower()
+        if not _NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"Invalid variable name: {name}")
+        compiled = self.parser.compile(expression)
+        function = lower(compiled, self.budget)
+
+        with self._lock:
+            if name not in self._cells and len(self._cells) >= self.max_cells:
+                raise ValueError(f"A workspace is limited to {self.max_cells} variables")
+            self._check_cycle(name, compiled.variables)
+            old = self._cells.get(name)
+            if old is not None:
+                for dependency in old.compiled.variables:
+                    self._dependents[dependency].discard(name)
+            for dependency in compiled.variables:
+                self._dependents.setdefault(dependency, set()).add(name)
+            cell = Cell(name, expression, compiled, function)
+            if old is not None:
+                # dependents only need recomputing if the new definition gives another value
+                cell.value, cell.error = old.value, old.error
+            self._cells[name] = cell
+            recomputed, changed = self._propagate(name, always=True)
+            return UpdateResult(name, cell.value, cell.error, recomputed, changed)
+
+    def remove(self, name: str) -> UpdateResult:
+        """Delete a variable; cells that refer to it turn into errors"""
+        name = name.lower()
+        with self._lock:
+            cell = self._cells.pop(name, None)
+            if cell is None:
+                raise KeyError(name)
+            for dependency in cell.compiled.variables:
+                self._dependents[dependency].discard(name)
+            recomputed, changed = self._propagate(name, always=False)
+            changed[name] = None
+            return UpdateResult(name, None, None, recomputed, changed)
+
+    def get(self, name: str) -> Cell:
+        return self._cells[name.lower()]
+
+    def cells(self) -> List[Cell]:
+        with self._lock:
+            return list(self._cells.values())
+
+    def values(self) -> Dict[str, float]:
+        """Values of all variables that evaluated without error"""
+        with self._lock:
+            return {name: cell.value for name, cell in self._cells.items() if cell.error is None}
+
+    def evaluate(self, expression: str) -> float:
+        """Evaluate an expression against the current variable values"""
+        return self.parser.compile(expression).evaluate(self.values(), self.budget)
+
+    def _check_cycle(self, name: str, dependencies: Set[str]) -> None:
+        pending = list(dependencies)
+        seen = set()
+        while pending:
+            current = pending.pop()
+            if current == name:
+                raise CyclicDependencyError(f"Variable {name} would depend on itself")
+            if current in seen:
+                continue
+            seen.add(current)
+            cell = self._cells.get(current)
+            if cell is not None:
+                pending.extend(cell.compiled.variables)
+
+    def _affected(self, name: str) -> List[str]:
+        """The cell and everything that depends on it, in topological order (Kahn's algorithm)"""
+        affected = {name}
+        pending = [name]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+
+        incoming = {current: 0 for current in affected}
+        for current in affected:
+            for dependent in self._dependents.get(current, ()):
+                incoming[dependent] += 1
+        order = []
+        ready = [current for current, count in incoming.items() if count == 0]
+        while ready:
+            current = ready.pop()
+            order.append(current)
+            for dependent in self._dependents.get(current, ()):
+                incoming[dependent] -= 1
+                if not incoming[dependent]:
+                    ready.append(dependent)
+        return order
+
+    def _propagate(self, name: str, always: bool):
+        """Re-evaluate the affected cells whose inputs changed; returns (recomputed, changed)"""
+        dirty = {name} if always else set(self._dependents.get(name, ()))
+        recomputed = 0
+        changed: Dict[str, Optional[float]] = {}
+        for current in self._affected(name):
+            cell = self._cells.get(current)
+            if cell is None or current not in dirty:
+                continue
+            before = (cell.value, cell.error)
+            self._evaluate(cell)
+            recomputed += 1
+            if (cell.value, cell.error) != before:
+                changed[current] = cell.value
+                dirty.update(self._dependents.get(current, ()))
+        return recomputed, changed
+
+    def _evaluate(self, cell: Cell) -> None:
+        inputs = {}
+        for dependency in cell.compiled.variables:
+            source = self._cells.get(dependency)
+            if source is None:
+                cell.value, cell.error = None, f"Unknown variable: {dependency}"
+                return
+            if source.error is not None:
+                cell.value, cell.error = None, f"Variable {dependency} has an error"
+                return
+            inputs[dependency] = source.value
+        try:
+            value = cell.function(inputs)
+        except (ValueError, ArithmeticError) as e:
+            cell.value, cell.error = None, str(e)
+            return
+        if value.__class__ is complex:
+            cell.value, cell.error = None, "sqrt(-1)"
+        else:
+            cell.value, cell.error = value, None
@@ -1,11 +1,14 @@
 import sqlite3
 import os
 import logging
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Custom database exceptions
@@ -26,15 +29,138 @@ class DatabaseInitializationError(DatabaseError):
     pass
 
 # Database file path
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'storage', 'calculations.db')
+DB_PATH = os.environ.get('CALC_DB_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'storage', 'calculations.db')
+
+# Seconds a statement waits for another writer's lock before failing with "database is locked"
+BUSY_TIMEOUT = 5.0
+# The same while waiting for the schema lock on start, where another process may be migrating
+MIGRATION_TIMEOUT = 120.0
+# Prepared statements kept per connection (sqlite3 caches them by SQL text)
+STATEMENT_CACHE_SIZE = 128
+DEFAULT_POOL_SIZE = 8
+
+# Rows of the calculations table read, written and deleted since start, for row_stats()
+_rows = {"read": 0, "written": 0, "deleted": 0}
+_rows_lock = threading.Lock()
+
+def _count_rows(operation: str, count: int) -> None:
+    with _rows_lock:
+        _rows[operation] += count
+
+def row_stats() -> Dict[str, int]:
+    with _rows_lock:
+        return dict(_rows)
+
+# History is stored normalized: every distinct (expression, result) pair once, with the number
+# of times it was calculated, and one compact (expression_id, Unix time) row per calculation.
+# The calculations view presents the joined rows in the original layout
+CREATE_EXPRESSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS expressions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        expression TEXT NOT NULL,
+        result TEXT NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (expression, result)
+    )
+"""
+CREATE_OCCURRENCES_TABLE = """
+    CREATE TABLE IF NOT EXISTS occurrences (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        expression_id INTEGER NOT NULL REFERENCES expressions (id),
+        created_at INTEGER NOT NULL
+    )
+"""
+CREATE_CALCULATIONS_VIEW = """
+    CREATE VIEW IF NOT EXISTS calculations AS
+    SELECT o.id AS id, e.expression AS expression, e.result AS result,
+           datetime(o.created_at, 'unixepoch', 'localtime') AS created_at
+    FROM occurrences o JOIN expressions e ON e.id = o.expression_id
+"""
+# Index name -> statement
+OCCURRENCE_INDEXES = {
+    "idx_occurrences_created_at":
+        "CREATE INDEX IF NOT EXISTS idx_occurrences_created_at ON occurrences (created_at)",
+    "idx_occurrences_expression_id":
+        "CREATE INDEX IF NOT EXISTS idx_occurrences_expression_id ON occurrences (expression_id)",
+}
+
+# Counts a calculation of an expression, adding the expression on its first one
+UPSERT_EXPRESSION = (
+    "INSERT INTO expressions (expression, result, hits) VALUES (?, ?, 1) "
+    "ON CONFLICT (expression, result) DO UPDATE SET hits = hits + 1"
+)
+INSERT_OCCURRENCE = (
+    "INSERT INTO occurrences (expression_id, created_at) "
+    "SELECT id, ? FROM expressions WHERE expression = ? AND result = ?"
+)
+# History rows as (id, expression, result, created_at), like the calculations view
+SELECT_HISTORY = (
+    "SELECT o.id, e.expression, e.result, datetime(o.created_at, 'unixepoch', 'localtime') "
+    "FROM occurrences o JOIN expressions e ON e.id = o.expression_id"
+)
+
+# Full-text index of the distinct expressions and results. External content: the text is not
+# stored twice, the index only maps tokens to expression ids. The default tokenizer splits
+# on operators and on the decimal separator (',' in stored expressions, '.' in results),
+# so a query is matched as a sequence of tokens; prefix indexes make short prefixes cheap
+CREATE_FTS_TABLE = """
+    CREATE VIRTUAL TABLE calculations_fts USING fts5(
+        expression, result,
+        content='expressions', content_rowid='id', prefix='1 2 3'
+    )
+"""
+FTS_INSERT = ("INSERT INTO calculations_fts (rowid, expression, result) "
+              "VALUES (new.id, new.expression, new.result)")
+FTS_DELETE = ("INSERT INTO calculations_fts (calculations_fts, rowid, expression, result) "
+              "VALUES ('delete', old.id, old.expression, old.result)")
+CREATE_FTS_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS calculations_fts_insert AFTER INSERT ON expressions BEGIN {FTS_INSERT}; END",
+    f"CREATE TRIGGER IF NOT EXISTS calculations_fts_delete AFTER DELETE ON expressions BEGIN {FTS_DELETE}; END",
+    # not on hits, which changes with every calculation
+    f"CREATE TRIGGER IF NOT EXISTS calculations_fts_update AFTER UPDATE OF expression, result ON expressions "
+    f"BEGIN {FTS_DELETE}; {FTS_INSERT}; END",
+)
+
+# Variable sessions (endpoints/variables.py), shared by all server processes: the definitions
+# of every session in definition order, and a version that counts its changes, so a process
+# can tell whether its copy of a session is current
+CREATE_SESSIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        used_at REAL NOT NULL
+    ) WITHOUT ROWID
+"""
+CREATE_SESSIONS_INDEX = "CREATE INDEX IF NOT EXISTS idx_sessions_used_at ON sessions (used_at)"
+CREATE_SESSION_VARIABLES_TABLE = """
+    CREATE TABLE IF NOT EXISTS session_variables (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        expression TEXT NOT NULL,
+        UNIQUE (session_id, name)
+    )
+"""
+
+# PRAGMA auto_vacuum value of INCREMENTAL mode
+AUTO_VACUUM_INCREMENTAL = 2
 
 def _connect():
     """Create a database connection with error handling"""
     try:
         # ensure directory exists
         os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
-        logger.info(f"Successfully connected to database at {DB_PATH}")
+        conn = sqlite3.connect(
+            DB_PATH,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        # WAL lets readers run alongside the writer; NORMAL syncs at checkpoints instead of every commit
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
         return conn
     except sqlite3.Error as e:
         logger.error(f"Database connection error: {e}")
@@ -43,37 +169,286 @@ def _connect():
         logger.error(f"File system error creating database directory: {e}")
         raise DatabaseConnectionError(f"Failed to create database directory: {e}")
 
-def init_database():
-    """Initialize the database and create tables if they don't exist"""
+class ConnectionPool:
+    """Bounded pool of long-lived connections; a connection is used by one thread at a time"""
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, acquire_timeout: float = BUSY_TIMEOUT):
+        if size < 1:
+            raise ValueError("Pool size must be positive")
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._created = 0
+        self._in_use = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, open a new one while below the size limit, or wait for a release"""
+        with self._lock:
+            if self._closed:
+                raise DatabaseConnectionError("Connection pool is closed")
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+            # a free slot is reserved under the lock; the connection is opened outside of it
+            reserved = conn is None and self._created < self.size
+            if reserved:
+                self._created += 1
+            if conn is not None or reserved:
+                self._in_use += 1
+                self._acquired += 1
+            else:
+                self._waits += 1
+        if conn is not None:
+            return conn
+        if reserved:
+            try:
+                return _connect()
+            except BaseException:
+                with self._lock:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._acquired -= 1
+                raise
+
+        try:
+            conn = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise DatabaseConnectionError(
+                f"No database connection available within {self.acquire_timeout}s"
+            )
+        with self._lock:
+            self._in_use += 1
+            self._acquired += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool, discarding any unfinished transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        # checked and put under one lock, so close() cannot drain the idle connections in between
+        with self._lock:
+            self._in_use -= 1
+            if self._closed:
+                conn.close()
+                self._created -= 1
+            else:
+                self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close idle connections now and in-use ones when they are released"""
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._created - self._in_use,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def _open_pool(size: int) -> ConnectionPool:
+    global _pool
+    if _pool is not None:
+        _pool.close()
+    _pool = ConnectionPool(size)
+    logger.info(f"Opened connection pool of {size} for database at {DB_PATH}")
+    return _pool
+
+def init_pool(size: int = DEFAULT_POOL_SIZE) -> ConnectionPool:
+    """Create the shared connection pool (called on application startup)"""
+    with _pool_lock:
+        return _open_pool(size)
+
+def close_pool() -> None:
+    """Close the shared connection pool (called on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_pool() -> ConnectionPool:
+    """Shared connection pool, created on first use outside the application lifecycle"""
+    pool = _pool
+    if pool is None:
+        with _pool_lock:
+            pool = _pool if _pool is not None else _open_pool(DEFAULT_POOL_SIZE)
+    return pool
+
+def pool_stats() -> Dict[str, int]:
+    return _pool.stats() if _pool is not None else {}
+
+# Serializes the write transactions of this process. SQLite admits one writer per database
+# file; threads queued on this lock are woken in turn as soon as it is free, where
+# connections contending inside SQLite would poll its lock with growing sleeps
+_write_lock = threading.Lock()
+
+@contextmanager
+def _write_transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    Run the block as one write transaction, committed on success and rolled back on error.
+    BEGIN IMMEDIATE takes the write lock up front, waiting up to BUSY_TIMEOUT for writers
+    in other processes. A deferred transaction that reads before it writes would instead
+    fail with "database is locked" when another process commits in between, since SQLite
+    cannot upgrade its stale snapshot to a write
+    """
+    with _write_lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def _migrate_calculations_table(cursor: sqlite3.Cursor) -> None:
+    """Moves the rows of the former flat calculations table into expressions and occurrences"""
+    logger.info("Moving calculation history to the interned layout")
+    cursor.execute(
+        "INSERT INTO expressions (expression, result, hits) "
+        "SELECT expression, result, COUNT(*) FROM calculations "
+        "GROUP BY expression, result ORDER BY MIN(id)"
+    )
+    # created_at was local time text
+    cursor.execute(
+        "INSERT INTO occurrences (id, expression_id, created_at) "
+        "SELECT c.id, e.id, COALESCE(CAST(strftime('%s', c.created_at, 'utc') AS INTEGER), 0) "
+        "FROM calculations c JOIN expressions e ON e.expression = c.expression AND e.result = c.result"
+    )
+    # keep ids of deleted rows from being reused, as AUTOINCREMENT did
+    cursor.execute(
+        "UPDATE sqlite_sequence SET seq = MAX(seq, "
+        "(SELECT seq FROM sqlite_sequence WHERE name = 'calculations')) WHERE name = 'occurrences'"
+    )
+    cursor.execute("DROP TABLE IF EXISTS calculations_fts")
+    cursor.execute("DROP TABLE calculations")
+
+def _create_tables(cursor: sqlite3.Cursor) -> None:
+    """Migration 1: the echo strings and the interned history, moving a flat history table"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS echo_strings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cursor.execute(CREATE_EXPRESSIONS_TABLE)
+    cursor.execute(CREATE_OCCURRENCES_TABLE)
+    for statement in OCCURRENCE_INDEXES.values():
+        cursor.execute(statement)
+    legacy = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'calculations' AND type = 'table'"
+    ).fetchone()
+    if legacy:
+        _migrate_calculations_table(cursor)
+    cursor.execute(CREATE_CALCULATIONS_VIEW)
+
+def _create_search_index(cursor: sqlite3.Cursor) -> None:
+    """Migration 2: the full-text index of expressions and the triggers that maintain it"""
+    has_fts = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'calculations_fts'"
+    ).fetchone()
+    if not has_fts:
+        cursor.execute(CREATE_FTS_TABLE)
+        cursor.execute("INSERT INTO calculations_fts (calculations_fts) VALUES ('rebuild')")
+    for trigger in CREATE_FTS_TRIGGERS:
+        cursor.execute(trigger)
+
+def _create_session_tables(cursor: sqlite3.Cursor) -> None:
+    """Migration 3: variable sessions, moved out of the memory of the server processes"""
+    cursor.execute(CREATE_SESSIONS_TABLE)
+    cursor.execute(CREATE_SESSIONS_INDEX)
+    cursor.execute(CREATE_SESSION_VARIABLES_TABLE)
+
+# Schema changes in order; the schema version (PRAGMA user_version) is the number applied.
+# Databases created before versioning have version 0, so the first migrations must also
+# accept a schema that already has their objects
+MIGRATIONS = (
+    _create_tables,
+    _create_search_index,
+    _create_session_tables,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def init_database() -> int:
+    """
+    Bring the database schema to SCHEMA_VERSION and return the number of migrations applied.
+    A database that is already current costs a single pragma read. Pending migrations run
+    in one transaction that holds the write lock, so processes starting together apply
+    them once; only the process that applied them converts the file to incremental
+    auto_vacuum
+    """
     conn = None
     try:
         conn = _connect()
         cursor = conn.cursor()
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return 0
 
-        # Create table for storing echo strings
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS echo_strings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                text TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS calculations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                expression TEXT NOT NULL,
-                result TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
+        # Freed pages are kept in a free list and returned to the file system in small steps
+        # by incremental_vacuum(); the mode only takes effect before the first table is created,
+        # so an existing database is converted once by a full VACUUM below
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
 
+        # a process starting next to one that migrates waits for it, VACUUM included
+        cursor.execute(f"PRAGMA busy_timeout = {int(MIGRATION_TIMEOUT * 1000)}")
+        # DDL does not start a transaction implicitly
+        cursor.execute("BEGIN IMMEDIATE")
+        # another process may have migrated while this one waited for the lock
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION:
+            conn.rollback()
+            return 0
+        if version > SCHEMA_VERSION:
+            raise DatabaseInitializationError(
+                f"Database schema version {version} is newer than this application ({SCHEMA_VERSION})")
+        convert = cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL
+        for number in range(version, SCHEMA_VERSION):
+            MIGRATIONS[number](cursor)
+            logger.info(f"Applied database migration {number + 1}: {MIGRATIONS[number].__name__}")
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
-        logger.info("Database initialized successfully")
+
+        if convert:
+            logger.info("Converting database to incremental auto_vacuum")
+            cursor.execute("VACUUM")
+        return SCHEMA_VERSION - version
+    except DatabaseInitializationError:
+        raise
     except sqlite3.Error as e:
         logger.error(f"Database initialization error: {e}")
         if conn:
@@ -93,12 +468,13 @@ def save_string(text: str) -> int:
     if not text or not text.strip():
         raise ValueError("Text cannot be empty or None")
     
+    pool = get_pool()
     conn = None
     try:
-        conn = _connect()
+        conn = pool.acquire()
         cursor = conn.cursor()
-        cursor.execute('INSERT INTO echo_strings (text) VALUES (?)', (text.strip(),))
-        conn.commit()
+        with _write_transaction(conn):
+            cursor.execute('INSERT INTO echo_strings (text) VALUES (?)', (text.strip(),))
         new_id = cursor.lastrowid
         logger.info(f"Successfully saved string with ID: {new_id}")
         return new_id if new_id is not None else -1
@@ -114,13 +490,14 @@ def save_string(text: str) -> int:
         raise DatabaseQueryError(f"Unexpected error saving string: {e}")
     finally:
         if conn:
-            conn.close()
+            pool.release(conn)
 
 def get_all_strings() -> List[Dict[str, str]]:
     """Retrieve all strings from the database"""
+    pool = get_pool()
     conn = None
     try:
-        conn = _connect()
+        conn = pool.acquire()
         cursor = conn.cursor()
         cursor.execute("SELECT id, text, created_at FROM echo_strings ORDER BY id DESC")
         rows = cursor.fetchall()
@@ -135,22 +512,23 @@ def get_all_strings() -> List[Dict[str, str]]:
         raise DatabaseQueryError(f"Unexpected error retrieving strings: {e}")
     finally:
         if conn:
-            conn.close()
+            pool.release(conn)
 
 def delete_all_strings() -> int:
     """Delete all strings from the database and return count of deleted records"""
+    pool = get_pool()
     conn = None
     try:
-        conn = _connect()
+        conn = pool.acquire()
         cursor = conn.cursor()
 
-        # Get count before deletion
-        cursor.execute('SELECT COUNT(*) FROM echo_strings')
-        count = cursor.fetchone()[0]
+        with _write_transaction(conn):
+            # Get count before deletion
+            cursor.execute('SELECT COUNT(*) FROM echo_strings')
+            count = cursor.fetchone()[0]
 
-        # Delete all records
-        cursor.execute('DELETE FROM echo_strings')
-        conn.commit()
+            # Delete all records
+            cursor.execute('DELETE FROM echo_strings')
         
         logger.info(f"Successfully deleted {count} strings from database")
         return count
@@ -166,57 +544,510 @@ def delete_all_strings() -> int:
         raise DatabaseQueryError(f"Unexpected error deleting strings: {e}")
     finally:
         if conn:
-            conn.close()
+            pool.release(conn)
+
+def create_session(session_id: str, max_sessions: int = 1000) -> None:
+    """Add an empty session; beyond max_sessions, the least recently changed ones are deleted"""
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        with _write_transaction(conn):
+            conn.execute("INSERT INTO sessions (id, version, used_at) VALUES (?, 0, ?)", (session_id, time.time()))
+            stale = "SELECT id FROM sessions ORDER BY used_at DESC LIMIT -1 OFFSET ?"
+            conn.execute(f"DELETE FROM session_variables WHERE session_id IN ({stale})", (max_sessions,))
+            conn.execute(f"DELETE FROM sessions WHERE id IN ({stale})", (max_sessions,))
+    except sqlite3.Error as e:
+        if conn: conn.rollback()
+        raise DatabaseQueryError(f"Failed to create session: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def get_session(session_id: str,
+                known_version: Optional[int] = None) -> Optional[Tuple[int, Optional[List[Tuple[str, str]]]]]:
+    """
+    (version, [(name, expression), ...] in definition order) of a session, or None if there is
+    no such session. The definitions are only read, and returned, when the version is not
+    known_version
+    """
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        # one snapshot for both reads
+        conn.execute("BEGIN")
+        row = conn.execute("SELECT version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if row[0] == known_version:
+            return row[0], None
+        definitions = conn.execute(
+            "SELECT name, expression FROM session_variables WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        return row[0], definitions
+    except sqlite3.Error as e:
+        raise DatabaseQueryError(f"Failed to retrieve session: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def change_session(session_id: str, expected_version: int, name: str,
+                   expression: Optional[str]) -> Optional[int]:
+    """
+    Define a variable of a session, or delete it when expression is None, provided the session
+    is still at expected_version. Returns the new version, or None when the session was changed
+    or deleted in the meantime
+    """
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        with _write_transaction(conn):
+            updated = conn.execute(
+                "UPDATE sessions SET version = version + 1, used_at = ? WHERE id = ? AND version = ?",
+                (time.time(), session_id, expected_version),
+            ).rowcount
+            if not updated:
+                return None
+            if expression is None:
+                conn.execute("DELETE FROM session_variables WHERE session_id = ? AND name = ?", (session_id, name))
+            else:
+                # a redefined variable keeps its place in the definition order
+                conn.execute(
+                    "INSERT INTO session_variables (session_id, name, expression) VALUES (?, ?, ?) "
+                    "ON CONFLICT (session_id, name) DO UPDATE SET expression = excluded.expression",
+                    (session_id, name, expression),
+                )
+        return expected_version + 1
+    except sqlite3.Error as e:
+        if conn: conn.rollback()
+        raise DatabaseQueryError(f"Failed to change session: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def parse_timestamp(value) -> int:
+    """
+    Unix time of a created_at value: None for now, a number, or an ISO 8601 date or
+    date and time ('2024-01-15 10:30:00'), read as local time unless it has an offset
+    """
+    if value is None or value == "":
+        return int(time.time())
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value.strip()).timestamp())
+    except (ValueError, AttributeError):
+        raise ValueError(f"Invalid timestamp: {value!r}")
+
+def _insert_calculations(conn: sqlite3.Connection, records: Sequence[Tuple[str, str, int]]) -> None:
+    """Add (expression, result, created_at) records in the caller's transaction"""
+    conn.executemany(UPSERT_EXPRESSION, [(expression, result) for expression, result, _ in records])
+    conn.executemany(INSERT_OCCURRENCE, [(created_at, expression, result)
+                                         for expression, result, created_at in records])
 
 def save_calculation(expression: str, result: str) -> int:
     if not expression or not expression.strip():
         raise ValueError("Expression cannot be empty")
+    pool = get_pool()
     conn = None
     try:
-        conn = _connect()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO calculations (expression, result, created_at) VALUES (?, ?, ?)",
-            (expression.strip(), str(result), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
-        )
-        conn.commit()
+        conn = pool.acquire()
+        expression, result = expression.strip(), str(result)
+        with _write_transaction(conn):
+            conn.execute(UPSERT_EXPRESSION, (expression, result))
+            cur = conn.execute(INSERT_OCCURRENCE, (int(time.time()), expression, result))
+        _count_rows("written", 1)
         return cur.lastrowid or -1
     except sqlite3.Error as e:
         if conn: conn.rollback()
         raise DatabaseQueryError(f"Failed to save calculation: {e}")
     finally:
-        if conn: conn.close()
+        if conn: pool.release(conn)
+
+def save_calculations(rows: Sequence[Tuple]) -> int:
+    """
+    Save (expression, result) or (expression, result, created_at) rows in a single
+    transaction and return the number of rows written. created_at is Unix time or
+    anything parse_timestamp() reads
+    """
+    records = []
+    now = int(time.time())
+    for expression, result, *created_at in rows:
+        if not expression or not expression.strip():
+            raise ValueError("Expression cannot be empty")
+        records.append((expression.strip(), str(result), parse_timestamp(created_at[0]) if created_at else now))
+    if not records:
+        return 0
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        with _write_transaction(conn):
+            _insert_calculations(conn, records)
+        _count_rows("written", len(records))
+        return len(records)
+    except sqlite3.Error as e:
+        if conn: conn.rollback()
+        raise DatabaseQueryError(f"Failed to save calculations: {e}")
+    finally:
+        if conn: pool.release(conn)
 
 def get_all_calculations() -> List[Dict[str, str]]:
+    pool = get_pool()
     conn = None
     try:
-        conn = _connect()
+        conn = pool.acquire()
         cur = conn.cursor()
-        cur.execute(
-            "SELECT id, expression, result, created_at FROM calculations ORDER BY id DESC"
-        )
+        cur.execute(f"{SELECT_HISTORY} ORDER BY o.id DESC")
+        rows = [_calculation_row(r) for r in cur.fetchall()]
+        _count_rows("read", len(rows))
+        return rows
+    except sqlite3.Error as e:
+        raise DatabaseQueryError(f"Failed to retrieve calculations: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def _calculation_row(r) -> Dict[str, str]:
+    return {"id": str(r[0]), "expression": r[1], "result": r[2], "created_at": r[3]}
+
+def get_calculations_page(before_id: Optional[int] = None, limit: int = 100,
+                          since: Optional[Union[int, str]] = None) -> List[Dict[str, str]]:
+    """
+    One page of history, newest first, optionally only rows created at or after since
+    (see parse_timestamp). Keyset pagination: pass the smallest id of the previous page
+    as before_id, so every page costs the same however deep it is
+    """
+    return [_calculation_row(r) for r in _select_history(before_id, limit, since)]
+
+def get_history_columns(before_id: Optional[int] = None, limit: Optional[int] = None,
+                        since: Optional[Union[int, str]] = None) -> Dict[str, list]:
+    """
+    The rows get_calculations_page would return (all of them when limit is None) as parallel
+    lists, with numeric ids: no dict per row is built, for encoders that write columns
+    """
+    rows = _select_history(before_id, limit, since)
+    # one comprehension per column is several times faster than transposing with zip(*rows)
+    return {name: [row[i] for row in rows] for i, name in enumerate(("id", "expression", "result", "created_at"))}
+
+def _select_history(before_id: Optional[int], limit: Optional[int],
+                    since: Optional[Union[int, str]]) -> List[Tuple]:
+    conditions, params = [], []
+    if before_id is not None:
+        conditions.append("o.id < ?")
+        params.append(before_id)
+    if since is not None:
+        conditions.append("o.created_at >= ?")
+        params.append(parse_timestamp(since))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        cur = conn.cursor()
+        # LIMIT -1: no limit
+        cur.execute(f"{SELECT_HISTORY} {where} ORDER BY o.id DESC LIMIT ?",
+                    (*params, -1 if limit is None else limit))
         rows = cur.fetchall()
-        return [
-            {"id": str(r[0]), "expression": r[1], "result": r[2], "created_at": r[3]}
-            for r in rows
-        ]
+        _count_rows("read", len(rows))
+        return rows
     except sqlite3.Error as e:
         raise DatabaseQueryError(f"Failed to retrieve calculations: {e}")
     finally:
-        if conn: conn.close()
+        if conn: pool.release(conn)
+
+def iter_calculations(chunk_size: int = 1000, before_id: Optional[int] = None,
+                      since: Optional[Union[int, str]] = None,
+                      limit: Optional[int] = None) -> Iterator[Dict[str, str]]:
+    """
+    Yield history rows newest first, at most limit of them, fetching chunk_size rows at a
+    time. Each chunk is a separate keyset query, so neither the rows nor a pooled connection
+    are held while the consumer (e.g. a slow HTTP client) works through a chunk
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        page = get_calculations_page(before_id, size, since)
+        yield from page
+        if len(page) < size:
+            return
+        if remaining is not None:
+            remaining -= len(page)
+        before_id = int(page[-1]["id"])
+
+def iter_calculation_chunks(chunk_size: int = 10_000,
+                            after_id: int = 0) -> Iterator[List[Tuple[int, str, str, str]]]:
+    """
+    Yield (id, expression, result, created_at) rows oldest first, as lists of up to
+    chunk_size raw tuples. Like iter_calculations, every chunk is its own keyset query,
+    so memory stays constant and no connection is held between chunks
+    """
+    pool = get_pool()
+    while True:
+        conn = None
+        try:
+            conn = pool.acquire()
+            chunk = conn.execute(
+                f"{SELECT_HISTORY} WHERE o.id > ? ORDER BY o.id LIMIT ?", (after_id, chunk_size)
+            ).fetchall()
+        except sqlite3.Error as e:
+            raise DatabaseQueryError(f"Failed to retrieve calculations: {e}")
+        finally:
+            if conn: pool.release(conn)
+        _count_rows("read", len(chunk))
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after_id = chunk[-1][0]
+
+def top_expressions(limit: int = 100) -> List[Dict[str, object]]:
+    """The most often calculated expressions with their results and hit counts"""
+    pool = get_pool()
+    with pool.connection() as conn:
+        try:
+            rows = conn.execute(
+                "SELECT expression, result, hits FROM expressions ORDER BY hits DESC, id LIMIT ?", (limit,)
+            ).fetchall()
+        except sqlite3.Error as e:
+            raise DatabaseQueryError(f"Failed to retrieve expressions: {e}")
+    return [{"expression": expression, "result": result, "hits": hits} for expression, result, hits in rows]
+
+# Rows of the current import batch, private to the importing connection. A temp table is
+# created in the connection's own temp schema, so the database schema is never changed
+CREATE_IMPORT_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS import_rows (
+        expression TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at INTEGER NOT NULL
+    )
+"""
+# New expressions get ids in the order of their first row, like one UPSERT_EXPRESSION per row.
+# WHERE true tells the parser that ON CONFLICT is not a join constraint
+IMPORT_EXPRESSIONS = (
+    "INSERT INTO expressions (expression, result, hits) "
+    "SELECT expression, result, COUNT(*) FROM temp.import_rows WHERE true "
+    "GROUP BY expression, result ORDER BY MIN(rowid) "
+    "ON CONFLICT (expression, result) DO UPDATE SET hits = hits + excluded.hits"
+)
+IMPORT_OCCURRENCES = (
+    "INSERT INTO occurrences (expression_id, created_at) "
+    "SELECT e.id, r.created_at FROM temp.import_rows r "
+    "JOIN expressions e ON e.expression = r.expression AND e.result = r.result ORDER BY r.rowid"
+)
+
+def _import_batch(conn: sqlite3.Connection, records: Sequence[Tuple[str, str, int]]) -> None:
+    """
+    Add records like _insert_calculations, in the caller's transaction, but with one statement
+    per table: the records are staged in temp.import_rows and moved with INSERT ... SELECT.
+    The search index trigger stays in place; FTS5 keeps the rows a statement indexes in memory
+    and writes them out when the statement ends, so a statement per record would write a small
+    index segment per expression, and one statement per batch writes one
+    """
+    conn.execute(CREATE_IMPORT_TABLE)
+    conn.executemany("INSERT INTO temp.import_rows (expression, result, created_at) VALUES (?, ?, ?)", records)
+    conn.execute(IMPORT_EXPRESSIONS)
+    conn.execute(IMPORT_OCCURRENCES)
+    conn.execute("DELETE FROM temp.import_rows")
+
+def import_calculations(rows: Iterable[Tuple[str, str, Optional[str]]], batch_size: int = 50_000) -> int:
+    """
+    Append (expression, result, created_at) rows in batches of batch_size, one transaction
+    per batch, and return the number of rows imported. Each batch is added with a statement
+    per table (see _import_batch); the schema is not changed and the indexes and the search
+    index are kept up to date as rows arrive, so other processes can query and write the
+    history while an import runs
+    """
+    now = int(time.time())
+    pool = get_pool()
+    conn = None
+    imported = 0
+    try:
+        conn = pool.acquire()
+        batch = []
+        for expression, result, created_at in rows:
+            if not expression or not expression.strip():
+                raise ValueError(f"Expression cannot be empty (row {imported + len(batch) + 1})")
+            batch.append((expression.strip(), str(result), parse_timestamp(created_at) if created_at else now))
+            if len(batch) >= batch_size:
+                with _write_transaction(conn):
+                    _import_batch(conn, batch)
+                imported += len(batch)
+                _count_rows("written", len(batch))
+                batch = []
+        if batch:
+            with _write_transaction(conn):
+                _import_batch(conn, batch)
+            imported += len(batch)
+            _count_rows("written", len(batch))
+        return imported
+    except sqlite3.Error as e:
+        if conn: conn.rollback()
+        raise DatabaseQueryError(f"Failed to import calculations after {imported} rows: {e}")
+    finally:
+        if conn: pool.release(conn)
 
 def delete_all_calculations() -> int:
+    """
+    Delete the whole history, with the expressions and their hit counts, and return the
+    number of rows deleted. An unconditional DELETE lets SQLite drop a table's pages
+    wholesale instead of visiting every row, and changes() reports the count without
+    a separate COUNT(*) scan. The freed pages stay in the file until incremental_vacuum()
+    releases them.
+    The search index delete trigger makes SQLite visit every expression; the index is then
+    cleared in one step, which also drops the deletions the trigger recorded. The trigger
+    is kept: dropping it would change the schema, and every connection of every process
+    would prepare its statements again
+    """
+    pool = get_pool()
     conn = None
     try:
-        conn = _connect()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM calculations")
-        count = cur.fetchone()[0]
-        cur.execute("DELETE FROM calculations")
-        conn.commit()
+        conn = pool.acquire()
+        with _write_transaction(conn):
+            conn.execute("DELETE FROM occurrences")
+            count = conn.execute("SELECT changes()").fetchone()[0]
+            conn.execute("DELETE FROM expressions")
+            conn.execute("INSERT INTO calculations_fts (calculations_fts) VALUES ('delete-all')")
+        _count_rows("deleted", count)
         return count
     except sqlite3.Error as e:
         if conn: conn.rollback()
         raise DatabaseQueryError(f"Failed to delete calculations: {e}")
     finally:
-        if conn: conn.close()
+        if conn: pool.release(conn)
+
+_SEARCH_TERM = re.compile(r"[^\W_]+")
+
+def _fts_query(text: str) -> str:
+    """
+    FTS5 query for free text: every whitespace-separated word must occur, as its tokens
+    in sequence with the last one matched as a prefix, so '2+3' finds '2 + 35' and '0.5'
+    finds '0,5'. Operators and FTS syntax in the input are treated as separators, never as syntax
+    """
+    phrases = []
+    for word in text.split():
+        tokens = _SEARCH_TERM.findall(word)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"*')
+    return " AND ".join(phrases)
+
+def search_calculations(text: str, limit: int = 100, offset: int = 0, sort: str = "rank",
+                        before_id: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    History rows whose expression or result contain every word of text (see _fts_query).
+    sort="rank" orders by relevance (bm25), then newest first, and pages by offset;
+    sort="recent" orders newest first and pages by before_id, walking the history in id
+    order and keeping the rows of matching expressions, so no match set is sorted
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    if sort == "rank":
+        sql = ("SELECT o.id, e.expression, e.result, datetime(o.created_at, 'unixepoch', 'localtime') "
+               "FROM calculations_fts JOIN expressions e ON e.id = calculations_fts.rowid "
+               "JOIN occurrences o ON o.expression_id = e.id "
+               "WHERE calculations_fts MATCH ? ORDER BY calculations_fts.rank, o.id DESC LIMIT ? OFFSET ?")
+        params = (query, limit, offset)
+    elif sort == "recent":
+        condition, params = "", [query]
+        if before_id is not None:
+            condition = "AND o.id < ?"
+            params.append(before_id)
+        sql = (f"{SELECT_HISTORY} WHERE o.expression_id IN ("
+               f"SELECT rowid FROM calculations_fts WHERE calculations_fts MATCH ?) {condition} "
+               "ORDER BY o.id DESC LIMIT ?")
+        params.append(limit)
+    else:
+        raise ValueError(f"Unknown sort: {sort}")
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        rows = [_calculation_row(r) for r in conn.execute(sql, params).fetchall()]
+        _count_rows("read", len(rows))
+        return rows
+    except sqlite3.Error as e:
+        raise DatabaseQueryError(f"Failed to search calculations: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def prune_calculations(max_rows: Optional[int] = None, older_than: Optional[Union[int, str]] = None,
+                       batch_size: int = 1000) -> int:
+    """
+    Delete up to batch_size rows that are beyond the newest max_rows or were created
+    before older_than (see parse_timestamp), oldest first, and return the number deleted.
+    Expressions left without rows are deleted too. Bounded batches keep every write
+    transaction short; call repeatedly until it returns less than batch_size
+    """
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        with _write_transaction(conn):
+            batch = []
+            newest_dropped = 0
+            if max_rows is not None:
+                # the newest row to drop: ids only grow, so every row up to it is older
+                row = conn.execute(
+                    "SELECT id FROM occurrences ORDER BY id DESC LIMIT 1 OFFSET ?", (max_rows,)
+                ).fetchone()
+                if row is not None:
+                    newest_dropped = row[0]
+                    batch = conn.execute(
+                        "SELECT id, expression_id FROM occurrences WHERE id <= ? ORDER BY id LIMIT ?",
+                        (newest_dropped, batch_size),
+                    ).fetchall()
+            if older_than is not None and len(batch) < batch_size:
+                # a range of the created_at index, so finding nothing to delete costs nothing;
+                # rows up to newest_dropped are all in the batch already
+                batch += conn.execute(
+                    "SELECT id, expression_id FROM occurrences WHERE created_at < ? AND id > ? LIMIT ?",
+                    (parse_timestamp(older_than), newest_dropped, batch_size - len(batch)),
+                ).fetchall()
+            cur = conn.executemany("DELETE FROM occurrences WHERE id = ?", [(row_id,) for row_id, _ in batch])
+            deleted = max(cur.rowcount, 0)
+            conn.executemany(
+                "DELETE FROM expressions WHERE id = ? "
+                "AND NOT EXISTS (SELECT 1 FROM occurrences WHERE expression_id = ?)",
+                [(expression_id, expression_id) for expression_id in {expression_id for _, expression_id in batch}],
+            )
+        _count_rows("deleted", deleted)
+        return deleted
+    except sqlite3.Error as e:
+        if conn: conn.rollback()
+        raise DatabaseQueryError(f"Failed to prune calculations: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def incremental_vacuum(pages: int = 0) -> int:
+    """
+    Return up to pages free pages (all of them for 0) to the file system and return
+    the number released. Each step is a short write transaction
+    """
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.acquire()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not before:
+            return 0
+        # execute() steps a pragma only once, which releases a single page;
+        # executescript() runs it to completion
+        with _write_lock:
+            conn.executescript(f"BEGIN IMMEDIATE; PRAGMA incremental_vacuum({int(pages)}); COMMIT;")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    except sqlite3.Error as e:
+        raise DatabaseQueryError(f"Failed to vacuum database: {e}")
+    finally:
+        if conn: pool.release(conn)
+
+def storage_stats() -> Dict[str, int]:
+    """Size of the database file in pages, and how many of them are free"""
+    pool = get_pool()
+    with pool.connection() as conn:
+        try:
+            return {
+                "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+                "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+                "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            }
+        except sqlite3.Error as e:
+            raise DatabaseQueryError(f"Failed to read storage stats: {e}")
@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+from .database import DatabaseError, save_calculations
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryQueueFullError(DatabaseError):
+    """Raised when the write-behind queue stays full for longer than the submit timeout"""
+    pass
+
+
+# Wakes the writer thread up for shutdown
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Write-behind buffer for calculation history: rows are queued in memory and a
+    background thread stores them in group commits of up to batch_size rows,
+    at most flush_interval seconds after the first row of the batch arrived
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 0.05,
+                 max_queue: int = 10000, submit_timeout: float = 1.0):
+        if batch_size < 1 or max_queue < 1:
+            raise ValueError("Batch and queue sizes must be positive")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._failed_rows = 0
+        self._rejected_rows = 0
+        self._max_depth = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush everything that was submitted and stop the writer thread"""
+        if self._thread is None:
+            return
+        # blocks while the queue is full, which is fine: the writer keeps draining it
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, expression: str, result: str) -> None:
+        """Queue a row; blocks while the queue is full (backpressure) up to submit_timeout"""
+        if not expression or not expression.strip():
+            raise ValueError("Expression cannot be empty")
+        row = (expression, str(result), int(time.time()))
+        try:
+            self._queue.put(row, timeout=self.submit_timeout)
+        except queue.Full:
+            with self._lock:
+                self._rejected_rows += 1
+            raise HistoryQueueFullError("History queue is full")
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    row = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            self._flush(batch)
+
+        # rows submitted concurrently with stop()
+        rest = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                rest.append(row)
+        for start in range(0, len(rest), self.batch_size):
+            self._flush(rest[start:start + self.batch_size])
+
+    def _flush(self, batch: list) -> None:
+        started = time.perf_counter()
+        try:
+            save_calculations(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} history rows: {e}")
+            with self._lock:
+                self._failed_rows += len(batch)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._flushes += 1
+            self._flushed_rows += len(batch)
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "queue_capacity": self._queue.maxsize,
+                "flushes": self._flushes,
+                "flushed_rows": self._flushed_rows,
+                "failed_rows": self._failed_rows,
+                "rejected_rows": self._rejected_rows,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+            }
@@ -0,0 +1,256 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from . import database
+from .database import BUSY_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CREATE_RESULTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS results (
+        key TEXT PRIMARY KEY,
+        value REAL NOT NULL,
+        expires_at REAL NOT NULL,
+        used_at REAL NOT NULL
+    ) WITHOUT ROWID
+"""
+CREATE_RESULTS_INDEX = "CREATE INDEX IF NOT EXISTS idx_results_used_at ON results (used_at)"
+# Lookup counters of every process using the file, published by the processes themselves
+CREATE_WORKERS_TABLE = """
+    CREATE TABLE IF NOT EXISTS workers (
+        pid INTEGER PRIMARY KEY,
+        hits INTEGER NOT NULL,
+        misses INTEGER NOT NULL,
+        stores INTEGER NOT NULL,
+        updated_at REAL NOT NULL
+    )
+"""
+CREATE_META_TABLE = "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+
+# Bytes of the file mapped into memory by every connection: reads are copies from shared pages
+MMAP_SIZE = 64 * 1024 * 1024
+# Counters of workers silent for this long belong to stopped processes and are dropped
+STALE_WORKER_S = 3600
+
+
+class ResultCache:
+    """
+    Results of calculations shared by all server processes, keyed on the normalized expression.
+    The cache is a small SQLite file of its own, apart from the history database so that cache
+    writes never queue behind history writes, memory-mapped by every worker: a lookup is a read
+    of shared pages through the worker's own connection, with no round trip to another process.
+    Entries expire ttl seconds after they were stored; beyond max_entries the least recently
+    used are evicted. Last use is refreshed at most once per touch_interval seconds, so that
+    hits stay reads. Entries stored under another fingerprint (the evaluation limits the
+    results were computed with) are dropped on start.
+    Every process counts its own hits and misses and publishes them to the file at most once
+    per publish_interval seconds, so the hit rates of all workers can be read from any of them
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 100_000, ttl: float = 3600.0,
+                 fingerprint: str = "", touch_interval: float = 10.0, publish_interval: float = 1.0):
+        if max_entries < 1:
+            raise ValueError("Cache size must be positive")
+        # None: results.db next to the history database, resolved on start
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fingerprint = fingerprint
+        self.touch_interval = touch_interval
+        self.publish_interval = publish_interval
+        # stores between two checks of the entry count; eviction then trims 10% below the limit
+        self._evict_every = max(1, max_entries // 100)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        self._errors = 0
+        self._stores_since_check = 0
+        self._published_at = 0.0
+
+    def start(self) -> None:
+        if self.path is None:
+            self.path = os.path.join(os.path.dirname(database.DB_PATH), "results.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in (CREATE_RESULTS_TABLE, CREATE_RESULTS_INDEX, CREATE_WORKERS_TABLE,
+                              CREATE_META_TABLE):
+                conn.execute(statement)
+            row = conn.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or row[0] != self.fingerprint:
+                conn.execute("DELETE FROM results")
+                conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('fingerprint', ?)",
+                             (self.fingerprint,))
+            conn.execute("DELETE FROM workers WHERE pid = ? OR updated_at < ?",
+                         (os.getpid(), time.time() - STALE_WORKER_S))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self._started = True
+
+    def stop(self) -> None:
+        """Publishes the counters of this process and closes its connections"""
+        if not self._started:
+            return
+        self._started = False
+        self._publish(time.time())
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def get(self, key: str) -> Optional[float]:
+        """The cached value, or None when there is none, it expired or the cache failed"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value, expires_at, used_at FROM results WHERE key = ?",
+                               (key,)).fetchone()
+            if row is not None and row[1] > now and now - row[2] > self.touch_interval:
+                conn.execute("UPDATE results SET used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        hit = row is not None and row[1] > now
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+        self._maybe_publish(now)
+        return row[0] if hit else None
+
+    def put(self, key: str, value: float) -> None:
+        """Stores a finite value; failures are logged, never raised"""
+        if not math.isfinite(value):
+            return
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, float(value), now + self.ttl, now))
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return
+        with self._lock:
+            self._stores += 1
+            self._stores_since_check += 1
+            check = self._stores_since_check >= self._evict_every
+            if check:
+                self._stores_since_check = 0
+        if check:
+            self._evict(now)
+        self._maybe_publish(now)
+
+    def clear(self) -> None:
+        """Drops all entries (of every process)"""
+        try:
+            self._connection().execute("DELETE FROM results")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def stats(self) -> Dict[str, object]:
+        """Counters of this process, and the hit rates of every process using the cache"""
+        now = time.time()
+        self._publish(now)
+        local = self.counters()
+        try:
+            conn = self._connection()
+            size = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            workers = conn.execute(
+                "SELECT pid, hits, misses, stores, updated_at FROM workers ORDER BY pid").fetchall()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            size, workers = None, []
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            **local,
+            "hit_rate": _hit_rate(local["hits"], local["misses"]),
+            "workers": [
+                {"pid": pid, "hits": hits, "misses": misses, "stores": stores,
+                 "hit_rate": _hit_rate(hits, misses), "updated_s_ago": round(now - updated_at, 3)}
+                for pid, hits, misses, stores, updated_at in workers
+            ],
+        }
+
+    def counters(self) -> Dict[str, int]:
+        """Counters of this process only; cheap, for metrics"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "errors": self._errors,
+            }
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit, so every statement is its own transaction"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            # a lost entry costs one evaluation; no need to wait for the disk
+            conn.execute("PRAGMA synchronous = OFF")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries and, past max_entries, the least recently used ones"""
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            excess = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                evicted = conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used_at LIMIT ?)",
+                    (excess + self.max_entries // 10,)).rowcount
+                with self._lock:
+                    self._evictions += evicted
+        except sqlite3.Error as e:
+            self._failed("evict", e)
+
+    def _maybe_publish(self, now: float) -> None:
+        if now - self._published_at >= self.publish_interval:
+            self._publish(now)
+
+    def _publish(self, now: float) -> None:
+        self._published_at = now
+        with self._lock:
+            counters = (os.getpid(), self._hits, self._misses, self._stores, now)
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO workers (pid, hits, misses, stores, updated_at) VALUES (?, ?, ?, ?, ?)",
+                counters)
+        except sqlite3.Error as e:
+            self._failed("publish", e)
+
+    def _failed(self, operation: str, error: sqlite3.Error) -> None:
+        logger.warning(f"Result cache {operation} failed: {error}")
+        with self._lock:
+            self._errors += 1
+
+
+def _hit_rate(hits: int, misses: int) -> Optional[float]:
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else None
@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from .database import incremental_vacuum, prune_calculations
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionJob:
+    """
+    Background enforcement of the history retention policy: every interval seconds rows
+    beyond the newest max_rows or older than max_age_days are deleted in batches of
+    batch_size, pausing between batches so that request writes get the lock in between,
+    and then free pages (from pruning or /delete/all) are returned to the file system
+    vacuum_pages at a time. With neither limit set the job only reclaims space
+    """
+
+    def __init__(self, max_rows: Optional[int] = None, max_age_days: Optional[float] = None,
+                 interval: float = 60.0, batch_size: int = 1000, pause: float = 0.01,
+                 vacuum_pages: int = 1000):
+        if batch_size < 1 or vacuum_pages < 1:
+            raise ValueError("Batch sizes must be positive")
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.vacuum_pages = vacuum_pages
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._failures = 0
+        self._deleted_rows = 0
+        self._vacuumed_pages = 0
+        self._last_run_ms = 0.0
+        self._last_run_at: Optional[str] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="history-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the job; a run in progress ends after its current batch"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def run_once(self) -> int:
+        """Apply the policy and reclaim free pages now; returns the number of rows deleted"""
+        started = time.perf_counter()
+        older_than = None
+        if self.max_age_days:
+            older_than = int(time.time() - self.max_age_days * 86400)
+        deleted = 0
+        vacuumed = 0
+        try:
+            if self.max_rows is not None or older_than is not None:
+                while not self._stopping.is_set():
+                    count = prune_calculations(self.max_rows, older_than, self.batch_size)
+                    deleted += count
+                    if count < self.batch_size:
+                        break
+                    self._stopping.wait(self.pause)
+            while not self._stopping.is_set():
+                count = incremental_vacuum(self.vacuum_pages)
+                vacuumed += count
+                if count < self.vacuum_pages:
+                    break
+                self._stopping.wait(self.pause)
+        except Exception as e:
+            logger.error(f"History retention run failed: {e}")
+            with self._lock:
+                self._failures += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._runs += 1
+            self._deleted_rows += deleted
+            self._vacuumed_pages += vacuumed
+            self._last_run_ms = elapsed_ms
+            self._last_run_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return deleted
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self.run_once()
+            self._stopping.wait(self.interval)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "max_rows": self.max_rows,
+                "max_age_days": self.max_age_days,
+                "interval_s": self.interval,
+                "runs": self._runs,
+                "failures": self._failures,
+                "deleted_rows": self._deleted_rows,
+                "vacuumed_pages": self._vacuumed_pages,
+                "last_run_ms": round(self._last_run_ms, 3),
+                "last_run_at": self._last_run_at,
+            }
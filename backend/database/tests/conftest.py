@@ -0,0 +1,12 @@
+from .. import database
+import pytest
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh database file with an open connection pool"""
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'calculations.db'))
+    database.init_database()
+    database.init_pool(4)
+    yield database
+    database.close_pool()
@@ -0,0 +1,68 @@
+import logging
+import multiprocessing
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import database
+
+PROCESSES = 4
+THREADS = 8
+WRITES = 25
+
+
+def _write(path: str, process: int) -> int:
+    """Runs in a separate process: concurrent single and batched writes; returns the rows written"""
+    database.DB_PATH = path
+    database.init_pool(THREADS)
+
+    def writer(thread: int) -> int:
+        for i in range(WRITES):
+            if i % 5:
+                database.save_calculation(f'{process} + {thread} + {i}', str(process + thread + i))
+            else:
+                database.save_calculations([(f'{process} * {thread}', str(process * thread))] * 5)
+        return WRITES + 4 * (WRITES // 5)
+
+    try:
+        with ThreadPoolExecutor(THREADS) as pool:
+            return sum(pool.map(writer, range(THREADS)))
+    finally:
+        database.close_pool()
+
+
+def test_processes_write_concurrently(db):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(PROCESSES) as processes:
+        written = processes.starmap(_write, [(db.DB_PATH, process) for process in range(PROCESSES)])
+    rows = db.get_all_calculations()
+    assert len(rows) == sum(written) == PROCESSES * THREADS * (WRITES + 4 * (WRITES // 5))
+
+
+def _initialize(path: str):
+    """Runs in a separate process: (migrations applied, whether the file was vacuumed)"""
+    database.DB_PATH = path
+    messages = []
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    database.logger.addHandler(handler)
+    database.logger.setLevel(logging.INFO)
+    applied = database.init_database()
+    return applied, any(message.startswith('Converting') for message in messages)
+
+
+def test_processes_migrate_once(db):
+    # an unversioned database from before incremental auto_vacuum
+    conn = sqlite3.connect(db.DB_PATH, isolation_level=None)
+    conn.execute("PRAGMA auto_vacuum = NONE")
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+    db.close_pool()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(PROCESSES) as processes:
+        results = processes.map(_initialize, [db.DB_PATH] * PROCESSES)
+    assert sorted(results) == [(0, False)] * (PROCESSES - 1) + [(db.SCHEMA_VERSION, True)]
+    conn = sqlite3.connect(db.DB_PATH)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == db.AUTO_VACUUM_INCREMENTAL
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+    conn.close()
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def filled(db):
+    db.save_calculations([(f'{i} + 0', str(i)) for i in range(1, 26)])
+    return db
+
+
+def test_keyset_pages(filled):
+    ids, before_id = [], None
+    while True:
+        page = filled.get_calculations_page(before_id, limit=10)
+        ids.extend(int(row['id']) for row in page)
+        if len(page) < 10:
+            break
+        before_id = int(page[-1]['id'])
+    assert ids == list(range(25, 0, -1))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 7, 25, 100])
+def test_iter_in_chunks(filled, chunk_size):
+    rows = list(filled.iter_calculations(chunk_size=chunk_size))
+    assert rows == filled.get_all_calculations()
+
+
+@pytest.mark.parametrize("chunk_size,limit", [(1, 3), (5, 10), (7, 12), (10, 25), (10, 100)])
+def test_iter_limit(filled, chunk_size, limit):
+    rows = list(filled.iter_calculations(chunk_size=chunk_size, limit=limit))
+    assert rows == filled.get_all_calculations()[:limit]
+
+
+def test_since(filled):
+    assert filled.get_calculations_page(since='9999-01-01') == []
+    assert len(filled.get_calculations_page(since='2000-01-01')) == 25
+
+
+def test_row_stats(filled):
+    before = filled.row_stats()
+    filled.get_calculations_page(limit=10)
+    filled.save_calculation('1 + 1', '2')
+    assert filled.delete_all_calculations() == 26
+    after = filled.row_stats()
+    assert after['read'] - before['read'] == 10
+    assert after['written'] - before['written'] == 1
+    assert after['deleted'] - before['deleted'] == 26
+
+
+def test_expressions_are_interned(db):
+    db.save_calculations([('1 + 1', '2'), ('2 × 3', '6'), ('1 + 1', '2')])
+    db.save_calculation('1 + 1', '2')
+    assert db.top_expressions(10) == [
+        {'expression': '1 + 1', 'result': '2', 'hits': 3},
+        {'expression': '2 × 3', 'result': '6', 'hits': 1},
+    ]
+    assert [row['expression'] for row in db.get_all_calculations()] == ['1 + 1', '1 + 1', '2 × 3', '1 + 1']
+
+
+def test_created_at_round_trip(db):
+    db.save_calculations([('1 + 1', '2', '2024-01-15 10:30:00'), ('2 + 2', '4', 0)])
+    rows = db.get_all_calculations()
+    assert rows[1]['created_at'] == '2024-01-15 10:30:00'
+    with pytest.raises(ValueError):
+        db.save_calculations([('1 + 1', '2', 'yesterday')])
+
+
+def test_legacy_table_is_migrated(tmp_path, monkeypatch):
+    from .. import database
+    path = tmp_path / 'legacy.db'
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE calculations (id INTEGER PRIMARY KEY AUTOINCREMENT, expression TEXT NOT NULL, "
+        "result TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+    conn.executemany(
+        "INSERT INTO calculations (expression, result, created_at) VALUES (?, ?, ?)",
+        [('1 + 1', '2', '2024-01-01 12:00:00'), ('2 + 2', '4', '2024-01-02 12:00:00'),
+         ('1 + 1', '2', '2024-01-03 12:00:00'), ('3 + 3', '6', '2024-01-04 12:00:00')],
+    )
+    conn.execute("DELETE FROM calculations WHERE id = 4")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, 'DB_PATH', str(path))
+    database.init_database()
+    database.init_pool(1)
+    try:
+        assert database.get_all_calculations() == [
+            {'id': '3', 'expression': '1 + 1', 'result': '2', 'created_at': '2024-01-03 12:00:00'},
+            {'id': '2', 'expression': '2 + 2', 'result': '4', 'created_at': '2024-01-02 12:00:00'},
+            {'id': '1', 'expression': '1 + 1', 'result': '2', 'created_at': '2024-01-01 12:00:00'},
+        ]
+        assert database.top_expressions(1)[0]['hits'] == 2
+        assert database.save_calculation('5 + 5', '10') == 5
+        assert [row['id'] for row in database.search_calculations('4')] == ['2']
+    finally:
+        database.close_pool()
@@ -0,0 +1,42 @@
+from ..history_writer import HistoryWriter, HistoryQueueFullError
+import time
+import pytest
+
+
+def test_flush_on_stop(db):
+    writer = HistoryWriter(batch_size=10, flush_interval=60)
+    writer.start()
+    for i in range(25):
+        writer.submit(f'{i} + 0', str(i))
+    writer.stop()
+    rows = db.get_all_calculations()
+    assert [row['result'] for row in rows] == [str(i) for i in reversed(range(25))]
+    stats = writer.stats()
+    assert stats['flushed_rows'] == 25
+    assert stats['flushes'] == 3
+    assert stats['queue_depth'] == 0
+
+
+def test_flush_interval(db):
+    writer = HistoryWriter(batch_size=1000, flush_interval=0.01)
+    writer.start()
+    writer.submit('1 + 1', '2')
+    for _ in range(200):
+        if writer.stats()['flushed_rows']:
+            break
+        time.sleep(0.01)
+    assert len(db.get_all_calculations()) == 1
+    writer.stop()
+
+
+def test_backpressure(db):
+    writer = HistoryWriter(max_queue=2, submit_timeout=0.01)
+    # not started: nothing drains the queue
+    writer.submit('1', '1')
+    writer.submit('2', '2')
+    with pytest.raises(HistoryQueueFullError):
+        writer.submit('3', '3')
+    assert writer.stats()['rejected_rows'] == 1
+    writer.start()
+    writer.stop()
+    assert len(db.get_all_calculations()) == 2
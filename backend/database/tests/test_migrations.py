@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+
+def user_version(db):
+    conn = sqlite3.connect(db.DB_PATH)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_current_schema_is_not_migrated_again(db):
+    assert user_version(db) == db.SCHEMA_VERSION
+    assert db.init_database() == 0
+
+
+def test_unversioned_schema_is_upgraded_in_place(db):
+    db.save_calculations([('1 + 1', '2'), ('2 + 2', '4')])
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+    assert db.init_database() == db.SCHEMA_VERSION
+    assert len(db.get_all_calculations()) == 2
+    assert len(db.search_calculations('2')) == 2
+
+
+def test_newer_schema_is_rejected(db):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.execute(f"PRAGMA user_version = {db.SCHEMA_VERSION + 1}")
+    conn.close()
+    with pytest.raises(db.DatabaseInitializationError):
+        db.init_database()
@@ -0,0 +1,126 @@
+import sqlite3
+import threading
+
+import pytest
+
+from .. import database
+from ..database import ConnectionPool, DatabaseConnectionError
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'calculations.db'))
+    pool = ConnectionPool(size=2, acquire_timeout=0.05)
+    yield pool
+    pool.close()
+
+
+def test_acquire_and_release(pool):
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    assert pool.stats() == {'size': 2, 'open': 2, 'in_use': 2, 'idle': 0, 'acquired': 2, 'waits': 0, 'timeouts': 0}
+    pool.release(second)
+    pool.release(first)
+    # the most recently released connection is handed out first
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.stats() == {'size': 2, 'open': 2, 'in_use': 0, 'idle': 2, 'acquired': 3, 'waits': 0, 'timeouts': 0}
+
+
+def test_release_rolls_back(pool):
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+        assert conn.in_transaction
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone() == (0,)
+
+
+def test_timeout_when_exhausted(pool):
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(DatabaseConnectionError, match='No database connection available'):
+        pool.acquire()
+    stats = pool.stats()
+    assert (stats['waits'], stats['timeouts'], stats['in_use']) == (1, 1, 2)
+    for conn in held:
+        pool.release(conn)
+
+
+def test_waiter_gets_released_connection(pool):
+    pool.acquire_timeout = 5
+    held = [pool.acquire(), pool.acquire()]
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    pool.release(held[0])
+    waiter.join()
+    assert acquired == [held[0]]
+    assert pool.stats()['waits'] == 1
+    pool.release(held[1])
+    pool.release(acquired[0])
+
+
+def test_close(pool):
+    idle, in_use = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        idle.execute('SELECT 1')
+    with pytest.raises(DatabaseConnectionError, match='closed'):
+        pool.acquire()
+    # connections in use are closed when they come back
+    in_use.execute('SELECT 1')
+    pool.release(in_use)
+    with pytest.raises(sqlite3.ProgrammingError):
+        in_use.execute('SELECT 1')
+    assert pool.stats()['open'] == 0
+
+
+def test_close_during_release(pool):
+    conn = pool.acquire()
+    put = pool._idle.put
+    closing = threading.Thread(target=pool.close)
+
+    def put_while_closing(item):
+        # close() runs between the release's check and its put, unless it waits for the release
+        closing.start()
+        closing.join(0.1)
+        put(item)
+
+    pool._idle.put = put_while_closing
+    pool.release(conn)
+    closing.join()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    assert pool.stats()['open'] == 0
+
+
+def test_connections_are_opened_outside_the_lock(pool, monkeypatch):
+    connect = database._connect
+    locked = []
+
+    def checked_connect():
+        locked.append(pool._lock.locked())
+        return connect()
+
+    monkeypatch.setattr(database, '_connect', checked_connect)
+    pool.release(pool.acquire())
+    assert locked == [False]
+
+
+def test_failed_connect_frees_the_slot(pool, monkeypatch):
+    connect = database._connect
+
+    def failing_connect():
+        raise DatabaseConnectionError('Cannot open')
+
+    monkeypatch.setattr(database, '_connect', failing_connect)
+    with pytest.raises(DatabaseConnectionError, match='Cannot open'):
+        pool.acquire()
+    assert pool.stats()['open'] == 0
+    monkeypatch.setattr(database, '_connect', connect)
+    held = [pool.acquire(), pool.acquire()]
+    assert pool.stats()['open'] == 2
+    for conn in held:
+        pool.release(conn)
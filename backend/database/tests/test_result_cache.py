@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+
+import pytest
+
+from ..result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.db'), max_entries=100)
+    cache.start()
+    yield cache
+    cache.stop()
+
+
+def test_hits_and_misses(cache):
+    assert cache.get('2 + 2') is None
+    cache.put('2 + 2', 4.0)
+    assert cache.get('2 + 2') == 4.0
+    stats = cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 1, 0.5)
+
+
+def test_non_finite_values_are_not_stored(cache):
+    cache.put('x', float('inf'))
+    assert cache.get('x') is None
+
+
+def test_entries_expire(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.db'), ttl=0.05)
+    cache.start()
+    cache.put('1 + 1', 2.0)
+    assert cache.get('1 + 1') == 2.0
+    time.sleep(0.1)
+    assert cache.get('1 + 1') is None
+    cache.stop()
+
+
+def test_least_recently_used_are_evicted(cache):
+    cache.touch_interval = 0
+    for i in range(100):
+        cache.put(str(i), float(i))
+    # used after it was stored, so newer than the rest
+    cache.get('0')
+    for i in range(100, 110):
+        cache.put(str(i), float(i))
+    stats = cache.stats()
+    assert stats['size'] <= cache.max_entries
+    assert stats['evictions'] > 0
+    assert cache.get('0') == 0.0
+    assert cache.get('1') is None
+    assert cache.get('109') == 109.0
+
+
+def test_other_fingerprint_drops_entries(tmp_path):
+    path = str(tmp_path / 'results.db')
+    for fingerprint, expected in (('a', None), ('a', 1.0), ('b', None)):
+        cache = ResultCache(path, fingerprint=fingerprint)
+        cache.start()
+        assert cache.get('1') == expected
+        cache.put('1', 1.0)
+        cache.stop()
+
+
+def _use_cache(path: str) -> None:
+    """Runs in a separate process"""
+    cache = ResultCache(path)
+    cache.start()
+    cache.get('6 * 7')
+    cache.get('missing')
+    cache.stop()
+
+
+def test_processes_share_entries_and_report_hit_rates(cache):
+    cache.put('6 * 7', 42.0)
+    process = multiprocessing.get_context('spawn').Process(target=_use_cache, args=(cache.path,))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    workers = cache.stats()['workers']
+    assert len(workers) == 2
+    other = next(worker for worker in workers if worker['pid'] == process.pid)
+    assert (other['hits'], other['misses'], other['hit_rate']) == (1, 1, 0.5)
@@ -0,0 +1,64 @@
+from ..retention import RetentionJob
+import time
+import pytest
+
+
+@pytest.fixture
+def filled(db):
+    db.save_calculations([(f'{i} + 0', str(i), f'2024-01-{i:02d} 00:00:00') for i in range(1, 21)])
+    return db
+
+
+def results(db):
+    return sorted(int(row['result']) for row in db.get_all_calculations())
+
+
+def test_prune_max_rows_in_batches(filled):
+    assert filled.prune_calculations(max_rows=5, batch_size=10) == 10
+    assert filled.prune_calculations(max_rows=5, batch_size=10) == 5
+    assert filled.prune_calculations(max_rows=5, batch_size=10) == 0
+    assert results(filled) == list(range(16, 21))
+
+
+def test_prune_older_than(filled):
+    assert filled.prune_calculations(older_than='2024-01-08', batch_size=100) == 7
+    assert results(filled) == list(range(8, 21))
+
+
+def test_prune_both_limits(filled):
+    assert filled.prune_calculations(max_rows=15, older_than='2024-01-08', batch_size=6) == 6
+    assert filled.prune_calculations(max_rows=15, older_than='2024-01-08', batch_size=6) == 1
+    assert results(filled) == list(range(8, 21))
+    assert filled.prune_calculations() == 0
+
+
+def test_delete_all_reclaims_space(filled):
+    filled.save_calculations([('1 + 1' * 100, '2')] * 2000)
+    assert filled.delete_all_calculations() == 2020
+    free = filled.storage_stats()['freelist_count']
+    assert free > 0
+    assert filled.incremental_vacuum(1) == 1
+    assert filled.incremental_vacuum() == free - 1
+    assert filled.storage_stats()['freelist_count'] == 0
+
+
+def test_job_run_once(filled):
+    job = RetentionJob(max_rows=3, batch_size=4, pause=0)
+    assert job.run_once() == 17
+    assert results(filled) == [18, 19, 20]
+    stats = job.stats()
+    assert stats['runs'] == 1
+    assert stats['deleted_rows'] == 17
+    assert filled.storage_stats()['freelist_count'] == 0
+
+
+def test_job_start_stop(filled):
+    job = RetentionJob(max_age_days=1, interval=60)
+    job.start()
+    for _ in range(200):
+        if job.stats()['runs']:
+            break
+        time.sleep(0.01)
+    job.stop()
+    assert job.stats()['runs'] == 1
+    assert results(filled) == []
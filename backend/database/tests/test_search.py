@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def filled(db):
+    db.save_calculations([
+        ('2 + 35', '37'),
+        ('sin(0.5) * 2', '0.958851077208406'),
+        ('12 + 3', '15'),
+        ('sqrt(16)', '4'),
+        ('2 + 3', '5'),
+    ])
+    return db
+
+
+def expressions(rows):
+    return [row['expression'] for row in rows]
+
+
+def test_fragment_matches_token_prefixes(filled):
+    assert sorted(expressions(filled.search_calculations('2+3'))) == ['2 + 3', '2 + 35']
+    assert expressions(filled.search_calculations('sin(0.5')) == ['sin(0.5) * 2']
+    assert expressions(filled.search_calculations('sq 16')) == ['sqrt(16)']
+
+
+def test_matches_result(filled):
+    assert expressions(filled.search_calculations('0.958')) == ['sin(0.5) * 2']
+    assert expressions(filled.search_calculations('15')) == ['12 + 3']
+
+
+@pytest.mark.parametrize("text", ['+', '  ', '"', 'x OR'])
+def test_query_syntax_is_not_interpreted(filled, text):
+    assert filled.search_calculations(text) == []
+
+
+def test_recent_pages(filled):
+    first = filled.search_calculations('2', limit=2, sort='recent')
+    assert expressions(first) == ['2 + 3', 'sin(0.5) * 2']
+    rest = filled.search_calculations('2', limit=2, sort='recent', before_id=int(first[-1]['id']))
+    assert expressions(rest) == ['2 + 35']
+
+
+def test_ranked_pages(filled):
+    ranked = filled.search_calculations('2', limit=10)
+    pages = filled.search_calculations('2', limit=2) + filled.search_calculations('2', limit=2, offset=2)
+    assert pages == ranked
+    assert len(ranked) == 3
+
+
+def test_index_follows_deletes_and_imports(filled):
+    assert filled.prune_calculations(max_rows=1) == 4
+    assert expressions(filled.search_calculations('2')) == ['2 + 3']
+    conn = sqlite3.connect(filled.DB_PATH)
+    version = conn.execute("PRAGMA schema_version").fetchone()
+    assert filled.delete_all_calculations() == 1
+    # the index is cleared without dropping its delete trigger
+    assert conn.execute("PRAGMA schema_version").fetchone() == version
+    conn.execute("INSERT INTO calculations_fts (calculations_fts) VALUES ('integrity-check')")
+    conn.close()
+    assert filled.search_calculations('2') == []
+    filled.import_calculations([('7 * 6', '42', None)], batch_size=1)
+    filled.save_calculation('7 + 1', '8')
+    assert sorted(expressions(filled.search_calculations('7'))) == ['7 * 6', '7 + 1']
+
+
+def test_decimal_separators_match(db):
+    db.save_calculations([('sin(0,5) × 2', '0.958851077208406')])
+    assert len(db.search_calculations('0.5')) == 1
+    assert len(db.search_calculations('0,958')) == 1
@@ -0,0 +1,25 @@
+def test_versions(db):
+    db.create_session('s')
+    assert db.get_session('s') == (0, [])
+    assert db.change_session('s', 0, 'a', '1') == 1
+    assert db.change_session('s', 1, 'b', 'a + 1') == 2
+    # a redefined variable keeps its place
+    assert db.change_session('s', 2, 'a', '5') == 3
+    assert db.get_session('s') == (3, [('a', '5'), ('b', 'a + 1')])
+    assert db.get_session('s', known_version=3) == (3, None)
+    # a change against an outdated version is refused
+    assert db.change_session('s', 2, 'c', '1') is None
+    assert db.change_session('s', 3, 'a', None) == 4
+    assert db.get_session('s') == (4, [('b', 'a + 1')])
+    assert db.get_session('unknown') is None
+    assert db.change_session('unknown', 0, 'a', '1') is None
+
+
+def test_least_recently_changed_sessions_are_dropped(db):
+    for name in 'abc':
+        db.create_session(name, max_sessions=2)
+        db.change_session(name, 0, 'x', '1')
+    assert db.get_session('a') is None
+    db.change_session('b', 1, 'x', '2')
+    db.create_session('d', max_sessions=2)
+    assert [db.get_session(name) is not None for name in 'abcd'] == [False, True, False, True]
@@ -0,0 +1,98 @@
+import io
+import sqlite3
+
+from .. import transfer
+import pytest
+
+
+@pytest.fixture
+def filled(db):
+    db.save_calculations([(f'{i} + "x", y', str(i), f'2024-01-{i:02d} 00:00:00') for i in range(1, 26)])
+    return db
+
+
+def export(fmt, chunk_size=7):
+    return "".join(transfer.export_chunks(fmt, chunk_size))
+
+
+@pytest.mark.parametrize("fmt", transfer.FORMATS)
+def test_round_trip(filled, fmt):
+    exported = export(fmt)
+    before = filled.get_all_calculations()
+    assert filled.import_calculations(transfer.read_rows(io.StringIO(exported), fmt), batch_size=10) == 25
+    after = filled.get_all_calculations()
+    assert len(after) == 50
+    strip = lambda rows: [(row['expression'], row['result'], row['created_at']) for row in rows]
+    assert strip(after[:25]) == strip(before)
+
+
+def test_chunks_in_id_order(filled):
+    chunks = list(filled.iter_calculation_chunks(chunk_size=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert [row[0] for chunk in chunks for row in chunk] == list(range(1, 26))
+
+
+def test_empty_csv_export(db):
+    assert export("csv") == "id,expression,result,created_at\n"
+    assert export("ndjson") == ""
+
+
+def schema(db):
+    conn = sqlite3.connect(db.DB_PATH)
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")}
+    conn.close()
+    return names
+
+
+def schema_version(db):
+    conn = sqlite3.connect(db.DB_PATH)
+    (version,) = conn.execute("PRAGMA schema_version").fetchone()
+    conn.close()
+    return version
+
+
+def test_schema_kept_during_import(filled):
+    seen = []
+    version = schema_version(filled)
+
+    def rows():
+        for i in range(35):
+            if i % 10 == 5:
+                # between batches: another writer saves a row, and the schema is complete
+                filled.save_calculation(f'{i} * 1000', str(i * 1000))
+                seen.append(schema(filled))
+            yield (f'{i} - 777', str(i - 777), None)
+
+    assert filled.import_calculations(rows(), batch_size=10) == 35
+    for names in seen + [schema(filled)]:
+        assert set(filled.OCCURRENCE_INDEXES) <= names
+        assert 'calculations_fts_insert' in names
+    # nothing was dropped and created again either, which would make every connection prepare its statements again
+    assert schema_version(filled) == version
+    conn = sqlite3.connect(filled.DB_PATH)
+    # the search index holds every expression exactly once
+    conn.execute("INSERT INTO calculations_fts (calculations_fts) VALUES ('integrity-check')")
+    conn.close()
+    assert len(filled.search_calculations('1000')) == 3
+    assert len(filled.search_calculations('777')) == 35
+    assert len(filled.get_all_calculations()) == 25 + 35 + 3
+
+
+@pytest.mark.parametrize("fmt,text", [
+    ("csv", "a,b\n1,2\n"),
+    ("csv", "expression,result\n1 + 1\n"),
+    ("ndjson", '{"expression": "1"}\n'),
+    ("ndjson", 'not json\n'),
+])
+def test_invalid_input(db, fmt, text):
+    with pytest.raises(ValueError):
+        db.import_calculations(transfer.read_rows(io.StringIO(text), fmt))
+
+
+def test_cli(filled, tmp_path, capsys):
+    path = tmp_path / 'history.ndjson'
+    transfer.main(['export', '--format', 'ndjson', '--output', str(path)])
+    filled.init_pool(4)
+    transfer.main(['import', '--format', 'ndjson', str(path)])
+    filled.init_pool(4)
+    assert len(filled.get_all_calculations()) == 50
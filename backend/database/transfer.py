@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Export and import of the calculation history as CSV or NDJSON
+
+Export streams the table in keyset chunks, so memory use does not depend on its size;
+import appends rows in large batched transactions, indexing each batch for search in bulk.
+Imported rows get new ids, in file order.
+
+Usage (from the backend directory):
+    python -m database.transfer export [--format csv|ndjson] [--output FILE]
+    python -m database.transfer import [--format csv|ndjson] [FILE]
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from typing import IO, Iterator, Optional, Tuple
+
+from database import database
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+CSV_HEADER = ("id", "expression", "result", "created_at")
+
+
+def export_chunks(fmt: str, chunk_size: int = 10_000) -> Iterator[str]:
+    """The whole table in the given format, one string per chunk of rows"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(CSV_HEADER)
+        for chunk in database.iter_calculation_chunks(chunk_size):
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        # the header alone, for an empty table
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+    dumps = json.dumps
+    for chunk in database.iter_calculation_chunks(chunk_size):
+        yield "".join(
+            dumps({"id": row[0], "expression": row[1], "result": row[2], "created_at": row[3]},
+                  ensure_ascii=False) + "\n"
+            for row in chunk
+        )
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """(expression, result, created_at) rows of an export; the id column is ignored"""
+    if fmt == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, None)
+        if header is None:
+            return
+        try:
+            columns = [header.index(name) for name in ("expression", "result")]
+        except ValueError:
+            raise ValueError("CSV header must name the expression and result columns")
+        created_at = header.index("created_at") if "created_at" in header else None
+        expression, result = columns
+        for line, row in enumerate(reader, start=2):
+            try:
+                yield row[expression], row[result], row[created_at] if created_at is not None else None
+            except IndexError:
+                raise ValueError(f"Missing columns on line {line}")
+    elif fmt == "ndjson":
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+                yield row["expression"], row["result"], row.get("created_at")
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise ValueError(f"Invalid record on line {line}")
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def _export(args) -> None:
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in export_chunks(args.format, args.chunk_size):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+def _import(args) -> None:
+    source = open(args.file, encoding="utf-8", newline="") if args.file else sys.stdin
+    started = time.perf_counter()
+    try:
+        imported = database.import_calculations(read_rows(source, args.format), args.batch_size)
+    finally:
+        if args.file:
+            source.close()
+    print(f"Imported {imported} rows in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+
+def main(argv=None) -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write the history to a file or stdout")
+    export.add_argument("--format", choices=FORMATS, default="csv")
+    export.add_argument("--output", "-o", help="file to write (stdout by default)")
+    export.add_argument("--chunk-size", type=int, default=10_000, help="rows per query")
+    export.set_defaults(run=_export)
+
+    load = commands.add_parser("import", help="append the rows of an export to the history")
+    load.add_argument("file", nargs="?", help="file to read (stdin by default)")
+    load.add_argument("--format", choices=FORMATS, default="csv")
+    load.add_argument("--batch-size", type=int, default=50_000, help="rows per transaction")
+    load.set_defaults(run=_import)
+
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    database.init_database()
+    database.init_pool(1)
+    try:
+        args.run(args)
+    finally:
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
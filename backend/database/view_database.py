@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 """
-Simple script to view the contents of the echo_strings database
+Simple script to view the calculation history
+
+For exporting the history to a file see database/transfer.py
 """
 
 import sqlite3
@@ -8,8 +10,12 @@ import os
 import sys
 from datetime import datetime
 
-# Database file path
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'storage', 'calculations.db')
+# Database file path, set like database.DB_PATH (this script runs on its own, without the package)
+DB_PATH = os.environ.get('CALC_DB_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'storage', 'calculations.db')
+
+# Rows fetched from the cursor at a time, so large histories are printed in constant memory
+CHUNK_SIZE = 1000
 
 def view_database():
     """View all records in the calculations database"""
@@ -22,23 +28,26 @@ def view_database():
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
-        # Get all records
-        cursor.execute('SELECT id, text, created_at FROM echo_strings ORDER BY created_at DESC')
-        records = cursor.fetchall()
-        
-        if not records:
+        count = cursor.execute('SELECT COUNT(*) FROM calculations').fetchone()[0]
+        if not count:
             print("No records found in the database.")
-        else:
-            print(f"Found {len(records)} records in the database:")
-            print("-" * 80)
-            print(f"{'ID':<5} {'Text':<30} {'Created At':<20}")
-            print("-" * 80)
-            
-            for record in records:
-                id_val, text, created_at = record
-                # Truncate long text for display
-                display_text = text[:27] + "..." if len(text) > 30 else text
-                print(f"{id_val:<5} {display_text:<30} {created_at:<20}")
+            return
+
+        print(f"Found {count} records in the database:")
+        print("-" * 80)
+        print(f"{'ID':<8} {'Expression':<36} {'Result':<14} {'Created At':<20}")
+        print("-" * 80)
+
+        cursor.execute('SELECT id, expression, result, created_at FROM calculations ORDER BY id DESC')
+        while True:
+            records = cursor.fetchmany(CHUNK_SIZE)
+            if not records:
+                break
+            for id_val, expression, result, created_at in records:
+                # Truncate long values for display
+                display_expression = expression[:33] + "..." if len(expression) > 36 else expression
+                display_result = result[:11] + "..." if len(result) > 14 else result
+                print(f"{id_val:<8} {display_expression:<36} {display_result:<14} {created_at:<20}")
     
     except sqlite3.Error as e:
         print(f"Database error: {e}")
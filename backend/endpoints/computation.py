@@ -21,7 +21,7 @@ async def parse_string(request: ComputationRequest):
     """Compute endpoint that saves the input string to database and returns result of computation"""
     parser = Parser()
     try:
-        result = parser.parse_expression(request.text)
+        result = parser.compile(request.text).evaluate()
         string_id = save_string(request.text)
         # Для целочисленного деления показываем целые числа без .0 где возможно
         if result.is_integer():
@@ -0,0 +1,135 @@
+"""
+Response encoding: fast JSON, content negotiation of row and column layouts, compression
+
+orjson, msgpack and brotli are optional; without them JSON falls back to the stdlib encoder,
+the msgpack media type is not offered and responses are only ever gzip-compressed
+"""
+
+import gzip
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+# {"column": [values...], ...}: the keys once instead of once per row, and ids as numbers
+COLUMNS_JSON = "application/vnd.calculator.columns+json"
+# the same parallel arrays, as MessagePack
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = ("application/x-msgpack",)
+
+# Default response class of the application: the stdlib encoder is several times slower
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+# Fast levels: at the default ones compressing a large history takes longer than encoding it,
+# for bodies only about a fifth smaller
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+
+
+def dumps(content: object) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def media_types() -> List[str]:
+    """Media types the history can be encoded as, preferred first"""
+    types = [JSON, COLUMNS_JSON]
+    if msgpack is not None:
+        types.append(MSGPACK)
+    return types
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Accept-style header as {value: quality}"""
+    accepted = {}
+    for item in header.split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        accepted[value.lower()] = quality
+    return accepted
+
+
+def negotiate(accept: Optional[str], offers: Sequence[str]) -> Optional[str]:
+    """
+    The offer the Accept header rates highest (ties go to the earlier offer), or None when
+    it accepts none of them. No header accepts anything
+    """
+    if not accept:
+        return offers[0] if offers else None
+    accepted = _accepted(accept)
+    for alias in MSGPACK_ALIASES:
+        if alias in accepted:
+            accepted.setdefault(MSGPACK, accepted[alias])
+    best, best_quality = None, 0.0
+    for offer in offers:
+        kind = offer.split("/")[0]
+        quality = accepted.get(offer, accepted.get(f"{kind}/*", accepted.get("*/*", 0.0)))
+        if quality > best_quality:
+            best, best_quality = offer, quality
+    return best
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(body, content encoding or None): br or gzip when accepted and the body is large enough"""
+    if not accept_encoding or not settings.COMPRESS_MIN_BYTES or len(body) < settings.COMPRESS_MIN_BYTES:
+        return body, None
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def encode(content: object, media_type: str) -> bytes:
+    """
+    Body of content in one of media_types(): rows (a list of dicts) for JSON,
+    parallel columns (a dict of lists) for the column layouts
+    """
+    if media_type in (JSON, COLUMNS_JSON):
+        return dumps(content)
+    if media_type == MSGPACK and msgpack is not None:
+        return msgpack.packb(content, use_bin_type=True)
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def encoded_response(request: Request, body: bytes, media_type: str,
+                     headers: Optional[Dict[str, str]] = None) -> Response:
+    body, encoding = compress(body, request.headers.get("accept-encoding"))
+    response = Response(body, media_type=media_type, headers=headers)
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def not_acceptable() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                         detail=f"Available media types: {', '.join(media_types())}")
@@ -0,0 +1,11 @@
+from fastapi import HTTPException, status
+
+from computation.budget import BudgetExceededError
+
+
+def budget_exceeded(e: BudgetExceededError) -> HTTPException:
+    """413 with a machine-readable code, distinct from ordinary 400 expression errors"""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail={"code": "budget_exceeded", "limit": e.limit, "message": str(e)},
+    )
@@ -0,0 +1,178 @@
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, status
+from pydantic import BaseModel
+
+from computation.budget import BudgetExceededError
+from computation.cache import LRUCache
+from computation.workspace import Workspace
+from database import database
+from endpoints.errors import budget_exceeded
+from profiling import ProfiledRoute
+import settings
+
+# Create router for variable sessions
+router = APIRouter(prefix="/sessions", tags=["variables"], route_class=ProfiledRoute)
+
+# Sessions stored in the database; the least recently changed ones beyond this are dropped
+MAX_SESSIONS = 1000
+# Attempts at a change that keeps losing the race against other changes of the session
+MAX_CHANGE_ATTEMPTS = 20
+# Version of a copy that no longer matches what is stored
+_STALE = -1
+
+
+class _Session:
+    """This process's copy of a stored session: its workspace as of version"""
+
+    __slots__ = ('version', 'workspace', 'lock')
+
+    def __init__(self, version: int, definitions):
+        self.version = version
+        self.workspace = Workspace(budget=settings.BUDGET)
+        for name, expression in definitions:
+            self.workspace.define(name, expression)
+        # held while the workspace is read or changed, so no one sees a change before it is stored
+        self.lock = threading.Lock()
+
+
+# Sessions are stored in the database, so that every server process serves all of them; a
+# process keeps copies of the sessions it used and rebuilds one when another process changed it
+sessions = LRUCache(maxsize=MAX_SESSIONS)
+
+
+class VariableRequest(BaseModel):
+    expression: str
+
+
+class VariableResponse(BaseModel):
+    name: str
+    expression: str
+    value: Optional[float] = None
+    error: Optional[str] = None
+
+
+class UpdateResponse(BaseModel):
+    name: str
+    value: Optional[float] = None
+    error: Optional[str] = None
+    recomputed: int
+    changed: Dict[str, Optional[float]]
+
+
+class SessionResponse(BaseModel):
+    session_id: str
+
+
+class EvaluateResponse(BaseModel):
+    result: float
+
+
+def _session(session_id: str) -> _Session:
+    """This process's copy of a session, rebuilt if the stored session changed since"""
+    cached = sessions.get(session_id)
+    try:
+        stored = database.get_session(session_id, cached.version if cached is not None else None)
+    except database.DatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if stored is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+    version, definitions = stored
+    if definitions is None:
+        return cached
+    session = _Session(version, definitions)
+    sessions.put(session_id, session)
+    return session
+
+
+def _change(session_id: str, name: str, expression: Optional[str]) -> dict:
+    """
+    Define (or, with expression None, delete) a variable: the change is made to this process's
+    copy and then stored, provided no one changed the session in between; otherwise it is
+    made again on a fresh copy
+    """
+    for _ in range(MAX_CHANGE_ATTEMPTS):
+        session = _session(session_id)
+        with session.lock:
+            # raises before changing anything when the definition is invalid or the name unknown
+            if expression is None:
+                result = session.workspace.remove(name)
+            else:
+                result = session.workspace.define(name, expression)
+            expected, session.version = session.version, _STALE
+            try:
+                version = database.change_session(session_id, expected, result.name, expression)
+            except database.DatabaseError as e:
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+            if version is not None:
+                session.version = version
+                return result._asdict()
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                        detail="Session is being changed concurrently, try again")
+
+
+def _variable(cell) -> dict:
+    return {"name": cell.name, "expression": cell.expression, "value": cell.value, "error": cell.error}
+
+
+@router.post("", response_model=SessionResponse)
+def create_session():
+    """Start an empty set of variables"""
+    session_id = uuid.uuid4().hex
+    try:
+        database.create_session(session_id, MAX_SESSIONS)
+    except database.DatabaseError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    sessions.put(session_id, _Session(0, []))
+    return {"session_id": session_id}
+
+
+@router.get("/{session_id}/variables", response_model=List[VariableResponse])
+def list_variables(session_id: str):
+    session = _session(session_id)
+    with session.lock:
+        return [_variable(cell) for cell in session.workspace.cells()]
+
+
+@router.get("/{session_id}/variables/{name}", response_model=VariableResponse)
+def get_variable(session_id: str, name: str):
+    session = _session(session_id)
+    try:
+        with session.lock:
+            return _variable(session.workspace.get(name))
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variable not found")
+
+
+@router.put("/{session_id}/variables/{name}", response_model=UpdateResponse)
+def define_variable(session_id: str, name: str, request: VariableRequest):
+    """Define or update a variable; only the variables depending on it are recomputed"""
+    try:
+        return _change(session_id, name, request.expression)
+    except BudgetExceededError as e:
+        raise budget_exceeded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.delete("/{session_id}/variables/{name}", response_model=UpdateResponse)
+def delete_variable(session_id: str, name: str):
+    try:
+        return _change(session_id, name, None)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Variable not found")
+
+
+@router.post("/{session_id}/evaluate", response_model=EvaluateResponse)
+def evaluate(session_id: str, request: VariableRequest):
+    """Evaluate an expression using the session's variables"""
+    session = _session(session_id)
+    try:
+        with session.lock:
+            return {"result": session.workspace.evaluate(request.expression)}
+    except BudgetExceededError as e:
+        raise budget_exceeded(e)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -1,22 +1,145 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
-from typing import Union
+import io
+import json
+import tempfile
+from time import perf_counter
+from typing import List, Optional, Union
 
 from database.database import (
-    init_database, DatabaseInitializationError,
-    save_calculation, get_all_calculations, delete_all_calculations,
+    init_database, init_pool, close_pool, pool_stats, row_stats, DatabaseInitializationError, DatabaseError,
+    save_calculation, save_calculations, get_all_calculations, delete_all_calculations,
+    get_calculations_page, get_history_columns, iter_calculations, import_calculations, storage_stats,
+    search_calculations, top_expressions, parse_timestamp, DB_PATH,
 )
-from computation.parser import Parser 
+from database.history_writer import HistoryWriter, HistoryQueueFullError
+from database.result_cache import ResultCache
+from database.retention import RetentionJob
+from database import transfer
+from computation.parser import Parser, expression_cache, normalize_expression
+from computation.budget import BudgetExceededError
+from computation.executor import EvaluationPool, EvaluationPoolError
+from computation.lexer import ExpressionSyntaxError
+from computation.preview import EVALUATION_ERRORS, PreviewSession
+from endpoints.errors import budget_exceeded
+from endpoints import encoding
+from endpoints import variables
+import metrics
+import profiling
+import settings
 
-try:
-    init_database()
-except DatabaseInitializationError as e:
-    print(f"Failed to initialize database: {e}")
-    raise
+# Optional write-behind mode: history rows are queued and stored in group commits
+history_writer = (
+    HistoryWriter(
+        batch_size=settings.HISTORY_BATCH_SIZE,
+        flush_interval=settings.HISTORY_FLUSH_MS / 1000,
+        max_queue=settings.HISTORY_QUEUE_SIZE,
+    )
+    if settings.HISTORY_WRITE_BEHIND else None
+)
+
+# Optional process pool for expensive evaluations; cheap ones are evaluated inline
+evaluation_pool = (
+    EvaluationPool(
+        workers=settings.EVAL_POOL_WORKERS,
+        max_pending=settings.EVAL_POOL_QUEUE,
+        threshold=settings.EVAL_POOL_THRESHOLD,
+        timeout=settings.EVAL_POOL_TIMEOUT_MS / 1000,
+    )
+    if settings.EVAL_POOL_WORKERS > 0 else None
+)
+
+# Background pruning to the retention limits and reclaiming of free pages
+retention_job = (
+    RetentionJob(
+        max_rows=settings.RETENTION_MAX_ROWS or None,
+        max_age_days=settings.RETENTION_MAX_AGE_DAYS or None,
+        interval=settings.RETENTION_INTERVAL_S,
+        batch_size=settings.RETENTION_BATCH_SIZE,
+    )
+    if settings.RETENTION_INTERVAL_S > 0 else None
+)
+
+# Optional cache of /calculate results shared by all worker processes; results computed under
+# other evaluation limits are dropped when it starts
+result_cache = (
+    ResultCache(
+        path=settings.RESULT_CACHE_PATH,
+        max_entries=settings.RESULT_CACHE_SIZE,
+        ttl=settings.RESULT_CACHE_TTL_S,
+        fingerprint=repr(settings.BUDGET),
+    )
+    if settings.RESULT_CACHE_SIZE > 0 else None
+)
+
+def startup():
+    # a no-op when the server has configured logging already
+    logging.basicConfig(level=logging.INFO)
+    try:
+        init_database()
+    except DatabaseInitializationError as e:
+        print(f"Failed to initialize database: {e}")
+        raise
+    init_pool(settings.DB_POOL_SIZE)
+    if result_cache:
+        result_cache.start()
+    if settings.CACHE_WARM_EXPRESSIONS:
+        warm_expression_cache(settings.CACHE_WARM_EXPRESSIONS)
+    if history_writer:
+        history_writer.start()
+    if retention_job:
+        retention_job.start()
+    if evaluation_pool:
+        evaluation_pool.start()
 
-app = FastAPI(title="Calculator API", version="1.0.0")
+def shutdown():
+    if evaluation_pool:
+        evaluation_pool.stop()
+    if retention_job:
+        retention_job.stop()
+    # the writer flushes its queue through the pool, so it stops first
+    if history_writer:
+        history_writer.stop()
+    if result_cache:
+        result_cache.stop()
+    close_pool()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Everything with side effects (database file, migrations, threads) happens here, not on import"""
+    startup()
+    try:
+        yield
+    finally:
+        shutdown()
+
+app = FastAPI(title="Calculator API", version="1.0.0", lifespan=lifespan,
+              default_response_class=encoding.FastJSONResponse)
+# endpoints run under the profiler of requests the profiling middleware picks
+app.router.route_class = profiling.ProfiledRoute
+
+app.include_router(variables.router)
+
+# Optional request profiling; when it is off the middleware is not installed at all
+profile_store = (
+    profiling.ProfileStore(
+        settings.PROFILE_DIR or os.path.join(os.path.dirname(DB_PATH), "profiles"),
+        keep=settings.PROFILE_KEEP,
+    )
+    if settings.PROFILE_SAMPLE_RATE > 0 or settings.PROFILE_TOKEN else None
+)
+if profile_store:
+    app.add_middleware(profiling.ProfilingMiddleware, store=profile_store,
+                       sample_rate=settings.PROFILE_SAMPLE_RATE, token=settings.PROFILE_TOKEN)
+
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +155,39 @@ class CalcRequest(BaseModel):
 class CalcResponse(BaseModel):
     result: Union[float, int, str]
 
+class BatchCalcRequest(BaseModel):
+    expressions: List[str]
+
+class BatchCalcItem(BaseModel):
+    result: Optional[Union[float, int, str]] = None
+    error: Optional[str] = None
+
+class BatchCalcResponse(BaseModel):
+    results: List[BatchCalcItem]
+
+MAX_BATCH_SIZE = 1000
+
+class TabulateRequest(BaseModel):
+    expression: str
+    variable: str = "x"
+    # either an explicit list of points or an inclusive range split into num points
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    num: int = 101
+
+class TabulateResponse(BaseModel):
+    x: List[float]
+    y: List[Optional[float]]
+    errors: List[Optional[str]]
+
+MAX_TABULATE_POINTS = 100_000
+
+MAX_HISTORY_PAGE = 1000
+MAX_SEARCH_LENGTH = 200
+# Ranked pages past this offset cost too much; sort=recent pages by id at any depth
+MAX_SEARCH_OFFSET = 10000
+
 SAFE_INT_LIMIT = 2**53
 
 def to_response_number(val):
@@ -52,28 +208,421 @@ def pretty_expression(expr: str) -> str:
                 .replace('/', '÷')
                 .replace('.', ','))
 
+def plain_expression(expr: str) -> str:
+    """Inverse of pretty_expression: the form the parser reads"""
+    return expr.replace('×', '*').replace('÷', '/').replace(',', '.')
+
+def warm_expression_cache(count: int) -> int:
+    """Compiles the count most often calculated expressions of the history into the cache"""
+    parser = Parser(budget=settings.BUDGET)
+    warmed = 0
+    for row in top_expressions(count):
+        try:
+            parser.compile(plain_expression(row["expression"]))
+        except (ExpressionSyntaxError, BudgetExceededError):
+            continue
+        warmed += 1
+    return warmed
+
+def evaluate(compiled):
+    if evaluation_pool:
+        return evaluation_pool.evaluate(compiled, budget=settings.BUDGET)
+    return compiled.evaluate(budget=settings.BUDGET)
+
+def save_history(expression: str, val) -> None:
+    started = perf_counter()
+    expr_for_history = pretty_expression(expression)
+    result_for_history = pretty_number(val)
+    formatted = perf_counter()
+    metrics.observe_stage("format", formatted - started)
+    if history_writer:
+        history_writer.submit(expr_for_history, result_for_history)
+    else:
+        save_calculation(expr_for_history, result_for_history)
+    metrics.observe_stage("save", perf_counter() - formatted)
+
 @app.post("/calculate", response_model=CalcResponse)
 def calculate(req: CalcRequest):
-    parser = Parser()
+    parser = Parser(budget=settings.BUDGET, on_stage=metrics.observe_stage)
     try:
-        val = parser.parse_expression(req.expression)
+        val = None
+        if result_cache:
+            # the other limits held when the cached value was computed
+            settings.BUDGET.check_length(req.expression)
+            key = normalize_expression(req.expression)
+            val = result_cache.get(key)
+        if val is None:
+            compiled = parser.compile(req.expression)
+            started = perf_counter()
+            val = evaluate(compiled)
+            metrics.observe_stage("evaluate", perf_counter() - started)
+            if result_cache:
+                result_cache.put(key, val)
         out = to_response_number(val)
-        expr_for_history = pretty_expression(req.expression)
-        result_for_history = pretty_number(val) 
-        save_calculation(expr_for_history, result_for_history)
+        save_history(req.expression, val)
         return {"result": out}
+    except BudgetExceededError as e:
+        metrics.ERRORS.inc("/calculate", type(e).__name__)
+        raise budget_exceeded(e)
+    except (HistoryQueueFullError, EvaluationPoolError) as e:
+        metrics.ERRORS.inc("/calculate", type(e).__name__)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
     except Exception as e:
+        metrics.ERRORS.inc("/calculate", type(e).__name__)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
+@app.post("/calculate/batch", response_model=BatchCalcResponse)
+def calculate_batch(req: BatchCalcRequest, persist: bool = Query(True, alias="save_history")):
+    if len(req.expressions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Batch is limited to {MAX_BATCH_SIZE} expressions")
+    parser = Parser(budget=settings.BUDGET)
+    results = []
+    history_rows = []
+    for expression in req.expressions:
+        try:
+            val = evaluate(parser.compile(expression))
+        except Exception as e:
+            metrics.ERRORS.inc("/calculate/batch", type(e).__name__)
+            results.append({"error": str(e)})
+            continue
+        results.append({"result": to_response_number(val)})
+        history_rows.append((pretty_expression(expression), pretty_number(val)))
+    if persist:
+        try:
+            if history_writer:
+                for expression, result in history_rows:
+                    history_writer.submit(expression, result)
+            else:
+                save_calculations(history_rows)
+        except HistoryQueueFullError as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+        except DatabaseError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    return {"results": results}
+
+@app.post("/tabulate", response_model=TabulateResponse)
+def tabulate_expression(req: TabulateRequest):
+    # numpy is imported by the first tabulation rather than at startup
+    import numpy as np
+    from computation.vectorized import tabulate
+
+    count = len(req.values) if req.values is not None else req.num
+    if not 1 <= count <= MAX_TABULATE_POINTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Tabulation needs from 1 to {MAX_TABULATE_POINTS} points")
+    if req.values is not None:
+        points = np.asarray(req.values, dtype=np.float64)
+    elif req.start is not None and req.stop is not None:
+        points = np.linspace(req.start, req.stop, req.num)
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Either values or start and stop are required")
+    try:
+        compiled = Parser(budget=settings.BUDGET).compile(req.expression)
+        table = tabulate(compiled, req.variable.lower(), points)
+    except BudgetExceededError as e:
+        metrics.ERRORS.inc("/tabulate", type(e).__name__)
+        raise budget_exceeded(e)
+    except Exception as e:
+        metrics.ERRORS.inc("/tabulate", type(e).__name__)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    errors = table.messages()
+    return {
+        "x": points.tolist(),
+        "y": [None if error else value for value, error in zip(table.values.tolist(), errors)],
+        "errors": errors,
+    }
+
+def _preview_message(session: PreviewSession, seq: int) -> dict:
+    try:
+        val = session.evaluate()
+    except BudgetExceededError as e:
+        return {"type": "error", "seq": seq, "error": str(e), "code": "budget_exceeded", "limit": e.limit}
+    except ExpressionSyntaxError as e:
+        return {"type": "error", "seq": seq, "error": str(e), "position": e.position}
+    except EVALUATION_ERRORS as e:
+        return {"type": "error", "seq": seq, "error": str(e)}
+    return {"type": "result", "seq": seq, "result": to_response_number(val)}
+
+@app.websocket("/ws/preview")
+async def preview(websocket: WebSocket):
+    """
+    Live preview of the result while the expression is typed. Client messages:
+    {"type": "edit", "position", "delete", "insert"}, {"type": "set", "expression"} and
+    {"type": "commit"}, each with an optional increasing "seq" that the replies echo.
+    Edits only change the text; the evaluator wakes up once the edits that already arrived
+    are applied, so a burst of keystrokes costs one evaluation of the latest text.
+    History is written on commit only
+    """
+    await websocket.accept()
+    session = PreviewSession(budget=settings.BUDGET)
+    changed = asyncio.Event()
+    latest = 0
+
+    async def evaluate():
+        while True:
+            await changed.wait()
+            # let queued edits be applied first: results for stale text are never computed
+            await asyncio.sleep(0)
+            changed.clear()
+            await websocket.send_json(_preview_message(session, latest))
+
+    async def commit(seq: int):
+        message = _preview_message(session, seq)
+        if message["type"] == "result":
+            try:
+                await run_in_threadpool(save_history, session.source, session.evaluate())
+                message["type"] = "committed"
+            except (HistoryQueueFullError, DatabaseError) as e:
+                message = {"type": "error", "seq": seq, "error": str(e)}
+        await websocket.send_json(message)
+
+    evaluator = asyncio.create_task(evaluate())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            seq = latest + 1
+            try:
+                message = json.loads(text)
+                seq = int(message.get("seq", seq))
+                kind = message.get("type")
+                if kind == "edit":
+                    session.edit(int(message["position"]), int(message.get("delete", 0)),
+                                 str(message.get("insert", "")))
+                elif kind == "set":
+                    session.set(str(message["expression"]))
+                elif kind == "commit":
+                    await commit(seq)
+                else:
+                    raise ValueError(f"Unknown message type: {kind}")
+            except (AttributeError, KeyError, TypeError, ValueError) as e:
+                await websocket.send_json({"type": "error", "seq": seq, "error": f"Bad message: {e}"})
+                continue
+            latest = seq
+            if kind != "commit":
+                changed.set()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        evaluator.cancel()
+
+def _ndjson(rows):
+    for row in rows:
+        yield encoding.dumps(row) + b"\n"
+
 @app.get("/history")
-def history():
-    return get_all_calculations()
+def history(
+    request: Request,
+    before_id: Optional[int] = Query(None, ge=1),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_PAGE),
+    since: Optional[str] = None,
+    fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+):
+    if since is not None:
+        try:
+            since = parse_timestamp(since)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if fmt == "ndjson":
+        return StreamingResponse(
+            _ndjson(iter_calculations(before_id=before_id, since=since, limit=limit)),
+            media_type="application/x-ndjson",
+        )
+    # rows as objects (application/json) or as parallel columns, see endpoints.encoding
+    media_type = encoding.negotiate(request.headers.get("accept"), encoding.media_types())
+    if media_type is None:
+        raise encoding.not_acceptable()
+    page_size = None if limit is None and before_id is None and since is None else limit or MAX_HISTORY_PAGE
+    if media_type == encoding.JSON:
+        content = (get_all_calculations() if page_size is None
+                   else get_calculations_page(before_id, page_size, since))
+        count, last_id = len(content), content[-1]["id"] if content else None
+    else:
+        content = get_history_columns(before_id, page_size, since)
+        count, last_id = len(content["id"]), content["id"][-1] if content["id"] else None
+    headers = {}
+    if page_size is not None and count == page_size:
+        headers["X-Next-Before-Id"] = str(last_id)
+    return encoding.encoded_response(request, encoding.encode(content, media_type), media_type, headers)
+
+@app.get("/history/search")
+def search_history(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=MAX_SEARCH_LENGTH),
+    sort: str = Query("rank", pattern="^(rank|recent)$"),
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    before_id: Optional[int] = Query(None, ge=1),
+):
+    """
+    History rows whose expression or result contain every word of q, each word matched
+    as a prefix. sort=rank pages by offset, sort=recent (newest first) by before_id
+    """
+    page = search_calculations(q, limit, offset, sort, before_id)
+    if len(page) == limit:
+        if sort == "rank":
+            response.headers["X-Next-Offset"] = str(offset + limit)
+        else:
+            response.headers["X-Next-Before-Id"] = page[-1]["id"]
+    return page
+
+@app.get("/history/top")
+def history_top(limit: int = Query(20, ge=1, le=MAX_HISTORY_PAGE)):
+    """The most often calculated expressions with their hit counts"""
+    return top_expressions(limit)
+
+@app.get("/history/export")
+def export_history(fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$")):
+    """The whole history, oldest first, streamed in chunks"""
+    return StreamingResponse(
+        transfer.export_chunks(fmt),
+        media_type=transfer.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="calculations.{fmt}"'},
+    )
+
+@app.post("/history/import")
+async def import_history(request: Request,
+                         fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$")):
+    """Appends the rows of an export sent as the request body"""
+    # the body is spooled to disk, so the upload size does not matter
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        try:
+            imported = await run_in_threadpool(import_calculations, transfer.read_rows(text, fmt))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except DatabaseError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    return {"imported": imported}
 
 @app.delete("/delete/all")
 def delete_all():
     return {"deleted": delete_all_calculations()}
 
+@app.get("/history/retention/stats")
+def history_retention_stats():
+    stats = retention_job.stats() if retention_job else {"enabled": False}
+    return {**stats, **storage_stats()}
+
+@app.get("/cache/stats")
+def cache_stats():
+    return expression_cache.stats()
+
+@app.get("/cache/results/stats")
+def result_cache_stats():
+    return result_cache.stats() if result_cache else {"enabled": False}
+
+@app.get("/db/stats")
+def db_stats():
+    return pool_stats()
+
+@app.get("/history/writer/stats")
+def history_writer_stats():
+    return history_writer.stats() if history_writer else {"enabled": False}
+
+def _collect_component_metrics():
+    rows = row_stats()
+    yield ("calculator_db_rows_total", "counter", "Rows of the calculations table by operation",
+           [("", {"operation": operation}, count) for operation, count in rows.items()])
+    cache = expression_cache.stats()
+    yield metrics.counter("calculator_expression_cache_hits_total", "Compiled expression cache hits",
+                          cache["hits"])
+    yield metrics.counter("calculator_expression_cache_misses_total", "Compiled expression cache misses",
+                          cache["misses"])
+    yield metrics.gauge("calculator_expression_cache_size", "Compiled expressions in the cache",
+                        cache["size"])
+    if result_cache:
+        results = result_cache.counters()
+        yield metrics.counter("calculator_result_cache_hits_total", "Shared result cache hits of this worker",
+                              results["hits"])
+        yield metrics.counter("calculator_result_cache_misses_total", "Shared result cache misses of this worker",
+                              results["misses"])
+    pool = pool_stats()
+    if pool:
+        yield metrics.gauge("calculator_db_pool_in_use", "Pooled connections checked out", pool["in_use"])
+        yield metrics.counter("calculator_db_pool_waits_total", "Acquisitions that waited for a connection",
+                              pool["waits"])
+    if history_writer:
+        writer = history_writer.stats()
+        yield metrics.gauge("calculator_history_queue_depth", "History rows waiting to be written",
+                            writer["queue_depth"])
+        yield metrics.counter("calculator_history_failed_rows_total", "History rows the writer failed to store",
+                              writer["failed_rows"])
+
+metrics.REGISTRY.add_collector(_collect_component_metrics)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+@app.get("/evaluation/pool/stats")
+def evaluation_pool_stats():
+    return evaluation_pool.stats() if evaluation_pool else {"enabled": False}
+
+def _profile_store(request: Request) -> profiling.ProfileStore:
+    if not profiling.authorized(request.headers.get(profiling.HEADER), settings.PROFILE_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="X-Profile token required")
+    return profile_store
+
+def list_profiles(request: Request):
+    """Captured request profiles, newest first"""
+    return _profile_store(request).list()
+
+def get_profile(request: Request, name: str, fmt: str = Query("pstats", alias="format", pattern="^(pstats|text)$")):
+    """A captured profile: the pstats file (for pstats, snakeviz, flameprof...) or a text report"""
+    store = _profile_store(request)
+    if fmt == "text":
+        report = store.report(name)
+        if report is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No such profile")
+        return PlainTextResponse(report)
+    path = store.path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No such profile")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.prof")
+
+# Profiles reveal the server's code and traffic: they are only served with the token, and
+# without one the endpoints do not exist (sampled profiles can still be read from the directory)
+if settings.PROFILE_TOKEN:
+    app.add_api_route("/profiles", list_profiles, methods=["GET"])
+    app.add_api_route("/profiles/{name}", get_profile, methods=["GET"])
+
 @app.get("/health")
 def health():
     return {"ok": True}
 
+
+def serve() -> None:
+    """
+    Production server: settings.WORKERS processes sharing the port, each with its own
+    lifespan (pools, writer, background jobs). Writes from all of them go to the same
+    database file; the database layer serializes them (see _write_transaction).
+    SIGTERM or SIGINT stops accepting connections, lets in-flight requests finish for
+    up to settings.SHUTDOWN_TIMEOUT_S seconds and then runs the lifespan shutdown
+    """
+    import uvicorn
+
+    if settings.WORKERS > 1:
+        # migrate once here, so that workers starting together find the schema current
+        init_database()
+    uvicorn.run(
+        # an import string, so that worker processes can import the application;
+        # importing main has no side effects, so the extra import next to __main__ is harmless
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.WORKERS,
+        # uvloop and httptools (installed by uvicorn[standard]), or the stdlib fallbacks
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT_S,
+    )
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,205 @@
+"""
+Process-wide metrics in the Prometheus text exposition format
+
+Recording a sample is a lock, a bisect and two additions, so the instrumentation stays on
+in production. Counters that other components already keep (cache, connection pool,
+history rows) are not duplicated: collectors read their stats() when /metrics is scraped
+"""
+
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from microsecond-scale parser stages to slow requests
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+# (metric name, type, help, [(sample name suffix, labels, value)])
+Family = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape(value: str) -> str:
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter (name ends in _total) with optional labels, passed positionally"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = list(self._values.items())
+        samples = [("", dict(zip(self.labelnames, labels)), value) for labels, value in items]
+        return self.name, "counter", self.help, samples
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (the last one is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = [(labels, (list(counts), total, count))
+                     for labels, (counts, total, count) in self._series.items()]
+        samples = []
+        for labels, (counts, total, count) in items:
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                samples.append(("_bucket", {**base, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", base, total))
+            samples.append(("_count", base, count))
+        return self.name, "histogram", self.help, samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[object] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """collector returns metric families computed at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {_escape_help(help)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def gauge(name: str, help: str, value: float, **labels: str) -> Family:
+    """Single-sample gauge family, for collectors"""
+    return name, "gauge", help, [("", labels, value)]
+
+
+def counter(name: str, help: str, value: float, **labels: str) -> Family:
+    """Single-sample counter family, for collectors"""
+    return name, "counter", help, [("", labels, value)]
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    "calculator_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "calculator_request_seconds", "HTTP request latency", ("route",)))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "calculator_stage_seconds",
+    "Latency of the stages of a calculation: tokenize and parse (on cache misses), evaluate, "
+    "format (pretty_expression/pretty_number) and save (history write or enqueue)",
+    ("stage",)))
+ERRORS = REGISTRY.register(Counter(
+    "calculator_errors_total", "Failed requests and expressions by route and exception type",
+    ("route", "type")))
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and measures their latency by route template (not raw path, which
+    would make a series per id). Plain ASGI, so it adds no per-request task or body copying
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            ERRORS.inc(_route(scope), type(e).__name__)
+            raise
+        finally:
+            route = _route(scope)
+            REQUESTS.inc(scope["method"], route, str(status[0]))
+            REQUEST_SECONDS.observe(perf_counter() - started, route)
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
@@ -0,0 +1,220 @@
+"""
+On-demand profiling of individual requests
+
+ProfilingMiddleware picks requests, either a sample_rate fraction of them or those carrying
+the X-Profile header with the configured token, and ProfiledRoute runs their endpoint under
+cProfile in whichever thread executes it (sync endpoints run in the threadpool, where a
+profiler enabled by the middleware would see nothing). Profiles are written as pstats files
+into a ProfileStore, a directory that keeps only the newest ones. Requests that are not
+picked cost one context variable lookup.
+
+Only the endpoint function is profiled: request parsing and response encoding, which run on
+the event loop, are not, but the wall time of the whole request is recorded next to the
+profile. An async endpoint is profiled on the event loop and so also counts whatever other
+requests run while it awaits
+"""
+
+import asyncio
+import cProfile
+import functools
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+HEADER = "x-profile"
+
+# Profiler of the request being handled, if it was picked
+_current: ContextVar[Optional[cProfile.Profile]] = ContextVar("profile", default=None)
+
+# Held while a request is profiled. A process can run one profiler at a time (from Python 3.12
+# cProfile registers as the single profiling tool of sys.monitoring), so a request picked
+# while another one is being profiled runs unprofiled
+_profiling = threading.Lock()
+
+# Names of stored profiles: <time ns>-<pid>-<method>-<route>, so that they sort by age
+_NAME = re.compile(r"^[0-9]+-[0-9]+-[A-Z]+-[A-Za-z0-9_.-]*$")
+
+
+def profiled(endpoint: Callable) -> Callable:
+    """Wraps an endpoint so that it runs under the profiler of a picked request"""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def run_async(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.disable()
+        return run_async
+
+    @functools.wraps(endpoint)
+    def run(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        return profile.runcall(endpoint, *args, **kwargs)
+    return run
+
+
+class ProfiledRoute(APIRoute):
+    """Route class of the application: every endpoint can be profiled, see profiled()"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+class ProfileStore:
+    """
+    Directory of the newest keep profiles: <name>.prof (pstats) with <name>.json (request
+    metadata). Server processes may share it; each trims it after writing. The directory
+    is created by the first profile
+    """
+
+    def __init__(self, directory: str, keep: int = 100):
+        if keep < 1:
+            raise ValueError("A profile store must keep at least one profile")
+        self.directory = directory
+        self.keep = keep
+
+    def save(self, profile: cProfile.Profile, meta: Dict[str, object]) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        route = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(meta.get("route", ""))).strip("_")
+        name = f"{time.time_ns()}-{os.getpid()}-{meta.get('method', 'GET')}-{route}"
+        profile.dump_stats(os.path.join(self.directory, f"{name}.prof"))
+        with open(os.path.join(self.directory, f"{name}.json"), "w") as file:
+            json.dump({"name": name, **meta}, file)
+        self._trim()
+        return name
+
+    def list(self) -> List[Dict[str, object]]:
+        """Metadata of the stored profiles, newest first"""
+        profiles = []
+        for name in self._names()[::-1]:
+            try:
+                with open(os.path.join(self.directory, f"{name}.json")) as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                # trimmed by another process in the meantime
+                continue
+        return profiles
+
+    def path(self, name: str) -> Optional[str]:
+        """The pstats file of a stored profile, or None; name is checked, it comes from a URL"""
+        if not _NAME.match(name):
+            return None
+        path = os.path.join(self.directory, f"{name}.prof")
+        return path if os.path.exists(path) else None
+
+    def report(self, name: str, limit: int = 50) -> Optional[str]:
+        """The profile as text, functions sorted by cumulative time"""
+        path = self.path(name)
+        if path is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return output.getvalue()
+
+    def _names(self) -> List[str]:
+        try:
+            files = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        names = [file[:-len(".prof")] for file in files if file.endswith(".prof")]
+        return sorted(names, key=lambda name: int(name.split("-", 1)[0]))
+
+    def _trim(self) -> None:
+        names = self._names()
+        for name in names[:max(0, len(names) - self.keep)]:
+            for suffix in (".prof", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a sample_rate fraction of requests and every request whose X-Profile header
+    equals token (when one is set), one request at a time. Requests for excluded path
+    prefixes are never profiled
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, token: Optional[str] = None,
+                 exclude: Tuple[str, ...] = ("/profiles",)):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.token = token.encode() if token else None
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        reason = self._reason(scope) if scope["type"] == "http" else None
+        if reason is None or not _profiling.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, reason)
+        finally:
+            _profiling.release()
+
+    async def _profile(self, scope, receive, send, reason: str) -> None:
+        profile = cProfile.Profile()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            route = scope.get("route")
+            meta = {
+                "method": scope["method"],
+                "route": route.path if route is not None else "unmatched",
+                "path": scope["path"],
+                "status": status[0],
+                "reason": reason,
+                "wall_ms": round(elapsed * 1000, 3),
+                "pid": os.getpid(),
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            # file writes stay off the event loop
+            await run_in_threadpool(self.store.save, profile, meta)
+
+    def _reason(self, scope) -> Optional[str]:
+        if scope["path"].startswith(self.exclude):
+            return None
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == HEADER.encode() and hmac.compare_digest(value, self.token):
+                    return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+
+def authorized(header: Optional[str], token: Optional[str]) -> bool:
+    """Whether a request may read profiles: it must carry the token; without one, none may"""
+    if not token or header is None:
+        return False
+    return hmac.compare_digest(header.encode(), token.encode())
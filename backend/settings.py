@@ -0,0 +1,70 @@
+"""Application settings, read from environment variables"""
+
+import os
+
+from computation.budget import EvaluationBudget
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes", "on")
+
+
+DB_POOL_SIZE = _env_int("CALC_DB_POOL_SIZE", 8)
+
+HISTORY_WRITE_BEHIND = _env_flag("CALC_HISTORY_WRITE_BEHIND")
+HISTORY_BATCH_SIZE = _env_int("CALC_HISTORY_BATCH_SIZE", 200)
+HISTORY_FLUSH_MS = _env_int("CALC_HISTORY_FLUSH_MS", 50)
+HISTORY_QUEUE_SIZE = _env_int("CALC_HISTORY_QUEUE_SIZE", 10000)
+
+BUDGET = EvaluationBudget(
+    max_length=_env_int("CALC_MAX_EXPRESSION_LENGTH", 10000),
+    max_tokens=_env_int("CALC_MAX_TOKENS", 5000),
+    max_depth=_env_int("CALC_MAX_DEPTH", 500),
+    max_magnitude=float(os.environ.get("CALC_MAX_MAGNITUDE", 308)),
+    timeout=_env_int("CALC_EVAL_TIMEOUT_MS", 1000) / 1000,
+)
+
+# Evaluations estimated to cost at least EVAL_POOL_THRESHOLD steps go to worker processes
+# (see EvaluationPool); 0 workers keeps every evaluation inline, which is always the fastest
+EVAL_POOL_WORKERS = _env_int("CALC_EVAL_POOL_WORKERS", 0)
+EVAL_POOL_QUEUE = _env_int("CALC_EVAL_POOL_QUEUE", 32)
+EVAL_POOL_THRESHOLD = _env_int("CALC_EVAL_POOL_THRESHOLD", 1500)
+EVAL_POOL_TIMEOUT_MS = _env_int("CALC_EVAL_POOL_TIMEOUT_MS", 2000)
+
+# History retention: rows beyond the newest RETENTION_MAX_ROWS or older than RETENTION_MAX_AGE_DAYS
+# are pruned every RETENTION_INTERVAL_S seconds (0 = no limit); an interval of 0 disables the job
+RETENTION_MAX_ROWS = _env_int("CALC_RETENTION_MAX_ROWS", 0)
+RETENTION_MAX_AGE_DAYS = _env_int("CALC_RETENTION_MAX_AGE_DAYS", 0)
+RETENTION_INTERVAL_S = _env_int("CALC_RETENTION_INTERVAL_S", 60)
+RETENTION_BATCH_SIZE = _env_int("CALC_RETENTION_BATCH_SIZE", 1000)
+
+# The most often calculated expressions compiled into the expression cache at startup (0 = none)
+CACHE_WARM_EXPRESSIONS = _env_int("CALC_CACHE_WARM_EXPRESSIONS", 0)
+
+# Results of /calculate shared by all server processes through a memory-mapped SQLite file
+# (CALC_RESULT_CACHE_PATH, by default results.db next to the history database); 0 entries disables it
+RESULT_CACHE_SIZE = _env_int("CALC_RESULT_CACHE_SIZE", 0)
+RESULT_CACHE_TTL_S = _env_int("CALC_RESULT_CACHE_TTL_S", 3600)
+RESULT_CACHE_PATH = os.environ.get("CALC_RESULT_CACHE_PATH")
+
+# Responses of at least this many bytes are compressed (br or gzip) when the client accepts it; 0 = never
+COMPRESS_MIN_BYTES = _env_int("CALC_COMPRESS_MIN_BYTES", 1024)
+
+# Server started by `python main.py`; every worker process has its own pools and background threads
+HOST = os.environ.get("CALC_HOST", "0.0.0.0")
+PORT = _env_int("CALC_PORT", 8000)
+WORKERS = _env_int("CALC_WORKERS", 1)
+# Seconds in-flight requests get to finish after SIGTERM/SIGINT before connections are closed
+SHUTDOWN_TIMEOUT_S = _env_int("CALC_SHUTDOWN_TIMEOUT_S", 10)
+
+# Request profiling: a CALC_PROFILE_SAMPLE_RATE fraction of requests, and requests with the header
+# X-Profile: <CALC_PROFILE_TOKEN>, are profiled into the newest CALC_PROFILE_KEEP files of CALC_PROFILE_DIR
+# (by default profiles/ next to the history database). With neither set profiling is off
+PROFILE_SAMPLE_RATE = float(os.environ.get("CALC_PROFILE_SAMPLE_RATE", 0))
+PROFILE_TOKEN = os.environ.get("CALC_PROFILE_TOKEN") or None
+PROFILE_DIR = os.environ.get("CALC_PROFILE_DIR")
+PROFILE_KEEP = _env_int("CALC_PROFILE_KEEP", 100)
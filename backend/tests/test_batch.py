@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database import database
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'calculations.db'))
+    monkeypatch.setattr(main, 'history_writer', None)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def history(client):
+    return [(row['expression'], row['result']) for row in client.get('/history').json()][::-1]
+
+
+def test_results_keep_request_order(client):
+    response = client.post('/calculate/batch', json={'expressions': ['7//2', '1+2', '2**3', '10-4']})
+    assert response.status_code == 200
+    assert [item['result'] for item in response.json()['results']] == [3, 3, 8, 6]
+    assert history(client) == [('7÷÷2', '3'), ('1+2', '3'), ('2^3', '8'), ('10-4', '6')]
+
+
+def test_errors_are_reported_per_item(client):
+    response = client.post('/calculate/batch', json={'expressions': ['1+2', '1/0', 'x +', '2*3']})
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'result': 3, 'error': None},
+        {'result': None, 'error': 'Div by zero'},
+        {'result': None, 'error': 'Unexpected end of expression at position 3'},
+        {'result': 6, 'error': None},
+    ]
+    # only the successful items are saved
+    assert history(client) == [('1+2', '3'), ('2×3', '6')]
+
+
+def test_history_can_be_skipped(client):
+    response = client.post('/calculate/batch', params={'save_history': False}, json={'expressions': ['1+2', '3*3']})
+    assert [item['result'] for item in response.json()['results']] == [3, 9]
+    assert history(client) == []
+
+
+def test_batch_size_is_limited(client):
+    import main
+    response = client.post('/calculate/batch', json={'expressions': ['1'] * (main.MAX_BATCH_SIZE + 1)})
+    assert response.status_code == 400
+    assert response.json()['detail'] == f'Batch is limited to {main.MAX_BATCH_SIZE} expressions'
+    assert client.post('/calculate/batch', json={'expressions': ['1'] * main.MAX_BATCH_SIZE}).status_code == 200
+    assert history(client) == [('1', '1')] * main.MAX_BATCH_SIZE
+
+
+def test_rows_are_saved_in_one_transaction(client):
+    client.post('/calculate/batch', json={'expressions': ['1+1']})
+    # the third row of the next batch fails to insert
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("""
+        CREATE TRIGGER fail_insert BEFORE INSERT ON occurrences
+        WHEN (SELECT expression FROM expressions WHERE id = NEW.expression_id) = '3+3'
+        BEGIN SELECT RAISE(ABORT, 'insert failed'); END
+    """)
+    conn.commit()
+    conn.close()
+    response = client.post('/calculate/batch', json={'expressions': ['1+2', '2+2', '3+3', '4+4']})
+    assert response.status_code == 500
+    assert 'insert failed' in response.json()['detail']
+    assert history(client) == [('1+1', '2')]
+    # the expressions upserted before the failure are rolled back as well
+    conn = sqlite3.connect(database.DB_PATH)
+    assert conn.execute('SELECT expression FROM expressions').fetchall() == [('1+1',)]
+    conn.close()
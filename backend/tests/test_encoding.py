@@ -0,0 +1,89 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database import database
+from endpoints import encoding
+from endpoints.encoding import COLUMNS_JSON, JSON, MSGPACK, compress, negotiate
+import settings
+
+
+def test_negotiate():
+    offers = [JSON, COLUMNS_JSON]
+    assert negotiate(None, offers) == JSON
+    assert negotiate('*/*', offers) == JSON
+    assert negotiate(f'{COLUMNS_JSON}, {JSON};q=0.5', offers) == COLUMNS_JSON
+    assert negotiate('application/*;q=0.2, text/html', offers) == JSON
+    assert negotiate(f'{JSON};q=0, */*;q=0.1', offers) == COLUMNS_JSON
+    assert negotiate('application/x-msgpack', offers + [MSGPACK]) == MSGPACK
+    assert negotiate('text/csv', offers) is None
+
+
+def test_compress(monkeypatch):
+    monkeypatch.setattr(settings, 'COMPRESS_MIN_BYTES', 100)
+    body = b'{"result": 4}' * 100
+    assert compress(body[:50], 'gzip') == (body[:50], None)
+    assert compress(body, 'identity') == (body, None)
+    assert compress(body, 'gzip;q=0') == (body, None)
+    compressed, content_encoding = compress(body, 'deflate, gzip')
+    assert content_encoding == 'gzip'
+    assert gzip.decompress(compressed) == body
+    monkeypatch.setattr(settings, 'COMPRESS_MIN_BYTES', 0)
+    assert compress(body, 'gzip') == (body, None)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'calculations.db'))
+    monkeypatch.setattr(settings, 'COMPRESS_MIN_BYTES', 100)
+    with TestClient(main.app) as client:
+        database.save_calculations([(f'{i} + 1', str(i + 1)) for i in range(20)])
+        yield client
+
+
+def test_history_rows_and_columns(client):
+    rows = client.get('/history', params={'limit': 5}).json()
+    assert [row['id'] for row in rows] == ['20', '19', '18', '17', '16']
+    response = client.get('/history', params={'limit': 5}, headers={'Accept': COLUMNS_JSON})
+    assert response.headers['content-type'] == COLUMNS_JSON
+    assert response.headers['x-next-before-id'] == '16'
+    columns = response.json()
+    assert columns['id'] == [20, 19, 18, 17, 16]
+    assert columns['expression'] == [row['expression'] for row in rows]
+    assert columns['result'] == [row['result'] for row in rows]
+    assert client.get('/history', params={'before_id': 1}, headers={'Accept': COLUMNS_JSON}).json() == {
+        'id': [], 'expression': [], 'result': [], 'created_at': []}
+
+
+def test_history_ndjson(client):
+    response = client.get('/history', params={'format': 'ndjson', 'limit': 3})
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = response.text.splitlines()
+    assert [json.loads(line)['id'] for line in lines] == ['20', '19', '18']
+    response = client.get('/history', params={'format': 'ndjson', 'limit': 5, 'before_id': 4})
+    assert [json.loads(line)['id'] for line in response.text.splitlines()] == ['3', '2', '1']
+    assert len(client.get('/history', params={'format': 'ndjson'}).text.splitlines()) == 20
+
+
+def test_history_is_compressed_above_threshold(client):
+    response = client.get('/history', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert len(response.json()) == 20
+    small = client.get('/history', params={'limit': 1}, headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in small.headers
+
+
+def test_history_not_acceptable(client):
+    response = client.get('/history', headers={'Accept': 'text/csv'})
+    assert response.status_code == 406
+    assert COLUMNS_JSON in response.json()['detail']
+
+
+@pytest.mark.skipif(encoding.msgpack is None, reason='msgpack is not installed')
+def test_history_msgpack(client):
+    response = client.get('/history', params={'limit': 2}, headers={'Accept': MSGPACK})
+    assert encoding.msgpack.unpackb(response.content)['id'] == [20, 19]
@@ -0,0 +1,80 @@
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from metrics import Counter, Histogram, MetricsMiddleware, Registry, gauge
+import metrics
+import pytest
+
+
+def test_counter():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests", ("route",)))
+    requests.inc("/a")
+    requests.inc("/a")
+    requests.inc('/b"\\', amount=3)
+    assert requests.value("/a") == 2
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{route="/a"} 2\n'
+        'requests_total{route="/b\\"\\\\"} 3\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.register(Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1)))
+    for value in (0.05, 0.1, 0.5, 2):
+        latency.observe(value, "parse")
+    assert latency.count("parse") == 4
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'latency_seconds_bucket{stage="parse",le="0.1"} 2',
+        'latency_seconds_bucket{stage="parse",le="1"} 3',
+        'latency_seconds_bucket{stage="parse",le="+Inf"} 4',
+        'latency_seconds_sum{stage="parse"} 2.65',
+        'latency_seconds_count{stage="parse"} 4',
+    ]
+
+
+def test_collector():
+    registry = Registry()
+    registry.add_collector(lambda: [gauge("queue_depth", "Queued rows", 7)])
+    assert registry.render().splitlines()[-1] == "queue_depth 7"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {}
+
+    @app.get("/fail")
+    def fail():
+        raise KeyError("boom")
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_middleware_labels_by_route(client):
+    before = metrics.REQUESTS.value("GET", "/items/{item_id}", "200")
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/items/0")
+    client.get("/missing")
+    assert metrics.REQUESTS.value("GET", "/items/{item_id}", "200") == before + 2
+    assert metrics.REQUESTS.value("GET", "/items/{item_id}", "404") >= 1
+    assert metrics.REQUESTS.value("GET", "unmatched", "404") >= 1
+    assert metrics.REQUEST_SECONDS.count("/items/{item_id}") >= 3
+
+
+def test_middleware_counts_unhandled_errors(client):
+    before = metrics.ERRORS.value("/fail", "KeyError")
+    assert client.get("/fail").status_code == 500
+    assert metrics.ERRORS.value("/fail", "KeyError") == before + 1
+    assert metrics.REQUESTS.value("GET", "/fail", "500") >= 1
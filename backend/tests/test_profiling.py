@@ -0,0 +1,129 @@
+import os
+import pstats
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from profiling import ProfileStore, ProfiledRoute, ProfilingMiddleware, authorized
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def slow_sum(count: int) -> int:
+    return sum(range(count))
+
+
+def make_client(store: ProfileStore, **options) -> TestClient:
+    app = FastAPI()
+    app.router.route_class = ProfiledRoute
+
+    @app.get("/sum/{count}")
+    def total(count: int):
+        return {"sum": slow_sum(count)}
+
+    @app.get("/async")
+    async def asynchronous():
+        return {"sum": slow_sum(10)}
+
+    router = APIRouter(prefix="/items", route_class=ProfiledRoute)
+
+    @router.get("/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    app.include_router(router)
+    app.add_middleware(ProfilingMiddleware, store=store, **options)
+    return TestClient(app)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ProfileStore(str(tmp_path / "profiles"), keep=3)
+
+
+def test_sampled_requests_are_profiled_in_their_thread(store):
+    client = make_client(store, sample_rate=1.0)
+    assert client.get("/sum/1000").json() == {"sum": 499500}
+    [meta] = store.list()
+    assert (meta["method"], meta["route"], meta["path"], meta["status"], meta["reason"]) == (
+        "GET", "/sum/{count}", "/sum/1000", 200, "sampled")
+    # the endpoint ran in a threadpool thread, and its calls are in the profile
+    functions = {function for _, _, function in pstats.Stats(store.path(meta["name"])).stats}
+    assert "slow_sum" in functions
+    assert "slow_sum" in store.report(meta["name"])
+
+
+def test_async_endpoints_and_routers_are_profiled(store):
+    client = make_client(store, sample_rate=1.0)
+    client.get("/async")
+    client.get("/items/7")
+    assert [meta["route"] for meta in store.list()] == ["/items/{item_id}", "/async"]
+
+
+def test_header_token(store):
+    client = make_client(store, token="secret")
+    client.get("/sum/10")
+    client.get("/sum/10", headers={"X-Profile": "wrong"})
+    assert store.list() == []
+    client.get("/sum/10", headers={"X-Profile": "secret"})
+    assert [meta["reason"] for meta in store.list()] == ["header"]
+
+
+def test_one_request_is_profiled_at_a_time(store):
+    client = make_client(store, sample_rate=1.0)
+    started, release = threading.Event(), threading.Event()
+
+    @client.app.get("/wait")
+    def wait():
+        started.set()
+        release.wait(10)
+        return {}
+
+    with client, ThreadPoolExecutor(1) as pool:
+        waiting = pool.submit(client.get, "/wait")
+        assert started.wait(10)
+        # picked while /wait is being profiled: runs without a profiler
+        assert client.get("/sum/10").json() == {"sum": 45}
+        release.set()
+        assert waiting.result().status_code == 200
+        client.get("/sum/20")
+    assert [meta["path"] for meta in store.list()] == ["/sum/20", "/wait"]
+
+
+@pytest.mark.parametrize("env,routes", [
+    ({"CALC_PROFILE_SAMPLE_RATE": "1"}, []),
+    ({"CALC_PROFILE_TOKEN": "secret"}, ["/profiles", "/profiles/{name}"]),
+])
+def test_profile_endpoints_require_a_token(env, routes):
+    # main reads the settings on import, so it is imported in a process of its own
+    output = subprocess.run(
+        [sys.executable, "-c", "import main; print(' '.join(route.path for route in main.app.routes))"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}, capture_output=True, text=True, check=True,
+    ).stdout
+    assert [path for path in output.split() if path.startswith("/profiles")] == routes
+
+
+def test_store_keeps_newest(store):
+    client = make_client(store, sample_rate=1.0)
+    for count in range(5):
+        client.get(f"/sum/{count}")
+    assert [meta["path"] for meta in store.list()] == ["/sum/4", "/sum/3", "/sum/2"]
+
+
+def test_profile_names_are_checked(store):
+    assert store.path("../../etc/passwd") is None
+    assert store.path("1-2-GET-missing") is None
+
+
+def test_authorized():
+    # without a token nobody may read profiles
+    assert not authorized(None, None)
+    assert not authorized("secret", None)
+    assert not authorized(None, "secret")
+    assert not authorized("wrong", "secret")
+    assert authorized("secret", "secret")
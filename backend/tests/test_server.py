@@ -0,0 +1,117 @@
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+
+from database import database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+REQUESTS = 200
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url: str, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert server.poll() is None, server.stdout.read()
+        try:
+            if httpx.get(url + '/health').status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError('Server did not start')
+
+
+@contextmanager
+def _server(tmp_path) -> Iterator[str]:
+    """Runs the production server with WORKERS processes on a fresh database; yields its URL"""
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, 'main.py'], cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        env={**os.environ, 'CALC_DB_PATH': str(tmp_path / 'calculations.db'), 'CALC_HOST': '127.0.0.1',
+             'CALC_PORT': str(port), 'CALC_WORKERS': str(WORKERS), 'CALC_RETENTION_INTERVAL_S': '0',
+             'CALC_RESULT_CACHE_SIZE': '1000'},
+    )
+    try:
+        _wait_until_up(url, server)
+        yield url
+    finally:
+        server.send_signal(signal.SIGTERM)
+        output = server.communicate(timeout=30)[0].decode()
+    assert server.returncode == 0, output
+
+
+def test_workers_share_database_and_result_cache(tmp_path):
+    with _server(tmp_path) as url:
+        with httpx.Client(base_url=url) as client, ThreadPoolExecutor(32) as pool:
+            # the second round is answered from the result cache, whichever worker computed the values
+            for _ in range(2):
+                responses = list(pool.map(
+                    lambda i: client.post('/calculate', json={'expression': f'{i} + 1'}), range(REQUESTS)))
+                assert [response.status_code for response in responses] == [200] * REQUESTS
+                assert [response.json()['result'] for response in responses] == list(range(1, REQUESTS + 1))
+    conn = sqlite3.connect(str(tmp_path / 'calculations.db'))
+    assert conn.execute("SELECT COUNT(*) FROM occurrences").fetchone()[0] == 2 * REQUESTS
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+    conn.close()
+    # every worker publishes its counters on shutdown
+    conn = sqlite3.connect(str(tmp_path / 'results.db'))
+    assert conn.execute("SELECT COUNT(*), SUM(hits), SUM(misses) FROM workers").fetchone() == (
+        WORKERS, REQUESTS, REQUESTS)
+    conn.close()
+
+
+def test_workers_share_sessions(tmp_path):
+    with _server(tmp_path) as url:
+        pids = set()
+
+        def call(method: str, path: str, **kwargs) -> httpx.Response:
+            # a connection per call, so that calls are spread over the workers
+            with httpx.Client(base_url=url) as client:
+                response = client.request(method, path, **kwargs)
+                # the same connection, so the same worker
+                pids.add(client.get('/cache/results/stats').json()['pid'])
+            return response
+
+        session = call('POST', '/sessions').json()['session_id']
+        for i in range(20):
+            expression = f'x{i - 1} + 1' if i else '1'
+            response = call('PUT', f'/sessions/{session}/variables/x{i}', json={'expression': expression})
+            assert response.status_code == 200, response.text
+            assert response.json()['value'] == i + 1
+        # every worker sees the change, whichever one made it
+        assert call('PUT', f'/sessions/{session}/variables/x0', json={'expression': '11'}).json()['recomputed'] == 20
+        for _ in range(2 * WORKERS):
+            assert call('GET', f'/sessions/{session}/variables/x19').json()['value'] == 30
+        # concurrent changes from all workers are all kept
+        with ThreadPoolExecutor(8) as pool:
+            responses = list(pool.map(
+                lambda i: call('PUT', f'/sessions/{session}/variables/y{i}', json={'expression': f'x19 * {i}'}),
+                range(24)))
+        assert [response.status_code for response in responses] == [200] * 24
+        variables = call('GET', f'/sessions/{session}/variables').json()
+        assert [variable['name'] for variable in variables[:20]] == [f'x{i}' for i in range(20)]
+        assert sorted(variable['value'] for variable in variables[20:]) == [30 * i for i in range(24)]
+        assert call('POST', f'/sessions/{session}/evaluate', json={'expression': 'x0 + y23'}).json() == {
+            'result': 11 + 30 * 23}
+        assert call('DELETE', f'/sessions/{session}/variables/y23').status_code == 200
+        for _ in range(2 * WORKERS):
+            assert call('GET', f'/sessions/{session}/variables/y23').status_code == 404
+        assert call('GET', '/sessions/unknown/variables').status_code == 404
+    assert len(pids) > 1
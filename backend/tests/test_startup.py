@@ -0,0 +1,32 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from database import database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_has_no_side_effects(tmp_path):
+    path = tmp_path / 'storage' / 'calculations.db'
+    script = "import sys, logging, main; print('numpy' in sys.modules, logging.getLogger().handlers)"
+    output = subprocess.run(
+        [sys.executable, '-c', script], cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+        env={**os.environ, 'CALC_DB_PATH': str(path)},
+    ).stdout
+    assert output.split() == ['False', '[]']
+    assert not path.parent.exists()
+
+
+def test_lifespan_migrates(tmp_path, monkeypatch):
+    import main
+    path = tmp_path / 'calculations.db'
+    monkeypatch.setattr(database, 'DB_PATH', str(path))
+    with TestClient(main.app) as client:
+        assert client.post('/calculate', json={'expression': '2 + 2'}).json() == {'result': 4}
+    conn = sqlite3.connect(str(path))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+    conn.close()
@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from database import database
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'calculations.db'))
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def session(client):
+    response = client.post('/sessions')
+    assert response.status_code == 200
+    return response.json()['session_id']
+
+
+def test_define_and_evaluate(client, session):
+    assert client.put(f'/sessions/{session}/variables/a', json={'expression': '2 * 3'}).json()['value'] == 6
+    response = client.put(f'/sessions/{session}/variables/b', json={'expression': 'a ^ 2 + 1'})
+    assert response.json()['value'] == 37
+    assert client.put(f'/sessions/{session}/variables/a', json={'expression': '1'}).json()['changed'] == {'a': 1, 'b': 2}
+    assert client.post(f'/sessions/{session}/evaluate', json={'expression': 'a + b'}).json() == {'result': 3}
+    assert [variable['name'] for variable in client.get(f'/sessions/{session}/variables').json()] == ['a', 'b']
+
+
+def test_unknown_session(client):
+    assert client.get('/sessions/unknown/variables').status_code == 404
+    response = client.put('/sessions/unknown/variables/a', json={'expression': '1'})
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'Session not found'
+    # the PUT did not create the session
+    assert client.get('/sessions/unknown/variables').status_code == 404
+
+
+def test_copy_follows_changes_of_other_processes(client, session):
+    client.put(f'/sessions/{session}/variables/a', json={'expression': '2'})
+    client.put(f'/sessions/{session}/variables/b', json={'expression': 'a * 10'})
+    # another process redefines a
+    assert database.change_session(session, 2, 'a', '3') == 3
+    assert client.get(f'/sessions/{session}/variables/b').json()['value'] == 30
+
+
+def test_change_racing_another_process_is_made_again(client, session, monkeypatch):
+    client.put(f'/sessions/{session}/variables/a', json={'expression': '2'})
+    client.get(f'/sessions/{session}/variables')
+    get_session = database.get_session
+    raced = []
+
+    def racing_get_session(session_id, known_version=None):
+        stored = get_session(session_id, known_version)
+        if not raced:
+            # another process deletes a right after this one found its copy current
+            raced.append(database.change_session(session_id, known_version, 'a', None))
+        return stored
+
+    monkeypatch.setattr(database, 'get_session', racing_get_session)
+    response = client.put(f'/sessions/{session}/variables/c', json={'expression': 'a + 1'})
+    assert raced == [2]
+    assert response.json()['error'] == 'Unknown variable: a'
+    assert [variable['name'] for variable in client.get(f'/sessions/{session}/variables').json()] == ['c']
+
+
+def test_sessions_survive_the_process_cache(client, session):
+    from endpoints import variables
+    client.put(f'/sessions/{session}/variables/a', json={'expression': '6 * 7'})
+    variables.sessions.clear()
+    assert client.get(f'/sessions/{session}/variables/a').json() == {
+        'name': 'a', 'expression': '6 * 7', 'value': 42, 'error': None}